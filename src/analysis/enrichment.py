@@ -0,0 +1,256 @@
+# coding: utf-8
+
+"""Python file for the over-representation analysis of the annotations of the query results."""
+
+from typing import Iterable, Optional
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+from scipy.special import gammaln
+
+from src.visualization.network import explode_records
+
+# Annotation columns of the combined table tested for enrichment, with the
+# item keys of the term id and of the term name
+ENRICHMENT_TERMS = {
+    "Reactome_Pathways": ("pathway_id", "pathway_name"),
+    "GO_Process": ("go_id", "go_name"),
+    "WikiPathways": ("pathway_id", "pathway_label"),
+    "DisGeNET": ("diseaseid", "disease_name"),
+    "OpenTargets_Diseases": ("disease_id", "disease_name"),
+}
+
+
+# Cells of the pmf grid evaluated at once by hypergeom_sf
+SF_CHUNK_CELLS = 2_000_000
+
+# Tails are summed over at most this many standard deviations, further terms
+# are below the double precision
+SF_TAIL_SDS = 12
+
+
+def _log_comb(n, k):
+    return gammaln(n + 1) - gammaln(k + 1) - gammaln(n - k + 1)
+
+
+def hypergeom_sf(k, population: int, successes, draws: int) -> np.ndarray:
+    """return P(X >= k) for X ~ Hypergeometric(population, successes, draws).
+
+    Vectorized over k and successes (scipy evaluates the survival function
+    term by term). Each tail is summed outward from the mode with the pmf
+    ratio recurrence: the right tail when k is above the mode, one minus the
+    left tail otherwise.
+
+    @param k: number of observed successes, per term
+    @param population: number of genes in the background
+    @param successes: number of genes of the background with the term, per term
+    @param draws: number of genes in the gene set
+    """
+    k = np.asarray(k, dtype=np.int64)
+    successes = np.broadcast_to(np.asarray(successes, dtype=np.int64), k.shape)
+    failures = population - successes
+    lower = np.maximum(0, draws - failures)
+    upper = np.minimum(successes, draws)
+    k = np.clip(k, lower, upper + 1)
+
+    sf = np.where(k <= lower, 1.0, 0.0)
+    mode = (draws + 1) * (successes + 1) // (population + 2)
+    middle = np.flatnonzero((k > lower) & (k <= upper))
+    right = k[middle] > mode[middle]
+
+    # Summed range of every term: start (largest pmf of the range), direction, length
+    start = np.where(right, k[middle], k[middle] - 1)
+    step = np.where(right, 1, -1)
+    length = np.where(right, upper[middle] - start + 1, start - lower[middle] + 1)
+    variance = (
+        draws
+        * (successes[middle] / population)
+        * (failures[middle] / population)
+        * ((population - draws) / max(population - 1, 1))
+    )
+    cap = np.ceil(SF_TAIL_SDS * np.sqrt(variance)).astype(np.int64) + 20
+    length = np.minimum(length, cap)
+
+    log_start = (
+        _log_comb(successes[middle], start)
+        + _log_comb(failures[middle], draws - start)
+        - _log_comb(population, draws)
+    )
+    tail = np.zeros(len(middle))
+    width = int(length.max()) if len(middle) else 0
+    rows_per_chunk = max(1, SF_CHUNK_CELLS // max(width, 1))
+    for begin in range(0, len(middle), rows_per_chunk):
+        chunk = slice(begin, begin + rows_per_chunk)
+        K = successes[middle][chunk][:, None].astype(float)
+        F = failures[middle][chunk][:, None].astype(float)
+        x = start[chunk][:, None] + step[chunk][:, None] * np.arange(width - 1)
+        x = x.astype(float)
+        # pmf(x + step) / pmf(x), outside the summed range is masked below
+        with np.errstate(divide="ignore", invalid="ignore"):
+            ratio = np.where(
+                step[chunk][:, None] > 0,
+                (K - x) * (draws - x) / ((x + 1) * (F - draws + x + 1)),
+                x * (F - draws + x) / ((K - x + 1) * (draws - x + 1)),
+            )
+        inside = np.arange(1, width)[None, :] < length[chunk][:, None]
+        ratio = np.where(inside, ratio, 0.0)
+        factors = np.concatenate(
+            [np.ones((len(K), 1)), np.cumprod(ratio, axis=1)], axis=1
+        )
+        tail[chunk] = np.exp(log_start[chunk]) * factors.sum(axis=1)
+
+    sf[middle] = np.where(right, tail, 1.0 - tail)
+    return np.clip(sf, 0.0, 1.0)
+
+
+def benjamini_hochberg(p_values: np.ndarray) -> np.ndarray:
+    """return the Benjamini-Hochberg adjusted p-values (FDR).
+
+    @param p_values: p-values of all the tested terms
+    """
+    p_values = np.asarray(p_values, dtype=float)
+    n = len(p_values)
+    if n == 0:
+        return p_values
+    order = np.argsort(p_values)
+    adjusted = p_values[order] * n / np.arange(1, n + 1)
+    # Enforce monotonicity from the largest p-value down
+    adjusted = np.minimum.accumulate(adjusted[::-1])[::-1]
+    fdr = np.empty(n)
+    fdr[order] = np.minimum(adjusted, 1.0)
+    return fdr
+
+
+class EnrichmentEngine:
+    """Hypergeometric over-representation test of the annotation terms.
+
+    The gene x term incidence matrix is built once from the combined table,
+    each test is then a single sparse product and a vectorized p-value
+    computation over all the terms.
+
+    Usage example:
+    >> engine = EnrichmentEngine(combined_data)
+    >> engine.enrich(["ALK", "BRCA1", "TP53"])
+    """
+
+    def __init__(
+        self,
+        data: pd.DataFrame,
+        columns: Optional[Iterable[str]] = None,
+        gene_column: str = "identifier",
+    ):
+        """
+        @param data: the combined table created by combine_sources
+        @param columns: annotation columns to test, all the ENRICHMENT_TERMS by default
+        @param gene_column: column of the combined table holding the genes
+        """
+        columns = [
+            column
+            for column in (columns or ENRICHMENT_TERMS)
+            if column in data.columns and column in ENRICHMENT_TERMS
+        ]
+        gene_codes, genes = pd.factorize(data[gene_column].astype(str))
+        self.genes = genes.to_numpy(dtype=object)
+        self._gene_index = {gene: index for index, gene in enumerate(self.genes)}
+
+        rows, term_keys, term_frames = [], [], []
+        for column in columns:
+            id_key, name_key = ENRICHMENT_TERMS[column]
+            record_rows, _, records = explode_records(data[column])
+            if not records:
+                continue
+            ids = [record.get(id_key) for record in records]
+            names = [record.get(name_key) for record in records]
+            keep = np.fromiter(
+                (isinstance(term, str) and term != "" for term in ids),
+                dtype=bool,
+                count=len(ids),
+            )
+            items = pd.DataFrame(
+                {
+                    "row": record_rows[keep],
+                    "term_id": np.asarray(ids, dtype=object)[keep],
+                    "term_name": np.asarray(names, dtype=object)[keep],
+                }
+            )
+            rows.append(gene_codes[items["row"].to_numpy()])
+            term_keys.append(column + "\t" + items["term_id"])
+            term_frames.append(
+                items.drop_duplicates("term_id").assign(annotation=column)[
+                    ["annotation", "term_id", "term_name"]
+                ]
+            )
+
+        if rows:
+            term_codes, _ = pd.factorize(pd.concat(term_keys, ignore_index=True))
+            self.terms = pd.concat(term_frames, ignore_index=True)
+            gene_rows = np.concatenate(rows)
+        else:
+            term_codes = np.zeros(0, dtype=np.int64)
+            self.terms = pd.DataFrame(columns=["annotation", "term_id", "term_name"])
+            gene_rows = np.zeros(0, dtype=np.int64)
+
+        # Binary incidence: a gene annotated twice with a term counts once
+        matrix = sparse.csr_matrix(
+            (np.ones(len(gene_rows), dtype=np.int32), (gene_rows, term_codes)),
+            shape=(len(self.genes), len(self.terms)),
+        )
+        matrix.sum_duplicates()
+        matrix.data[:] = 1
+        self.matrix = matrix
+
+    def enrich(
+        self,
+        gene_set: Iterable[str],
+        background: Optional[Iterable[str]] = None,
+        min_overlap: int = 1,
+    ) -> pd.DataFrame:
+        """test the over-representation of every term in the gene set.
+
+        Returns one row per term with at least min_overlap genes of the set,
+        sorted by p-value. Genes absent from the combined table are ignored.
+
+        @param gene_set: genes of interest
+        @param background: genes the set was drawn from, all the genes of the
+            combined table by default
+        @param min_overlap: minimum number of genes of the set annotated with a term
+        """
+        in_background = np.ones(len(self.genes), dtype=bool)
+        if background is not None:
+            in_background[:] = False
+            in_background[self._indices(background)] = True
+        in_set = np.zeros(len(self.genes), dtype=bool)
+        in_set[self._indices(gene_set)] = True
+        in_set &= in_background
+
+        n_background = int(in_background.sum())
+        n_set = int(in_set.sum())
+        overlap = np.asarray(in_set.astype(np.int32) @ self.matrix).ravel()
+        term_size = np.asarray(in_background.astype(np.int32) @ self.matrix).ravel()
+
+        # P(X >= overlap) for X ~ Hypergeometric(background, term size, set size)
+        p_value = hypergeom_sf(overlap, n_background, term_size, n_set)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            fold = (overlap / n_set) / (term_size / n_background)
+
+        table = self.terms.assign(
+            overlap=overlap,
+            term_size=term_size,
+            set_size=n_set,
+            background_size=n_background,
+            fold_enrichment=fold,
+            p_value=p_value,
+        )
+        # Only the tested terms count in the multiple testing correction
+        table = table[table["overlap"] >= min_overlap]
+        table = table.assign(fdr=benjamini_hochberg(table["p_value"].to_numpy()))
+        return table.sort_values(["p_value", "term_id"], kind="stable").reset_index(
+            drop=True
+        )
+
+    def _indices(self, genes: Iterable[str]) -> np.ndarray:
+        return np.fromiter(
+            (self._gene_index[gene] for gene in genes if gene in self._gene_index),
+            dtype=np.int64,
+        )
@@ -0,0 +1,178 @@
+# coding: utf-8
+
+"""Python file for browsing the combined table page by page without converting all of it."""
+
+import json
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+
+from src.download.parquet import JSON_COLUMNS_KEY, from_arrow_table
+from src.query.compact import compact
+from src.utils import ID_COLUMNS
+from src.visualization.network import ANNOTATION_NODES
+
+PAGE_SIZE = 50
+
+
+class ResultExplorer:
+    """Filtered and paginated view of the combined table.
+
+    Filters are evaluated on the Arrow columns and only the rows of the
+    requested page are converted to pandas: annotation columns as their
+    number of records, the records themselves only for a drilled-down gene.
+
+    Usage example:
+    >> explorer = ResultExplorer(combined_data)
+    >> explorer.count(sources=["Ensembl"], node_types=["disease"])
+    >> explorer.page(0, columns=["GO_Process"], node_types=["disease"])
+    >> explorer.records("ALK", "DisGeNET")
+    """
+
+    def __init__(self, data):
+        """
+        @param data: combined table created by combine_sources, or a CompactTable
+        """
+        self.table = compact(data).table
+        metadata = self.table.schema.metadata or {}
+        self.json_columns = set(json.loads(metadata.get(JSON_COLUMNS_KEY, b"[]")))
+        self.annotation_columns = [
+            field.name
+            for field in self.table.schema
+            if field.name not in ID_COLUMNS
+            and (pa.types.is_list(field.type) or field.name in self.json_columns)
+        ]
+        self._masks = {}
+
+    def __len__(self) -> int:
+        return self.table.num_rows
+
+    @property
+    def sources(self) -> List[str]:
+        """namespaces of the target identifiers, e.g. Ensembl."""
+        if "target.source" not in self.table.column_names:
+            return []
+        values = pc.unique(self._strings("target.source")).drop_null()
+        return sorted(values.to_pylist())
+
+    @property
+    def node_types(self) -> Dict[str, List[str]]:
+        """annotation columns of each node type, columns outside the network by name."""
+        node_types = {}
+        for column in self.annotation_columns:
+            node_type = ANNOTATION_NODES.get(column, {}).get("node_type", column)
+            node_types.setdefault(node_type, []).append(column)
+        return node_types
+
+    def _strings(self, column: str) -> pa.ChunkedArray:
+        """return a column with its dictionary-encoded strings decoded."""
+        array = self.table.column(column)
+        if pa.types.is_dictionary(array.type):
+            return array.cast(array.type.value_type)
+        return array
+
+    def _annotated(self, column: str) -> pa.ChunkedArray:
+        """return the rows with at least one record in an annotation column, once per column."""
+        if column not in self._masks:
+            array = self.table.column(column)
+            if column in self.json_columns:
+                mask = pc.and_(pc.is_valid(array), pc.not_equal(array, "[]"))
+            else:
+                mask = pc.greater(pc.list_value_length(array), 0)
+            self._masks[column] = pc.fill_null(mask, False)
+        return self._masks[column]
+
+    def rows(
+        self,
+        sources: Optional[List[str]] = None,
+        node_types: Optional[List[str]] = None,
+    ) -> pa.Array:
+        """return the positions of the rows passing the filters.
+
+        @param sources: keep the rows with one of these target namespaces, all by default
+        @param node_types: keep the rows annotated with one of these node types,
+            all by default
+        """
+        mask = None
+        if sources:
+            mask = pc.is_in(
+                self.table.column("target.source"), value_set=pa.array(sources)
+            )
+        if node_types:
+            columns = [
+                column
+                for node_type in node_types
+                for column in self.node_types.get(node_type, [])
+            ]
+            annotated = pa.array(np.zeros(len(self), dtype=bool))
+            for column in columns:
+                annotated = pc.or_(annotated, self._annotated(column))
+            mask = annotated if mask is None else pc.and_(mask, annotated)
+        if mask is None:
+            return pa.array(np.arange(len(self), dtype=np.int64))
+        return pc.indices_nonzero(mask)
+
+    def count(self, **filters) -> int:
+        """return the number of rows passing the filters, see rows."""
+        return len(self.rows(**filters))
+
+    def page(
+        self,
+        number: int,
+        size: int = PAGE_SIZE,
+        columns: Optional[List[str]] = None,
+        **filters,
+    ) -> pd.DataFrame:
+        """return a page of the filtered rows, annotations as their number of records.
+
+        The index of the page is the position of the rows in the combined table.
+
+        @param number: page number, from 0
+        @param size: number of rows per page
+        @param columns: annotation columns to show, all by default
+        @param filters: see rows
+        """
+        columns = self.annotation_columns if columns is None else columns
+        positions = self.rows(**filters)[number * size : (number + 1) * size]
+        rows = self.table.take(positions)
+
+        page = pd.DataFrame(
+            {
+                column: rows.column(column).to_pandas().to_numpy(dtype=object)
+                for column in ID_COLUMNS
+                if column in rows.column_names
+            },
+            index=positions.to_numpy(zero_copy_only=False),
+        )
+        for column in columns:
+            array = rows.column(column)
+            if column in self.json_columns:
+                counts = [
+                    None if cell is None else len(json.loads(cell))
+                    for cell in array.to_pylist()
+                ]
+            else:
+                counts = pc.list_value_length(array).to_pylist()
+            page[column] = pd.array(counts, dtype="Int64")
+        return page
+
+    def records(self, identifier: str, column: str) -> pd.DataFrame:
+        """return the records of an annotation column for an input identifier.
+
+        @param identifier: input identifier, e.g. a gene symbol
+        @param column: annotation column, e.g. DisGeNET
+        """
+        mask = pc.equal(self._strings("identifier"), identifier)
+        rows = from_arrow_table(
+            self.table.filter(pc.fill_null(mask, False)).select(["target", column])
+        )
+        records = [
+            {"target": target, **record}
+            for target, cell in zip(rows["target"], rows[column])
+            if isinstance(cell, list)
+            for record in cell
+        ]
+        return pd.DataFrame(records)
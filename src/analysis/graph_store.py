@@ -0,0 +1,264 @@
+# coding: utf-8
+
+"""Python file for the in-memory graph of the query results used by the analysis page."""
+
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+# Directions of the neighbor and degree queries, edges go from the genes to
+# their annotations
+DIRECTIONS = ("out", "in", "both")
+
+
+def _csr(rows: np.ndarray, columns: np.ndarray, n_nodes: int):
+    """return the CSR index pointer, the column of each entry and the edge of each entry."""
+    order = np.argsort(rows, kind="stable")
+    indptr = np.zeros(n_nodes + 1, dtype=np.int64)
+    np.cumsum(np.bincount(rows, minlength=n_nodes), out=indptr[1:])
+    return indptr, columns[order], order
+
+
+class GraphStore:
+    """Network of the query results with interned node ids and CSR adjacency.
+
+    Node ids are mapped once to integer indices, in the order of the nodes
+    dataframe. Outgoing and incoming edges are kept in two CSR arrays, so
+    neighbor and degree queries and node type filters cost O(degree).
+
+    Usage example:
+    >> store = GraphStore.from_combined_table(combined_data)
+    >> store.degree("ALK")
+    >> store.neighbors("ALK", node_type="disease")
+    """
+
+    def __init__(self, nodes: pd.DataFrame, edges: pd.DataFrame):
+        """
+        @param nodes: nodes dataframe created by build_network
+        @param edges: edges dataframe created by build_network
+        """
+        node_ids = (
+            nodes["id"].astype(str)
+            if "id" in nodes.columns
+            else pd.Series([], dtype=str)
+        )
+        sources = (
+            edges["source"].astype(str)
+            if "source" in edges.columns
+            else pd.Series([], dtype=str)
+        )
+        targets = (
+            edges["target"].astype(str)
+            if "target" in edges.columns
+            else pd.Series([], dtype=str)
+        )
+
+        # Nodes first so that the node indices follow the nodes dataframe,
+        # edge ends without a node row get new indices
+        codes, ids = pd.factorize(
+            pd.concat([node_ids, sources, targets], ignore_index=True)
+        )
+        n_rows, n_edges = len(node_ids), len(sources)
+        self.ids = ids.to_numpy(dtype=object)
+        self._index: Dict[str, int] = {
+            node_id: index for index, node_id in enumerate(self.ids)
+        }
+
+        node_types = np.full(len(self.ids), "", dtype=object)
+        if "node_type" in nodes.columns:
+            node_types[codes[:n_rows]] = nodes["node_type"].astype(str).to_numpy()
+        type_codes, self.node_types = pd.factorize(node_types)
+        self.node_type_codes = type_codes.astype(np.int32)
+        self.node_types = list(self.node_types)
+
+        self.nodes = nodes.reset_index(drop=True)
+        self._node_rows = np.full(len(self.ids), -1, dtype=np.int64)
+        self._node_rows[codes[:n_rows][::-1]] = np.arange(n_rows)[::-1]
+
+        source_codes = codes[n_rows : n_rows + n_edges]
+        target_codes = codes[n_rows + n_edges :]
+        interaction = (
+            edges["interaction"].astype(str)
+            if "interaction" in edges.columns
+            else pd.Series([""] * n_edges)
+        )
+        interaction_codes, self.interactions = pd.factorize(interaction)
+        self.interactions = list(self.interactions)
+
+        self.out_indptr, self.out_indices, out_edges = _csr(
+            source_codes, target_codes, len(self.ids)
+        )
+        self.in_indptr, self.in_indices, in_edges = _csr(
+            target_codes, source_codes, len(self.ids)
+        )
+        self.out_interactions = interaction_codes[out_edges]
+        self.in_interactions = interaction_codes[in_edges]
+
+    @classmethod
+    def from_combined_table(cls, data: pd.DataFrame) -> "GraphStore":
+        """build the graph of the combined table.
+
+        @param data: the combined table created by combine_sources
+        """
+        from src.visualization.network import build_network
+
+        return cls(*build_network(data))
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    @property
+    def n_edges(self) -> int:
+        return len(self.out_indices)
+
+    def index(self, node_id: str) -> int:
+        """return the integer index of a node id, KeyError when unknown.
+
+        @param node_id: id of the node
+        """
+        return self._index[node_id]
+
+    def __contains__(self, node_id: str) -> bool:
+        return node_id in self._index
+
+    def _type_code(self, node_type: str) -> int:
+        return self.node_types.index(node_type) if node_type in self.node_types else -1
+
+    def neighbor_indices(
+        self,
+        node_id: str,
+        node_type: Optional[str] = None,
+        direction: str = "both",
+    ) -> np.ndarray:
+        """return the indices of the neighbors of a node.
+
+        @param node_id: id of the node
+        @param node_type: keep only the neighbors of this node type
+        @param direction: "out" (annotations of a gene), "in" (genes of an annotation) or "both"
+        """
+        if direction not in DIRECTIONS:
+            raise ValueError(f"direction must be one of {DIRECTIONS}")
+        index = self.index(node_id)
+        parts = []
+        if direction in ("out", "both"):
+            parts.append(
+                self.out_indices[self.out_indptr[index] : self.out_indptr[index + 1]]
+            )
+        if direction in ("in", "both"):
+            parts.append(
+                self.in_indices[self.in_indptr[index] : self.in_indptr[index + 1]]
+            )
+        neighbors = np.concatenate(parts)
+        if node_type is not None:
+            neighbors = neighbors[
+                self.node_type_codes[neighbors] == self._type_code(node_type)
+            ]
+        return neighbors
+
+    def neighbors(
+        self,
+        node_id: str,
+        node_type: Optional[str] = None,
+        direction: str = "both",
+    ) -> List[str]:
+        """return the ids of the neighbors of a node, see neighbor_indices."""
+        return self.ids[self.neighbor_indices(node_id, node_type, direction)].tolist()
+
+    def degree(self, node_id: str, direction: str = "both") -> int:
+        """return the number of edges of a node.
+
+        @param node_id: id of the node
+        @param direction: "out", "in" or "both"
+        """
+        return int(self.degrees(direction)[self.index(node_id)])
+
+    def degrees(self, direction: str = "both") -> np.ndarray:
+        """return the degree of every node, by node index.
+
+        @param direction: "out", "in" or "both"
+        """
+        if direction not in DIRECTIONS:
+            raise ValueError(f"direction must be one of {DIRECTIONS}")
+        degrees = np.zeros(len(self.ids), dtype=np.int64)
+        if direction in ("out", "both"):
+            degrees += np.diff(self.out_indptr)
+        if direction in ("in", "both"):
+            degrees += np.diff(self.in_indptr)
+        return degrees
+
+    def node_type(self, node_id: str) -> str:
+        """return the node type of a node, "" when the node has no row in the nodes dataframe."""
+        return self.node_types[self.node_type_codes[self.index(node_id)]]
+
+    def nodes_of_type(self, node_type: str) -> np.ndarray:
+        """return the indices of the nodes of a node type.
+
+        @param node_type: node type, e.g. "gene" or "disease"
+        """
+        return np.flatnonzero(self.node_type_codes == self._type_code(node_type))
+
+    def top_degree(self, node_type: Optional[str] = None, n: int = 10) -> pd.DataFrame:
+        """return the n nodes with the most edges.
+
+        @param node_type: keep only the nodes of this node type
+        @param n: number of nodes
+        """
+        candidates = (
+            np.arange(len(self.ids))
+            if node_type is None
+            else self.nodes_of_type(node_type)
+        )
+        degrees = self.degrees()[candidates]
+        top = candidates[np.argsort(-degrees, kind="stable")[:n]]
+        return pd.DataFrame(
+            {
+                "id": self.ids[top],
+                "node_type": [
+                    self.node_types[code] for code in self.node_type_codes[top]
+                ],
+                "degree": self.degrees()[top],
+            }
+        )
+
+    def node_attributes(self, node_id: str) -> dict:
+        """return the row of a node in the nodes dataframe, empty when it has none.
+
+        @param node_id: id of the node
+        """
+        row = self._node_rows[self.index(node_id)]
+        return {} if row < 0 else self.nodes.iloc[row].to_dict()
+
+    def neighbor_table(
+        self, node_id: str, node_type: Optional[str] = None
+    ) -> pd.DataFrame:
+        """return the neighbors of a node with their node type and the edge interaction.
+
+        @param node_id: id of the node
+        @param node_type: keep only the neighbors of this node type
+        """
+        index = self.index(node_id)
+        out_slice = slice(self.out_indptr[index], self.out_indptr[index + 1])
+        in_slice = slice(self.in_indptr[index], self.in_indptr[index + 1])
+        neighbors = np.concatenate(
+            [self.out_indices[out_slice], self.in_indices[in_slice]]
+        )
+        interactions = np.concatenate(
+            [self.out_interactions[out_slice], self.in_interactions[in_slice]]
+        )
+        directions = ["out"] * (out_slice.stop - out_slice.start) + ["in"] * (
+            in_slice.stop - in_slice.start
+        )
+        table = pd.DataFrame(
+            {
+                "id": self.ids[neighbors],
+                "node_type": [
+                    self.node_types[code] for code in self.node_type_codes[neighbors]
+                ],
+                "interaction": [self.interactions[code] for code in interactions],
+                "direction": directions,
+            }
+        )
+        if node_type is not None:
+            table = table[table["node_type"] == node_type].reset_index(drop=True)
+        return table
@@ -6,3 +6,28 @@ import os
 
 HERE = os.path.dirname(os.path.realpath(__file__))  # src path
 MAIN_DIR = os.path.join(HERE, "..")  # Main path
+DATA_DIR = os.path.join(MAIN_DIR, "data")  # Data path
+
+# Response cache for BridgeDb and annotator queries
+CACHE_DIR = os.path.join(DATA_DIR, "cache")
+CACHE_TTL = 7 * 24 * 60 * 60  # seconds
+CACHE_MEMORY_SIZE = 64  # entries kept in memory
+
+# Metadata of the query runs
+RUN_LOG_PATH = os.path.join(DATA_DIR, "runs.sqlite")
+RUN_LOG_MAX_AGE = 365 * 24 * 60 * 60  # seconds a run is kept
+
+# Per-gene annotations shared by all the sessions
+RESULT_STORE_DIR = os.path.join(DATA_DIR, "results")
+RESULT_STORE_SIZE = 2 * 1024**3  # bytes of Parquet segments kept on disk
+RESULT_STORE_TTL = CACHE_TTL  # seconds an annotated gene is served from the store
+RESULT_STORE_EMPTY_TTL = 6 * 60 * 60  # seconds a gene without annotation is served
+
+# Batched queries of large identifier lists
+BATCH_SIZE = 2_000  # input identifiers per batch
+CHECKPOINT_DIR = os.path.join(DATA_DIR, "checkpoints")
+
+# Background query jobs
+JOBS_DIR = os.path.join(DATA_DIR, "jobs")  # job table and results
+JOB_WORKERS = 2  # worker processes shared by all the users
+MAX_JOBS_PER_USER = 2  # queued or running jobs of a user
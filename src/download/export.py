@@ -0,0 +1,147 @@
+# coding: utf-8
+
+"""Python file for exporting the query results to compressed files."""
+
+import gzip
+import json
+import os
+import shutil
+import tempfile
+import time
+
+import pandas as pd
+
+from src.query.compact import CompactTable, legacy
+
+# Rows serialized at once
+EXPORT_CHUNKSIZE = 10_000
+
+# Root of the per-session export folders
+EXPORT_DIR = os.path.join(tempfile.gettempdir(), "biodatafuse_exports")
+
+# Export folders older than this (in seconds) are removed
+EXPORT_MAX_AGE = 24 * 60 * 60
+
+
+def session_export_dir(session_id: str) -> str:
+    """return (and create) the export folder of a session.
+
+    @param session_id: identifier of the streamlit session
+    """
+    directory = os.path.join(EXPORT_DIR, session_id)
+    os.makedirs(directory, exist_ok=True)
+    return directory
+
+
+def cleanup_exports(max_age: float = EXPORT_MAX_AGE) -> None:
+    """remove the export folders of sessions older than max_age seconds.
+
+    @param max_age: age in seconds of the folders to be removed
+    """
+    if not os.path.isdir(EXPORT_DIR):
+        return
+    now = time.time()
+    for name in os.listdir(EXPORT_DIR):
+        path = os.path.join(EXPORT_DIR, name)
+        try:
+            if now - os.path.getmtime(path) > max_age:
+                shutil.rmtree(path, ignore_errors=True)
+        except OSError:
+            pass
+
+
+def _chunks(data, chunksize: int):
+    """yield the start row and the dataframe of every chunk of the table.
+
+    A CompactTable is converted to the legacy dataframe one chunk at a time.
+    """
+    if isinstance(data, CompactTable):
+        for chunk in data.iter_legacy(chunksize):
+            yield chunk.index[0], chunk
+        return
+    for start in range(0, len(data), chunksize):
+        yield start, data.iloc[start : start + chunksize]
+
+
+def export_tsv(data: pd.DataFrame, path: str, chunksize: int = EXPORT_CHUNKSIZE) -> str:
+    """write the table to a gzip-compressed TSV file, chunk by chunk.
+
+    @param data: combined output table, a dataframe or a CompactTable
+    @param path: output file
+    @param chunksize: number of rows serialized at once
+    """
+    with gzip.open(path, "wt", encoding="utf-8", newline="") as file:
+        if data.empty:
+            legacy(data).to_csv(file, index=False, sep="\t")
+        for start, chunk in _chunks(data, chunksize):
+            chunk.to_csv(file, index=False, sep="\t", header=start == 0)
+    return path
+
+
+def export_jsonl(
+    data: pd.DataFrame, path: str, chunksize: int = EXPORT_CHUNKSIZE
+) -> str:
+    """write the table to a gzip-compressed JSON-lines file, one row per line.
+
+    @param data: combined output table, a dataframe or a CompactTable
+    @param path: output file
+    @param chunksize: number of rows serialized at once
+    """
+    with gzip.open(path, "wt", encoding="utf-8") as file:
+        for _, chunk in _chunks(data, chunksize):
+            lines = chunk.to_json(orient="records", lines=True, force_ascii=False)
+            file.write(lines.rstrip("\n") + "\n")
+    return path
+
+
+def export_parquet(
+    data: pd.DataFrame, path: str, chunksize: int = EXPORT_CHUNKSIZE
+) -> str:
+    """write the table to a zstd-compressed Parquet file with typed annotation columns.
+
+    @param data: combined output table, a dataframe or a CompactTable
+    @param path: output file
+    @param chunksize: number of rows per row group
+    """
+    from src.download.parquet import write_parquet
+
+    if isinstance(data, CompactTable):
+        data = data.table
+    return write_parquet(data, path, row_group_size=chunksize)
+
+
+def export_json(metadata: dict, path: str) -> str:
+    """write the metadata of the queries to a JSON file.
+
+    @param metadata: metadata of the id mapping and of the queries
+    @param path: output file
+    """
+    with open(path, "w", encoding="utf-8") as file:
+        json.dump(metadata, file, indent=4, ensure_ascii=False)
+    return path
+
+
+# Export formats of the combined table: (function, file extension, mime type)
+EXPORT_FORMATS = {
+    "TSV": (export_tsv, "tsv.gz", "application/gzip"),
+    "JSON lines": (export_jsonl, "jsonl.gz", "application/gzip"),
+    "Parquet": (export_parquet, "parquet", "application/vnd.apache.parquet"),
+}
+
+
+def export_table(data: pd.DataFrame, export_format: str, directory: str, filename: str):
+    """write the table in one of the EXPORT_FORMATS and return the file path.
+
+    @param data: combined output table, a dataframe or a CompactTable
+    @param export_format: key of EXPORT_FORMATS
+    @param directory: output folder, see session_export_dir
+    @param filename: file name without extension
+    """
+    function, extension, _ = EXPORT_FORMATS[export_format]
+    path = os.path.join(directory, f"{filename}.{extension}")
+
+    # Write next to the final file so a download never sees a partial export
+    tmp_path = f"{path}.tmp"
+    function(data, tmp_path)
+    os.replace(tmp_path, path)
+    return path
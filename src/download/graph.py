@@ -0,0 +1,198 @@
+# coding: utf-8
+
+"""Python file for exporting the network to graph files without Cytoscape."""
+
+import gzip
+import json
+import os
+from typing import Iterator
+from xml.sax.saxutils import escape, quoteattr
+
+import pandas as pd
+
+from src.download.export import EXPORT_CHUNKSIZE
+from src.visualization.cytoscape import cx2_aspects
+from src.visualization.network import (
+    PPI_INTERACTION,
+    attribute_type,
+    is_empty,
+    typed_value,
+)
+
+
+def _graphml_keys(frame: pd.DataFrame, columns: list, domain: str, prefix: str):
+    """return the (column, key id, type) of the attributes and their GraphML keys.
+
+    The types given by attribute_type are GraphML types.
+    """
+    keys = []
+    lines = []
+    for position, column in enumerate(columns):
+        key_id = f"{prefix}{position}"
+        value_type = attribute_type(frame[column])
+        keys.append((column, key_id, value_type))
+        lines.append(
+            f'  <key id="{key_id}" for="{domain}" attr.name={quoteattr(str(column))} '
+            f'attr.type="{value_type}"/>\n'
+        )
+    return keys, lines
+
+
+def _graphml_data(row: dict, keys: list) -> str:
+    data = []
+    for column, key_id, value_type in keys:
+        value = row[column]
+        if is_empty(value):
+            continue
+        value = typed_value(value, value_type)
+        if value_type == "boolean":
+            value = str(value).lower()
+        data.append(f'<data key="{key_id}">{escape(str(value))}</data>')
+    return "".join(data)
+
+
+def _records(frame: pd.DataFrame, chunksize: int):
+    """yield the rows of the frame as dicts, chunk by chunk."""
+    for start in range(0, len(frame), chunksize):
+        chunk = frame.iloc[start : start + chunksize]
+        columns = list(chunk.columns)
+        for values in zip(*(chunk[column].tolist() for column in columns)):
+            yield dict(zip(columns, values))
+
+
+def export_graphml(
+    nodes: pd.DataFrame,
+    edges: pd.DataFrame,
+    path: str,
+    chunksize: int = EXPORT_CHUNKSIZE,
+) -> str:
+    """write the network to a GraphML file, chunk by chunk.
+
+    Edges are directed (e.g. gene to disease), except the protein-protein
+    interactions, which are written with directed="false".
+
+    @param nodes: nodes dataframe created by build_network
+    @param edges: edges dataframe created by build_network
+    @param path: output file
+    @param chunksize: number of rows serialized at once
+    """
+    node_columns = [column for column in nodes.columns if column != "id"]
+    edge_columns = [
+        column for column in edges.columns if column not in ("source", "target")
+    ]
+    node_keys, node_lines = _graphml_keys(nodes, node_columns, "node", "n")
+    edge_keys, edge_lines = _graphml_keys(edges, edge_columns, "edge", "e")
+
+    with open(path, "w", encoding="utf-8") as file:
+        file.write('<?xml version="1.0" encoding="UTF-8"?>\n')
+        file.write('<graphml xmlns="http://graphml.graphdrawing.org/xmlns">\n')
+        file.writelines(node_lines + edge_lines)
+        file.write('  <graph id="BioDataFuse" edgedefault="directed">\n')
+        for row in _records(nodes, chunksize):
+            file.write(
+                f"    <node id={quoteattr(str(row['id']))}>"
+                f"{_graphml_data(row, node_keys)}</node>\n"
+            )
+        for row in _records(edges, chunksize):
+            directed = (
+                ' directed="false"' if row.get("interaction") == PPI_INTERACTION else ""
+            )
+            file.write(
+                f"    <edge source={quoteattr(str(row['source']))} "
+                f"target={quoteattr(str(row['target']))}{directed}>"
+                f"{_graphml_data(row, edge_keys)}</edge>\n"
+            )
+        file.write("  </graph>\n</graphml>\n")
+    return path
+
+
+def export_cx2(
+    nodes: pd.DataFrame,
+    edges: pd.DataFrame,
+    path: str,
+    chunksize: int = EXPORT_CHUNKSIZE,
+) -> str:
+    """write the network to a CX2 JSON file with the visual style, one element per line.
+
+    Nodes and edges are converted and written chunk by chunk. The file can be
+    opened in Cytoscape (File > Import > Network from File).
+
+    @param nodes: nodes dataframe created by build_network
+    @param edges: edges dataframe created by build_network
+    @param path: output file
+    @param chunksize: number of rows serialized at once
+    """
+    aspects = cx2_aspects(nodes, edges, "BioDataFuse Network", chunksize)
+    with open(path, "w", encoding="utf-8") as file:
+        file.write("[\n")
+        for position, aspect in enumerate(aspects):
+            if position:
+                file.write(",\n")
+            name, elements = next(iter(aspect.items()))
+            if not isinstance(elements, Iterator):
+                file.write(json.dumps(aspect, ensure_ascii=False))
+                continue
+            file.write(f"{{{json.dumps(name)}: [")
+            for offset, element in enumerate(elements):
+                file.write(",\n" if offset else "\n")
+                file.write(json.dumps(element, ensure_ascii=False))
+            file.write("\n]}")
+        file.write("\n]\n")
+    return path
+
+
+def export_edgelist(
+    nodes: pd.DataFrame,
+    edges: pd.DataFrame,
+    path: str,
+    chunksize: int = EXPORT_CHUNKSIZE,
+) -> str:
+    """write the edges to a gzip-compressed TSV file (source, interaction, target).
+
+    @param nodes: nodes dataframe created by build_network, unused
+    @param edges: edges dataframe created by build_network
+    @param path: output file
+    @param chunksize: number of rows serialized at once
+    """
+    columns = ["source", "interaction", "target"]
+    columns += [column for column in edges.columns if column not in columns]
+    with gzip.open(path, "wt", encoding="utf-8", newline="") as file:
+        if edges.empty:
+            pd.DataFrame(columns=columns).to_csv(file, index=False, sep="\t")
+        for start in range(0, len(edges), chunksize):
+            chunk = edges.iloc[start : start + chunksize].reindex(columns=columns)
+            chunk.to_csv(file, index=False, sep="\t", header=start == 0)
+    return path
+
+
+# Export formats of the network: (function, file extension, mime type)
+GRAPH_FORMATS = {
+    "GraphML": (export_graphml, "graphml", "application/graphml+xml"),
+    "CX2": (export_cx2, "cx2", "application/json"),
+    "Edge list": (export_edgelist, "edges.tsv.gz", "application/gzip"),
+}
+
+
+def export_graph(
+    nodes: pd.DataFrame,
+    edges: pd.DataFrame,
+    graph_format: str,
+    directory: str,
+    filename: str,
+) -> str:
+    """write the network in one of the GRAPH_FORMATS and return the file path.
+
+    @param nodes: nodes dataframe created by build_network
+    @param edges: edges dataframe created by build_network
+    @param graph_format: key of GRAPH_FORMATS
+    @param directory: output folder, see session_export_dir
+    @param filename: file name without extension
+    """
+    function, extension, _ = GRAPH_FORMATS[graph_format]
+    path = os.path.join(directory, f"{filename}.{extension}")
+
+    # Write next to the final file so a download never sees a partial export
+    tmp_path = f"{path}.tmp"
+    function(nodes, edges, tmp_path)
+    os.replace(tmp_path, path)
+    return path
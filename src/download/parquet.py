@@ -0,0 +1,228 @@
+# coding: utf-8
+
+"""Python file for the Arrow schema and the Parquet export of the combined table."""
+
+import json
+from typing import List, Optional
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+# Known fields of the annotator records, the annotation columns are stored as
+# list<struct> with these types. Keys not listed here get an inferred type.
+ANNOTATION_FIELDS = {
+    "WikiPathways": [
+        ("pathway_id", pa.string()),
+        ("pathway_label", pa.string()),
+        ("pathway_gene_count", pa.float64()),
+    ],
+    "DisGeNET": [
+        ("diseaseid", pa.string()),
+        ("disease_name", pa.string()),
+        ("disease_class", pa.string()),
+        ("disease_class_name", pa.string()),
+        ("disease_type", pa.string()),
+        ("disease_semantic_type", pa.string()),
+        ("score", pa.float64()),
+        ("ei", pa.float64()),
+        ("el", pa.string()),
+        ("source", pa.string()),
+        ("gene_dsi", pa.float64()),
+        ("gene_dpi", pa.float64()),
+        ("gene_pli", pa.float64()),
+    ],
+    "OpenTargets_Location": [
+        ("location", pa.string()),
+        ("loc_identifier", pa.string()),
+        ("subcellular_loc", pa.string()),
+    ],
+    "OpenTargets_Diseases": [
+        ("disease_id", pa.string()),
+        ("disease_name", pa.string()),
+        ("therapeutic_areas", pa.string()),
+    ],
+    "GO_Process": [
+        ("go_id", pa.string()),
+        ("go_name", pa.string()),
+    ],
+    "Reactome_Pathways": [
+        ("pathway_id", pa.string()),
+        ("pathway_name", pa.string()),
+    ],
+    "ChEMBL_Drugs": [
+        ("chembl_id", pa.string()),
+        ("drug_name", pa.string()),
+        ("relation", pa.string()),
+    ],
+    "stringdb": [
+        ("stringdb_link_to", pa.string()),
+        ("score", pa.float64()),
+    ],
+}
+
+# Schema metadata key listing the columns stored as JSON strings
+JSON_COLUMNS_KEY = b"biodatafuse.json_columns"
+
+PARQUET_COMPRESSION = "zstd"
+PARQUET_ROW_GROUP_SIZE = 50_000
+
+
+def _is_annotation_column(column: pd.Series) -> bool:
+    """check if a column holds lists of dicts (and missing values)."""
+    if column.dtype != object:
+        return False
+    for cell in column:
+        if isinstance(cell, list):
+            if cell and not isinstance(cell[0], dict):
+                return False
+            if cell:
+                return True
+        elif not _is_missing(cell):
+            return False
+    return False
+
+
+def annotation_type(column_name: str, column: pd.Series) -> pa.DataType:
+    """return the list<struct> type of an annotation column.
+
+    The struct holds the keys present in the records: known keys with their
+    declared type, other keys with the type inferred from their values.
+
+    @param column_name: name of the column in the combined table
+    @param column: the list-of-dict column
+    """
+    known = dict(ANNOTATION_FIELDS.get(column_name, []))
+    keys = {}
+    for cell in column:
+        if isinstance(cell, list):
+            for record in cell:
+                for key in record:
+                    keys.setdefault(key, None)
+
+    fields = []
+    for key in keys:
+        if key in known:
+            fields.append(pa.field(key, known[key]))
+        else:
+            values = [
+                record.get(key)
+                for cell in column
+                if isinstance(cell, list)
+                for record in cell
+            ]
+            field_type = pa.infer_type(values, from_pandas=True)
+            fields.append(
+                pa.field(key, pa.string() if field_type == pa.null() else field_type)
+            )
+    return pa.list_(pa.struct(fields))
+
+
+def _is_missing(cell) -> bool:
+    return cell is None or (isinstance(cell, float) and pd.isna(cell))
+
+
+def _null_cells(column: pd.Series) -> list:
+    """replace the missing cells (NaN) of a list column by None."""
+    return [cell if isinstance(cell, list) else None for cell in column]
+
+
+def to_arrow_table(data: pd.DataFrame) -> pa.Table:
+    """convert the combined table to an Arrow table.
+
+    Annotation columns become typed list<struct> columns. A column whose
+    values do not fit a single type is stored as JSON strings instead and
+    listed in the schema metadata.
+
+    @param data: the combined table created by combine_sources
+    """
+    arrays = []
+    fields = []
+    json_columns = []
+    for name in data.columns:
+        column = data[name]
+        try:
+            if _is_annotation_column(column):
+                array = pa.array(
+                    _null_cells(column),
+                    type=annotation_type(name, column),
+                    from_pandas=True,
+                )
+            else:
+                array = pa.Array.from_pandas(column)
+        except (pa.ArrowInvalid, pa.ArrowTypeError):
+            array = pa.array(
+                [None if _is_missing(cell) else json.dumps(cell) for cell in column],
+                type=pa.string(),
+            )
+            json_columns.append(name)
+        arrays.append(array)
+        fields.append(pa.field(str(name), array.type))
+
+    schema = pa.schema(fields, metadata={JSON_COLUMNS_KEY: json.dumps(json_columns)})
+    return pa.Table.from_arrays(arrays, schema=schema)
+
+
+def from_arrow_table(table: pa.Table) -> pd.DataFrame:
+    """convert an Arrow table created by to_arrow_table back to the combined table.
+
+    Annotation columns are lists of dicts again, missing cells are None and
+    records miss no key of their column (absent keys are None).
+
+    @param table: Arrow table
+    """
+    metadata = table.schema.metadata or {}
+    json_columns = set(json.loads(metadata.get(JSON_COLUMNS_KEY, b"[]")))
+
+    columns = {}
+    for field, column in zip(table.schema, table.columns):
+        if field.name in json_columns:
+            columns[field.name] = [
+                None if cell is None else json.loads(cell)
+                for cell in column.to_pylist()
+            ]
+        elif pa.types.is_list(field.type):
+            columns[field.name] = column.to_pylist()
+        elif pa.types.is_dictionary(field.type):
+            # Dictionary-encoded strings, see CompactTable
+            columns[field.name] = column.cast(field.type.value_type).to_pandas()
+        else:
+            columns[field.name] = column.to_pandas()
+    return pd.DataFrame(columns)
+
+
+def write_parquet(
+    data: pd.DataFrame,
+    path: str,
+    row_group_size: int = PARQUET_ROW_GROUP_SIZE,
+    compression: str = PARQUET_COMPRESSION,
+) -> str:
+    """write the combined table to a Parquet file.
+
+    @param data: the combined table created by combine_sources, or its Arrow table
+    @param path: output file
+    @param row_group_size: number of rows per row group
+    @param compression: Parquet compression codec
+    """
+    pq.write_table(
+        data if isinstance(data, pa.Table) else to_arrow_table(data),
+        path,
+        compression=compression,
+        row_group_size=row_group_size,
+    )
+    return path
+
+
+def read_parquet(
+    path: str,
+    columns: Optional[List[str]] = None,
+    filters: Optional[list] = None,
+) -> pd.DataFrame:
+    """read a Parquet file written by write_parquet back into the combined table.
+
+    @param path: Parquet file
+    @param columns: columns to read, all by default
+    @param filters: row filters pushed down to the row groups,
+        e.g. [("target.source", "==", "Ensembl")]
+    """
+    return from_arrow_table(pq.read_table(path, columns=columns, filters=filters))
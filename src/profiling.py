@@ -0,0 +1,157 @@
+# coding: utf-8
+
+"""Python file for timing the stages of a query."""
+
+import cProfile
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Iterable, List, Optional
+
+import pandas as pd
+
+
+def rss_mb() -> float:
+    """return the resident memory of the process in MB (peak memory when unavailable)."""
+    try:
+        with open("/proc/self/statm") as file:
+            pages = int(file.read().split()[1])
+        return pages * os.sysconf("SC_PAGE_SIZE") / 1024**2
+    except (OSError, ValueError, IndexError):
+        import resource
+
+        # kilobytes on Linux, bytes on macOS
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / 1024**2 if peak > 1024**3 else peak / 1024
+
+
+def _is_table(value) -> bool:
+    return isinstance(value, pd.DataFrame) or hasattr(value, "num_rows")
+
+
+def count_rows(value) -> Optional[int]:
+    """return the number of rows of a table, or of the first table of a tuple.
+
+    Tables are dataframes and objects with a num_rows, e.g. a CompactTable.
+    """
+    if _is_table(value):
+        return len(value)
+    if isinstance(value, tuple) and value and _is_table(value[0]):
+        return len(value[0])
+    return None
+
+
+class Span:
+    """Timing of one stage, filled by Profiler.span."""
+
+    def __init__(self, name: str, rows_in: Optional[int] = None):
+        self.name = name
+        self.rows_in = rows_in
+        self.rows_out = None
+        self.seconds = 0.0
+        self.memory_mb = 0.0
+        self.memory_delta_mb = 0.0
+
+    def set_output(self, value) -> None:
+        """record the number of rows of the stage output.
+
+        @param value: dataframe (or tuple starting with a dataframe) produced by the stage
+        """
+        self.rows_out = count_rows(value)
+
+    def as_dict(self) -> dict:
+        return {
+            "stage": self.name,
+            "seconds": round(self.seconds, 3),
+            "rows_in": self.rows_in,
+            "rows_out": self.rows_out,
+            "memory_mb": round(self.memory_mb, 1),
+            "memory_delta_mb": round(self.memory_delta_mb, 1),
+        }
+
+
+class Profiler:
+    """Collect the wall time, rows and memory of the stages of a query.
+
+    Spans can be opened from worker threads. The memory is the resident memory
+    of the whole process, so concurrent spans see each other's allocations.
+
+    Usage example:
+    >> profiler = Profiler()
+    >> with profiler.span("BridgeDb mapping", rows_in=len(identifiers_df)) as span:
+    >>     bridgedb_df, _ = bridgedb_xref(...)
+    >>     span.set_output(bridgedb_df)
+    >> profiler.report()
+    """
+
+    def __init__(self):
+        self.spans: List[Span] = []
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def span(self, name: str, rows_in: Optional[int] = None):
+        """time the code of the with block.
+
+        @param name: name of the stage
+        @param rows_in: number of input rows of the stage
+        """
+        span = Span(name, rows_in)
+        memory_before = rss_mb()
+        start = time.perf_counter()
+        try:
+            yield span
+        finally:
+            span.seconds = time.perf_counter() - start
+            span.memory_mb = rss_mb()
+            span.memory_delta_mb = span.memory_mb - memory_before
+            with self._lock:
+                self.spans.append(span)
+
+    def timed(self, name: str, function, rows_in: Optional[int] = None):
+        """return the function wrapped in a span recording its output rows.
+
+        @param name: name of the stage
+        @param function: function to be timed
+        @param rows_in: number of input rows of the stage
+        """
+
+        def wrapper(*args, **kwargs):
+            with self.span(name, rows_in=rows_in) as span:
+                value = function(*args, **kwargs)
+                span.set_output(value)
+            return value
+
+        return wrapper
+
+    def reset(self, keep: Iterable[str] = ()) -> None:
+        """remove the recorded spans except the ones named in keep.
+
+        @param keep: names of the spans to keep
+        """
+        keep = set(keep)
+        with self._lock:
+            self.spans = [span for span in self.spans if span.name in keep]
+
+    def report(self) -> List[dict]:
+        """return the recorded spans in the order they finished."""
+        with self._lock:
+            return [span.as_dict() for span in self.spans]
+
+
+@contextmanager
+def cprofile_to(path: str):
+    """profile the with block with cProfile and dump the pstats file to path.
+
+    Only the calling thread is profiled, run the annotators sequentially to
+    include them.
+
+    @param path: output pstats file
+    """
+    profile = cProfile.Profile()
+    profile.enable()
+    try:
+        yield profile
+    finally:
+        profile.disable()
+        profile.dump_stats(path)
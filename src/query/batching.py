@@ -0,0 +1,233 @@
+# coding: utf-8
+
+"""Python file for querying large identifier lists in resumable batches."""
+
+import os
+import pickle
+import shutil
+import time
+from typing import Callable, List, Optional
+
+import pandas as pd
+
+from src.constants import BATCH_SIZE, CHECKPOINT_DIR
+from src.query.pipeline import content_hash
+from src.query.result_store import SET_DEPENDENT_SOURCES
+from src.utils import SourceAccumulator
+
+
+def split_batches(bridgedb_df: pd.DataFrame, batch_size: int = BATCH_SIZE) -> list:
+    """split the BridgeDb output into batches of input identifiers.
+
+    All the rows of an input identifier stay in the same batch.
+
+    @param bridgedb_df: BridgeDb output
+    @param batch_size: number of input identifiers per batch
+    """
+    codes, uniques = pd.factorize(bridgedb_df["identifier"])
+    n_batches = max(1, -(-len(uniques) // batch_size))
+    batch_of_row = codes // batch_size
+    return [
+        bridgedb_df[batch_of_row == batch].reset_index(drop=True)
+        for batch in range(n_batches)
+    ]
+
+
+class BatchRunner:
+    """Query the selected databases batch by batch, with retries and checkpoints.
+
+    Each finished batch is saved in a checkpoint folder derived from the input,
+    so running the same query again after a failure only queries the missing
+    batches. The checkpoints are removed once the whole query succeeded.
+
+    Sources whose result depends on the whole identifier set (STRING-DB links
+    the input genes together) are queried once with all the identifiers.
+
+    Usage example:
+    >> runner = BatchRunner(batch_size=1000)
+    >> combined_data, metadata, warnings = runner.run(bridgedb_df, selected_sources_list)
+    """
+
+    def __init__(
+        self,
+        batch_size: int = BATCH_SIZE,
+        retries: int = 3,
+        backoff: float = 2.0,
+        checkpoint_dir: str = CHECKPOINT_DIR,
+        query: Optional[Callable] = None,
+    ):
+        """
+        @param batch_size: number of input identifiers per batch
+        @param retries: number of retries of a failed batch
+        @param backoff: wait before the first retry in seconds, doubled at each retry
+        @param checkpoint_dir: root folder of the checkpoints
+        @param query: function (bridgedb_df, selected_sources_list) returning the
+            combined table, the metadata and the warnings, query_selected_sources by default
+        """
+        if query is None:
+            from src.query.process_sources import query_selected_sources
+
+            def query(bridgedb_df, selected_sources_list):
+                return query_selected_sources(
+                    bridgedb_df,
+                    selected_sources_list,
+                    persist=False,
+                    raise_on_timeout=True,
+                )
+
+        self.batch_size = batch_size
+        self.retries = retries
+        self.backoff = backoff
+        self.checkpoint_dir = checkpoint_dir
+        self.query = query
+
+    def _query_with_retry(self, batch_df: pd.DataFrame, selected_sources_list: list):
+        for attempt in range(self.retries + 1):
+            try:
+                return self.query(batch_df, selected_sources_list)
+            except Exception:
+                if attempt == self.retries:
+                    raise
+                time.sleep(self.backoff * 2**attempt)
+
+    def _checkpointed(self, path: str, batch_df: pd.DataFrame, sources: list):
+        """return the result saved at path, or query it and save it."""
+        if os.path.exists(path):
+            with open(path, "rb") as file:
+                return pickle.load(file), False
+        data, metadata, warnings = self._query_with_retry(batch_df, sources)
+        result = (data, plain_metadata(metadata), warnings)
+        with open(f"{path}.tmp", "wb") as file:
+            pickle.dump(result, file, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(f"{path}.tmp", path)
+        return result, True
+
+    def run(
+        self,
+        bridgedb_df: pd.DataFrame,
+        selected_sources_list: list,
+        progress: Optional[Callable[[int, int, float], None]] = None,
+    ):
+        """query all the batches and combine their results.
+
+        @param bridgedb_df: BridgeDb output for creating the list of gene ids to query
+        @param selected_sources_list: list of selected databases
+        @param progress: function (batches done, number of batches, identifiers
+            per second) called after each batch
+        """
+        batched_sources = [
+            selected
+            for selected in selected_sources_list
+            if selected[0] not in SET_DEPENDENT_SOURCES
+        ]
+        whole_sources = [
+            selected
+            for selected in selected_sources_list
+            if selected[0] in SET_DEPENDENT_SOURCES
+        ]
+        batches = (
+            split_batches(bridgedb_df, self.batch_size)
+            if batched_sources or not whole_sources
+            else []
+        )
+        steps = len(batches) + bool(whole_sources)
+        run_dir = os.path.join(
+            self.checkpoint_dir,
+            content_hash([bridgedb_df, selected_sources_list, self.batch_size]),
+        )
+        os.makedirs(run_dir, exist_ok=True)
+
+        results = []
+        queried = 0
+        start = time.perf_counter()
+        for position, batch_df in enumerate(batches):
+            result, fetched = self._checkpointed(
+                os.path.join(run_dir, f"batch_{position:05d}.pkl"),
+                batch_df,
+                batched_sources,
+            )
+            if fetched:
+                queried += batch_df["identifier"].nunique()
+            results.append(result)
+
+            if progress is not None:
+                elapsed = time.perf_counter() - start
+                progress(position + 1, steps, queried / elapsed if elapsed else 0.0)
+
+        whole = None
+        if whole_sources:
+            whole, fetched = self._checkpointed(
+                os.path.join(run_dir, "whole_set.pkl"), bridgedb_df, whole_sources
+            )
+            if fetched:
+                queried += bridgedb_df["identifier"].nunique()
+            if progress is not None:
+                elapsed = time.perf_counter() - start
+                progress(steps, steps, queried / elapsed if elapsed else 0.0)
+
+        shutil.rmtree(run_dir, ignore_errors=True)
+        combined_data, metadata, warnings = _combine_batches(results)
+        if whole is not None:
+            whole_data, whole_metadata, whole_warnings = whole
+            combined_data = SourceAccumulator([combined_data, whole_data]).result()
+            metadata = {**metadata, **whole_metadata}
+            warnings = warnings + whole_warnings
+        return combined_data, metadata, warnings
+
+
+def plain_metadata(metadata):
+    """convert nested defaultdicts (not picklable with their factory) to dicts."""
+    if isinstance(metadata, dict):
+        return {key: plain_metadata(value) for key, value in metadata.items()}
+    return metadata
+
+
+# Metadata fields counting the queried items, summed over the batches
+SUMMED_METADATA_KEYS = {"size", "count", "rows"}
+
+
+def _merge_metadata(values: list, key=None):
+    """merge the metadata of the batches.
+
+    Counts (e.g. query sizes, see SUMMED_METADATA_KEYS) are summed, other
+    values equal in every batch are kept once and the rest (e.g. query dates)
+    are listed batch by batch.
+    """
+    if all(isinstance(value, dict) for value in values):
+        keys = list(dict.fromkeys(name for value in values for name in value))
+        return {
+            name: _merge_metadata(
+                [value[name] for value in values if name in value], name
+            )
+            for name in keys
+        }
+    if key in SUMMED_METADATA_KEYS and all(
+        isinstance(value, (int, float)) and not isinstance(value, bool)
+        for value in values
+    ):
+        return sum(values)
+    if all(value == values[0] for value in values[1:]):
+        return values[0]
+    return values
+
+
+def _combine_batches(results: List[tuple]):
+    """stack the results of the batches.
+
+    The metadata of the batches is merged, see _merge_metadata. A warning is
+    kept only when every batch raised it (e.g. no annotation at all for a
+    datasource).
+    """
+    frames = [data for data, _, _ in results if not data.empty]
+    combined_data = (
+        pd.concat(frames, ignore_index=True, sort=False) if frames else pd.DataFrame()
+    )
+    metadata = (
+        _merge_metadata([metadata for _, metadata, _ in results]) if results else {}
+    )
+    warnings = [
+        warning
+        for warning in (results[0][2] if results else [])
+        if all(warning in batch_warnings for _, _, batch_warnings in results)
+    ]
+    return combined_data, metadata, warnings
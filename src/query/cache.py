@@ -0,0 +1,242 @@
+# coding: utf-8
+
+"""Python file for caching the BridgeDb mapping and the annotator results."""
+
+import hashlib
+import json
+import os
+import pickle
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Iterable, Optional
+
+import pandas as pd
+
+from src.constants import CACHE_DIR, CACHE_MEMORY_SIZE, CACHE_TTL
+
+_MISSING = object()
+
+
+def is_empty_result(value: Any) -> bool:
+    """check if a query result has no rows, e.g. after a failed request.
+
+    @param value: dataframe, or tuple starting with a dataframe (data, metadata)
+    """
+    if isinstance(value, tuple) and value:
+        value = value[0]
+    return isinstance(value, pd.DataFrame) and value.empty
+
+
+def make_key(
+    identifiers: Iterable[str],
+    input_datasource: str,
+    species: str,
+    source: str,
+    option: Optional[str] = None,
+) -> str:
+    """create a cache key for a query.
+
+    @param identifiers: queried identifiers, the order and duplicates are ignored
+    @param input_datasource: datasource of the identifiers (e.g. "NCBI Gene")
+    @param species: queried species (e.g. "Human")
+    @param source: queried database (e.g. "BridgeDb", "OpenTarget")
+    @param option: option of the queried database (e.g. "Gene Ontology (GO)")
+    """
+    payload = json.dumps(
+        [sorted(set(map(str, identifiers))), input_datasource, species, source, option]
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """Two-tier cache: an LRU memory tier in front of a TTL-expired disk tier.
+
+    Usage example:
+    >> cache = ResponseCache()
+    >> key = make_key(["1234"], "NCBI Gene", "Human", "WikiPathway")
+    >> data, metadata = cache.get_or_compute(key, lambda: query(...))
+    """
+
+    def __init__(
+        self,
+        directory: Optional[str] = CACHE_DIR,
+        ttl: float = CACHE_TTL,
+        memory_size: int = CACHE_MEMORY_SIZE,
+    ):
+        """
+        @param directory: folder of the disk tier, None to keep the cache in memory only
+        @param ttl: time to live of an entry in seconds
+        @param memory_size: number of entries kept in the memory tier
+        """
+        self.directory = directory
+        self.ttl = ttl
+        self.memory_size = memory_size
+        self.stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0}
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+
+        if self.directory is not None:
+            os.makedirs(self.directory, exist_ok=True)
+            self.evict_expired()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.pkl")
+
+    def _expired(self, created: float) -> bool:
+        return time.time() - created > self.ttl
+
+    def _remember(self, key: str, created: float, value: Any) -> None:
+        """store an entry in the memory tier, evicting the least recently used."""
+        self._memory[key] = (created, value)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_size:
+            self._memory.popitem(last=False)
+
+    def get(self, key: str, default: Any = None) -> Any:
+        """return the cached value of the key, or default when missing or expired.
+
+        @param key: key created by make_key
+        @param default: value returned on a cache miss
+        """
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                created, value = entry
+                if not self._expired(created):
+                    self._memory.move_to_end(key)
+                    self.stats["memory_hits"] += 1
+                    return value
+                del self._memory[key]
+
+        if self.directory is not None:
+            path = self._path(key)
+            try:
+                created = os.path.getmtime(path)
+                if self._expired(created):
+                    os.remove(path)
+                else:
+                    with open(path, "rb") as file:
+                        value = pickle.load(file)
+                    with self._lock:
+                        self._remember(key, created, value)
+                        self.stats["disk_hits"] += 1
+                    return value
+            except (OSError, pickle.UnpicklingError, EOFError):
+                pass
+
+        with self._lock:
+            self.stats["misses"] += 1
+        return default
+
+    def put(self, key: str, value: Any) -> None:
+        """store a value in both tiers.
+
+        @param key: key created by make_key
+        @param value: picklable value to be cached
+        """
+        created = time.time()
+        with self._lock:
+            self._remember(key, created, value)
+
+        if self.directory is None:
+            return
+
+        # Write to a temporary file first so readers never see a partial entry
+        path = self._path(key)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp_path, "wb") as file:
+                pickle.dump(value, file, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, path)
+        except (OSError, pickle.PicklingError, TypeError, AttributeError):
+            # Unpicklable values or a read-only disk only use the memory tier
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def get_or_compute(self, key: str, compute: Callable[[], Any]) -> Any:
+        """return the cached value of the key, computing and caching it on a miss.
+
+        Empty results are not cached: the annotators and BridgeDb also return
+        them when a request fails, and the next query should try again.
+
+        @param key: key created by make_key
+        @param compute: function without arguments returning the value
+        """
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            value = compute()
+            if not is_empty_result(value):
+                self.put(key, value)
+        return value
+
+    def evict_expired(self) -> int:
+        """remove the expired entries of the disk tier and return their number."""
+        if self.directory is None:
+            return 0
+
+        removed = 0
+        for filename in os.listdir(self.directory):
+            if not filename.endswith(".pkl"):
+                continue
+            path = os.path.join(self.directory, filename)
+            try:
+                if self._expired(os.path.getmtime(path)):
+                    os.remove(path)
+                    removed += 1
+            except OSError:
+                pass
+        return removed
+
+    def clear(self) -> None:
+        """remove all the entries of both tiers."""
+        with self._lock:
+            self._memory.clear()
+        if self.directory is not None:
+            for filename in os.listdir(self.directory):
+                if filename.endswith(".pkl"):
+                    os.remove(os.path.join(self.directory, filename))
+
+
+_response_cache = None
+
+
+def get_response_cache() -> ResponseCache:
+    """return the response cache shared by all the sessions of the server."""
+    global _response_cache
+    if _response_cache is None:
+        _response_cache = ResponseCache()
+    return _response_cache
+
+
+def cached_bridgedb_xref(
+    identifiers: pd.DataFrame,
+    input_species: str,
+    input_datasource: str,
+    output_datasource: str = "All",
+):
+    """map the identifiers with BridgeDb, reusing previous mappings of the same input.
+
+    @param identifiers: dataframe with an "identifier" column
+    @param input_species: species of the identifiers (e.g. "Human")
+    @param input_datasource: datasource of the identifiers (e.g. "NCBI Gene")
+    @param output_datasource: datasource to map to, "All" for every datasource
+    """
+    from pyBiodatafuse import id_mapper
+
+    key = make_key(
+        identifiers["identifier"],
+        input_datasource,
+        input_species,
+        "BridgeDb",
+        output_datasource,
+    )
+    return get_response_cache().get_or_compute(
+        key,
+        lambda: id_mapper.bridgedb_xref(
+            identifiers=identifiers,
+            input_species=input_species,
+            input_datasource=input_datasource,
+            output_datasource=output_datasource,
+        ),
+    )
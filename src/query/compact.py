@@ -0,0 +1,213 @@
+# coding: utf-8
+
+"""Python file for the compact in-memory form of the combined table."""
+
+import sys
+from typing import Iterator, List, Optional
+
+import pandas as pd
+import pyarrow as pa
+
+from src.download.parquet import from_arrow_table, to_arrow_table
+from src.utils import ID_COLUMNS
+
+
+def _encode(array: pa.Array) -> pa.Array:
+    """dictionary-encode the strings of an array, inside lists and structs too."""
+    if pa.types.is_string(array.type) or pa.types.is_large_string(array.type):
+        return array.dictionary_encode()
+    if pa.types.is_struct(array.type):
+        return pa.StructArray.from_arrays(
+            [
+                _encode(array.field(position))
+                for position in range(array.type.num_fields)
+            ],
+            fields=[
+                pa.field(field.name, _encode_type(field.type), field.nullable)
+                for field in array.type
+            ],
+            mask=array.is_null() if array.null_count else None,
+        )
+    if pa.types.is_list(array.type):
+        # Offsets of a sliced array start inside the values
+        array = pa.concat_arrays([array]) if array.offset else array
+        return pa.ListArray.from_arrays(
+            array.offsets,
+            _encode(array.values),
+            mask=array.is_null() if array.null_count else None,
+        )
+    return array
+
+
+def _encode_type(data_type: pa.DataType) -> pa.DataType:
+    if pa.types.is_string(data_type) or pa.types.is_large_string(data_type):
+        return pa.dictionary(pa.int32(), data_type)
+    if pa.types.is_struct(data_type):
+        return pa.struct(
+            [
+                pa.field(field.name, _encode_type(field.type), field.nullable)
+                for field in data_type
+            ]
+        )
+    if pa.types.is_list(data_type):
+        return pa.list_(_encode_type(data_type.value_type))
+    return data_type
+
+
+class CompactTable:
+    """Combined table held as an Arrow table with dictionary-encoded strings.
+
+    The identifier columns and the string fields of the annotation records
+    are stored once per distinct value, the records as typed list<struct>
+    columns (see to_arrow_table). The legacy dataframe, with lists of dicts,
+    is only built when asked for, for all the rows or chunk by chunk.
+
+    Usage example:
+    >> table = CompactTable.from_legacy(combined_data)
+    >> table.nbytes
+    >> table.to_legacy(columns=["identifier", "GO_Process"])
+    """
+
+    def __init__(self, table: pa.Table):
+        """
+        @param table: Arrow table created by to_arrow_table, encoded or not
+        """
+        columns = [
+            pa.chunked_array(
+                [_encode(chunk) for chunk in column.chunks],
+                type=_encode_type(column.type),
+            )
+            for column in table.columns
+        ]
+        self.table = pa.Table.from_arrays(
+            columns,
+            schema=pa.schema(
+                [
+                    pa.field(field.name, column.type)
+                    for field, column in zip(table.schema, columns)
+                ],
+                metadata=table.schema.metadata,
+            ),
+        )
+
+    @classmethod
+    def from_legacy(cls, data: pd.DataFrame) -> "CompactTable":
+        """convert the combined table created by combine_sources.
+
+        @param data: combined table with lists of dicts in the annotation columns
+        """
+        return cls(to_arrow_table(data))
+
+    def __len__(self) -> int:
+        return self.table.num_rows
+
+    @property
+    def num_rows(self) -> int:
+        return self.table.num_rows
+
+    @property
+    def empty(self) -> bool:
+        return self.table.num_rows == 0 or self.table.num_columns == 0
+
+    @property
+    def columns(self) -> List[str]:
+        return self.table.column_names
+
+    @property
+    def nbytes(self) -> int:
+        """size of the Arrow buffers in bytes."""
+        return self.table.get_total_buffer_size()
+
+    def to_legacy(self, columns: Optional[List[str]] = None) -> pd.DataFrame:
+        """return the combined table as built by combine_sources.
+
+        @param columns: columns to convert, all by default
+        """
+        table = self.table
+        if columns is not None:
+            table = table.select(
+                [column for column in columns if column in self.columns]
+            )
+        return from_arrow_table(table)
+
+    def iter_legacy(self, chunksize: int) -> Iterator[pd.DataFrame]:
+        """yield the legacy dataframe chunk by chunk, with a continuous index.
+
+        @param chunksize: number of rows per chunk
+        """
+        for start in range(0, self.num_rows, chunksize):
+            chunk = from_arrow_table(self.table.slice(start, chunksize))
+            chunk.index = range(start, start + len(chunk))
+            yield chunk
+
+    def identifiers(self) -> pd.DataFrame:
+        """return the identifier columns as pandas categoricals, without the annotations."""
+        columns = [column for column in ID_COLUMNS if column in self.columns]
+        return self.table.select(columns).to_pandas()
+
+
+def compact(data) -> CompactTable:
+    """return the compact form of a combined table, unchanged when already compact.
+
+    @param data: combined table created by combine_sources, or a CompactTable
+    """
+    return data if isinstance(data, CompactTable) else CompactTable.from_legacy(data)
+
+
+def legacy(data, columns: Optional[List[str]] = None) -> pd.DataFrame:
+    """return the legacy dataframe of a combined table, converting a CompactTable.
+
+    @param data: combined table created by combine_sources, or a CompactTable
+    @param columns: columns to convert, all by default
+    """
+    if isinstance(data, CompactTable):
+        return data.to_legacy(columns)
+    if columns is not None:
+        return data[[column for column in columns if column in data.columns]]
+    return data
+
+
+def deep_size(data: pd.DataFrame) -> int:
+    """return the memory of a dataframe in bytes, nested lists and dicts included.
+
+    Objects shared by several cells (e.g. interned strings) are counted once.
+
+    @param data: dataframe with object columns
+    """
+    seen = set()
+
+    def size(value) -> int:
+        if id(value) in seen:
+            return 0
+        seen.add(id(value))
+        total = sys.getsizeof(value)
+        if isinstance(value, dict):
+            total += sum(size(key) + size(item) for key, item in value.items())
+        elif isinstance(value, (list, tuple)):
+            total += sum(size(item) for item in value)
+        return total
+
+    total = int(data.index.memory_usage())
+    for column in data.columns:
+        values = data[column]
+        if values.dtype == object:
+            total += values.to_numpy().nbytes
+            total += sum(size(value) for value in values.to_numpy())
+        else:
+            total += int(values.memory_usage(index=False, deep=True))
+    return total
+
+
+def memory_report(data: pd.DataFrame) -> dict:
+    """return the memory in bytes of the legacy and of the compact form of a combined table.
+
+    @param data: combined table created by combine_sources
+    """
+    legacy_bytes = deep_size(data)
+    compact_bytes = CompactTable.from_legacy(data).nbytes
+    return {
+        "rows": len(data),
+        "legacy_bytes": legacy_bytes,
+        "compact_bytes": compact_bytes,
+        "ratio": round(legacy_bytes / compact_bytes, 1) if compact_bytes else None,
+    }
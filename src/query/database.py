@@ -0,0 +1,44 @@
+# coding: utf-8
+
+"""Python file for the SQLite connections shared by the job table, the result store and the run log."""
+
+import sqlite3
+from contextlib import contextmanager
+
+# Seconds a connection waits for the write lock of another one
+BUSY_TIMEOUT = 30
+
+
+@contextmanager
+def transaction(path: str, write: bool = True, row_factory=None):
+    """open a connection to a database in WAL mode and run the block in a transaction.
+
+    A write transaction takes the write lock of the database at once (BEGIN
+    IMMEDIATE), so concurrent writers wait instead of failing on upgrade. A
+    read transaction is deferred: it reads a snapshot without taking the
+    lock, so readers never wait for each other nor for the writers.
+
+    @param path: database file
+    @param write: the block writes to the database
+    @param row_factory: row factory of the connection, e.g. sqlite3.Row
+
+    Usage example:
+    >> with transaction(path, write=False) as connection:
+    >>     connection.execute("SELECT ...").fetchall()
+    """
+    connection = sqlite3.connect(path, timeout=BUSY_TIMEOUT, isolation_level=None)
+    if row_factory is not None:
+        connection.row_factory = row_factory
+    try:
+        if write:
+            # Persistent, a no-op once the database is in WAL mode
+            connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("BEGIN IMMEDIATE" if write else "BEGIN DEFERRED")
+        try:
+            yield connection
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+        connection.execute("COMMIT")
+    finally:
+        connection.close()
@@ -0,0 +1,133 @@
+# coding: utf-8
+
+"""Python file for the BridgeDb datasources and the lookup of the mapped identifiers."""
+
+import os
+import threading
+import weakref
+from functools import lru_cache
+from importlib import resources
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+from pyBiodatafuse import constants
+
+
+def _datasources_path() -> str:
+    """return the path of the BridgeDb datasources file shipped with pyBiodatafuse."""
+    bridgedb_dir = getattr(constants, "BRIDGEDB_DIR", None)
+    if bridgedb_dir and os.path.exists(os.path.join(bridgedb_dir, "datasources.tsv")):
+        return os.path.join(bridgedb_dir, "datasources.tsv")
+    return str(resources.files("pyBiodatafuse.resources").joinpath("datasources.csv"))
+
+
+class DatasourceRegistry:
+    """BridgeDb datasources, read once from the file and kept in memory.
+
+    Usage example:
+    >> registry = get_datasource_registry()
+    >> "NCBI Gene" in registry
+    >> registry.identifier_types()
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        """
+        @param path: datasources file with the columns systemCode, source and type,
+            the one of pyBiodatafuse by default
+        """
+        self.path = path or _datasources_path()
+        self.table = pd.read_csv(self.path)
+        self.sources: List[str] = self.table["source"].tolist()
+        self._sources = frozenset(self.sources)
+
+    def __contains__(self, source: str) -> bool:
+        return source in self._sources
+
+    def validate(self, source: str) -> None:
+        """raise an AssertionError when the source is not a BridgeDb datasource.
+
+        @param source: name of the datasource, e.g. "NCBI Gene"
+        """
+        assert source in self._sources, f"Source {source} is not in identifier options"
+
+    def identifier_types(self, entity_type: str = "gene") -> List[str]:
+        """return the datasources of an entity type, in the order of the file.
+
+        @param entity_type: "gene" or "metabolite"
+        """
+        if "type" not in self.table.columns:
+            return list(self.sources)
+        return self.table.loc[self.table["type"] == entity_type, "source"].tolist()
+
+
+@lru_cache(maxsize=None)
+def get_datasource_registry() -> DatasourceRegistry:
+    """return the registry of the BridgeDb datasources, read on first use."""
+    return DatasourceRegistry()
+
+
+class MappingIndex:
+    """Row positions of the BridgeDb output grouped by target.source.
+
+    Built with a single pass over the frame, a lookup then only copies the
+    rows of the namespace.
+
+    Usage example:
+    >> index = MappingIndex(bridgedb_df)
+    >> index.rows("NCBI Gene")
+    """
+
+    def __init__(
+        self,
+        bridgedb_df: pd.DataFrame,
+        positions: Optional[Dict[str, np.ndarray]] = None,
+    ):
+        """
+        @param bridgedb_df: BridgeDb output
+        @param positions: row positions per target.source, computed when missing
+        """
+        self.bridgedb_df = bridgedb_df
+        if positions is None:
+            positions = {
+                source: np.asarray(rows)
+                for source, rows in bridgedb_df.groupby(
+                    "target.source", sort=False
+                ).indices.items()
+            }
+        self.positions: Dict[str, np.ndarray] = positions
+
+    def rows(self, source: str) -> pd.DataFrame:
+        """return the rows mapped to a datasource, in the order of the frame.
+
+        @param source: target datasource, e.g. "NCBI Gene"
+        """
+        positions = self.positions.get(source, np.zeros(0, dtype=np.int64))
+        return self.bridgedb_df.iloc[positions]
+
+
+# Row positions of the BridgeDb outputs seen by mapping_index, by id of the
+# frame, dropped when the frame is garbage collected
+_positions: Dict[int, Dict[str, np.ndarray]] = {}
+_positions_lock = threading.Lock()
+
+
+def mapping_index(bridgedb_df: pd.DataFrame) -> MappingIndex:
+    """return the MappingIndex of a BridgeDb output, built on the first call.
+
+    The index is kept as long as the frame lives, so the frame must not be
+    modified in place afterwards.
+
+    @param bridgedb_df: BridgeDb output
+    """
+    key = id(bridgedb_df)
+    with _positions_lock:
+        positions = _positions.get(key)
+    if positions is not None:
+        return MappingIndex(bridgedb_df, positions)
+
+    index = MappingIndex(bridgedb_df)
+    with _positions_lock:
+        _positions[key] = index.positions
+    weakref.finalize(bridgedb_df, _positions.pop, key, None)
+    return index
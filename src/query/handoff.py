@@ -0,0 +1,149 @@
+# coding: utf-8
+
+"""Python file for handing results over between processes as memory-mapped Arrow files."""
+
+import os
+import pickle
+import shutil
+from typing import Any
+
+import pandas as pd
+import pyarrow as pa
+
+from src.query.compact import CompactTable
+
+# Files of a result folder
+ARROW_SUFFIX = ".arrow"
+RESULT_FILE = "result.pkl"
+
+
+class _Mapped:
+    """Placeholder of a table written next to the pickled result."""
+
+    def __init__(self, kind: str, filename: str):
+        self.kind = kind
+        self.filename = filename
+
+
+def write_table(table: pa.Table, path: str) -> str:
+    """write an Arrow table to an uncompressed IPC stream file, readable by map_table.
+
+    The stream format is used because the chunks of a CompactTable have their
+    own dictionaries, which the IPC file format does not support.
+
+    @param table: Arrow table
+    @param path: output file
+    """
+    with pa.OSFile(path, "wb") as file:
+        with pa.ipc.new_stream(file, table.schema) as writer:
+            writer.write_table(table)
+    return path
+
+
+def map_table(path: str) -> pa.Table:
+    """return the table of a file written by write_table, without copying it.
+
+    The buffers of the table point into the memory-mapped file: only the
+    pages read are loaded, and they are shared by all the processes mapping
+    the same file.
+
+    @param path: IPC stream file
+    """
+    return pa.ipc.open_stream(pa.memory_map(path, "r")).read_all()
+
+
+def frame_to_table(frame: pd.DataFrame) -> pa.Table:
+    """convert a dataframe of build_network to an Arrow table.
+
+    Empty cells ("") become nulls, so that attribute columns mixing numbers and
+    empty cells keep their type. Other mixed columns are stored as strings.
+
+    @param frame: dataframe with scalar cells
+    """
+    columns = {}
+    for name in frame.columns:
+        column = frame[name]
+        if column.dtype == object:
+            column = column.mask(column.eq(""), None)
+            try:
+                columns[str(name)] = pa.array(column, from_pandas=True)
+                continue
+            except (pa.ArrowInvalid, pa.ArrowTypeError):
+                column = column.astype(str).mask(column.isna(), None)
+        columns[str(name)] = pa.array(column, from_pandas=True)
+    return pa.table(columns)
+
+
+def table_to_frame(table: pa.Table) -> pd.DataFrame:
+    """convert a table of frame_to_table back to the dataframe, nulls as "".
+
+    @param table: Arrow table
+    """
+    frame = table.to_pandas()
+    for name in frame.columns[frame.isna().any()]:
+        frame[name] = frame[name].astype(object).where(frame[name].notna(), "")
+    return frame
+
+
+def write_result(directory: str, result: Any) -> str:
+    """write a result for read_result, the tables as Arrow files.
+
+    A CompactTable, a dataframe or an Arrow table, alone or in a tuple, is
+    written to its own file, the rest of the result is pickled. The folder
+    appears at once, when complete.
+
+    @param directory: output folder, must not exist
+    @param result: result of a job, e.g. (combined_data, metadata, nodes, edges)
+    """
+    temporary = f"{directory}.tmp"
+    shutil.rmtree(temporary, ignore_errors=True)
+    os.makedirs(temporary)
+
+    def write(position, value):
+        filename = f"{position}{ARROW_SUFFIX}"
+        path = os.path.join(temporary, filename)
+        if isinstance(value, CompactTable):
+            write_table(value.table, path)
+            return _Mapped("compact", filename)
+        if isinstance(value, pd.DataFrame):
+            write_table(frame_to_table(value), path)
+            return _Mapped("frame", filename)
+        if isinstance(value, pa.Table):
+            write_table(value, path)
+            return _Mapped("arrow", filename)
+        return value
+
+    if isinstance(result, tuple):
+        stored = tuple(write(position, value) for position, value in enumerate(result))
+    else:
+        stored = write(0, result)
+    with open(os.path.join(temporary, RESULT_FILE), "wb") as file:
+        pickle.dump(stored, file, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(temporary, directory)
+    return directory
+
+
+def read_result(directory: str) -> Any:
+    """return a result written by write_result, its tables memory-mapped.
+
+    A CompactTable stays mapped, dataframes are converted from their mapped
+    table.
+
+    @param directory: folder of the result
+    """
+
+    def read(value):
+        if not isinstance(value, _Mapped):
+            return value
+        table = map_table(os.path.join(directory, value.filename))
+        if value.kind == "compact":
+            return CompactTable(table)
+        if value.kind == "frame":
+            return table_to_frame(table)
+        return table
+
+    with open(os.path.join(directory, RESULT_FILE), "rb") as file:
+        stored = pickle.load(file)
+    if isinstance(stored, tuple):
+        return tuple(read(value) for value in stored)
+    return read(stored)
@@ -0,0 +1,335 @@
+# coding: utf-8
+
+"""Python file for running the queries as background jobs in worker processes."""
+
+import multiprocessing
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from concurrent.futures import Executor, ProcessPoolExecutor
+from typing import Callable, List, Optional
+
+import pandas as pd
+
+from src.constants import BATCH_SIZE, JOB_WORKERS, JOBS_DIR, MAX_JOBS_PER_USER
+from src.profiling import count_rows
+from src.query.database import transaction
+from src.query.handoff import read_result, write_result
+
+# Status of a job, in order
+QUEUED, RUNNING, DONE, FAILED = "queued", "running", "done", "failed"
+ACTIVE_STATUSES = (QUEUED, RUNNING)
+
+
+class JobLimitError(RuntimeError):
+    """Raised when a user already has the maximum number of queued or running jobs."""
+
+
+class JobSubmitError(RuntimeError):
+    """Raised when the worker pool cannot take a job, e.g. after a worker crashed."""
+
+
+class JobStore:
+    """Job table in a SQLite database, shared by the app and the worker processes.
+
+    Usage example:
+    >> store = JobStore()
+    >> job_id = store.create("user", "3 datasources", max_active=2)
+    >> store.get(job_id)["status"]
+    """
+
+    def __init__(self, directory: str = JOBS_DIR):
+        """
+        @param directory: folder of the database and of the job results
+        """
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.path = os.path.join(directory, "jobs.sqlite")
+        with transaction(self.path) as connection:
+            connection.execute("""
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id TEXT PRIMARY KEY,
+                    user TEXT NOT NULL,
+                    description TEXT,
+                    status TEXT NOT NULL,
+                    created REAL NOT NULL,
+                    started REAL,
+                    finished REAL,
+                    rows INTEGER,
+                    error TEXT
+                )
+                """)
+            connection.execute(
+                "CREATE INDEX IF NOT EXISTS jobs_user ON jobs (user, created)"
+            )
+
+    def result_path(self, job_id: str) -> str:
+        """return the folder of the result of a job, see write_result.
+
+        @param job_id: identifier of the job
+        """
+        return os.path.join(self.directory, job_id)
+
+    def create(
+        self, user: str, description: str = "", max_active: Optional[int] = None
+    ) -> str:
+        """add a queued job and return its identifier.
+
+        @param user: identifier of the user
+        @param description: short description shown in the job list
+        @param max_active: maximum number of queued or running jobs of the user,
+            JobLimitError is raised when reached
+        """
+        job_id = uuid.uuid4().hex[:12]
+        with transaction(self.path) as connection:
+            if max_active is not None:
+                (active,) = connection.execute(
+                    "SELECT COUNT(*) FROM jobs WHERE user = ? AND status IN (?, ?)",
+                    (user, *ACTIVE_STATUSES),
+                ).fetchone()
+                if active >= max_active:
+                    raise JobLimitError(
+                        f"{active} jobs are already queued or running, "
+                        "wait for one of them to finish"
+                    )
+            connection.execute(
+                "INSERT INTO jobs (id, user, description, status, created) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (job_id, user, description, QUEUED, time.time()),
+            )
+        return job_id
+
+    def update(self, job_id: str, **fields) -> None:
+        """set columns of a job, e.g. status="done".
+
+        @param job_id: identifier of the job
+        """
+        columns = ", ".join(f"{column} = ?" for column in fields)
+        with transaction(self.path) as connection:
+            connection.execute(
+                f"UPDATE jobs SET {columns} WHERE id = ?", (*fields.values(), job_id)
+            )
+
+    def get(self, job_id: str) -> Optional[dict]:
+        """return a job as a dict, None when unknown.
+
+        @param job_id: identifier of the job
+        """
+        with transaction(self.path, write=False, row_factory=sqlite3.Row) as connection:
+            row = connection.execute(
+                "SELECT * FROM jobs WHERE id = ?", (job_id,)
+            ).fetchone()
+        return None if row is None else dict(row)
+
+    def list(self, user: str, limit: int = 20) -> List[dict]:
+        """return the last jobs of a user, the most recent first.
+
+        @param user: identifier of the user
+        @param limit: number of jobs
+        """
+        with transaction(self.path, write=False, row_factory=sqlite3.Row) as connection:
+            rows = connection.execute(
+                "SELECT * FROM jobs WHERE user = ? ORDER BY created DESC LIMIT ?",
+                (user, limit),
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+    def fail_interrupted(self) -> None:
+        """mark the jobs left queued or running by a stopped app as failed."""
+        with transaction(self.path) as connection:
+            connection.execute(
+                "UPDATE jobs SET status = ?, error = ?, finished = ? "
+                "WHERE status IN (?, ?)",
+                (FAILED, "Interrupted by a restart", time.time(), *ACTIVE_STATUSES),
+            )
+
+
+def run_job(directory: str, job_id: str, function: Callable, *args) -> None:
+    """run a job in a worker process and save its result next to the job table.
+
+    The tables of the result are written as Arrow files, which the app maps
+    instead of unpickling them.
+
+    @param directory: folder of the job table, see JobStore
+    @param job_id: identifier of the job
+    @param function: picklable function computing the result from args
+    """
+    store = JobStore(directory)
+    store.update(job_id, status=RUNNING, started=time.time())
+    try:
+        result = function(*args)
+        write_result(store.result_path(job_id), result)
+        store.update(job_id, status=DONE, finished=time.time(), rows=count_rows(result))
+    except Exception as error:
+        store.update(
+            job_id,
+            status=FAILED,
+            finished=time.time(),
+            error=f"{type(error).__name__}: {error}",
+        )
+
+
+def query_and_build_network(
+    bridgedb_df: pd.DataFrame, selected_sources_list: list, bridgedb_metadata: dict
+):
+    """query the selected databases and build the network, for run_job.
+
+    Returns the combined table (a CompactTable), the metadata, the nodes, the
+    edges and the warnings.
+
+    @param bridgedb_df: BridgeDb output for creating the list of gene ids to query
+    @param selected_sources_list: list of selected databases
+    @param bridgedb_metadata: metadata of the id mapping
+    """
+    from src.query.batching import BatchRunner, plain_metadata
+    from src.query.compact import compact
+    from src.query.process_sources import query_selected_sources
+    from src.query.run_log import log_query_run
+    from src.visualization.network import build_network
+
+    if bridgedb_df["identifier"].nunique() > BATCH_SIZE:
+        combined_data, combined_metadata, warnings = BatchRunner().run(
+            bridgedb_df, selected_sources_list
+        )
+    else:
+        combined_data, combined_metadata, warnings = query_selected_sources(
+            bridgedb_df, selected_sources_list, persist=False
+        )
+    metadata = {
+        "id_mapping": bridgedb_metadata,
+        "queries": plain_metadata(combined_metadata),
+    }
+    log_query_run(metadata, selected_sources_list)
+    if combined_data.empty:
+        nodes, edges = pd.DataFrame(), pd.DataFrame()
+    else:
+        nodes, edges = build_network(combined_data)
+    return compact(combined_data), metadata, nodes, edges, warnings
+
+
+class JobManager:
+    """Submit jobs to a pool of worker processes and follow them in the job table.
+
+    Jobs outlive the streamlit session that submitted them: their result is
+    fetched by job id, e.g. after the browser reconnected.
+
+    Usage example:
+    >> manager = get_job_manager()
+    >> job_id = manager.submit("user", query_and_build_network, bridgedb_df, sources, metadata)
+    >> manager.store.get(job_id)["status"]
+    >> manager.result(job_id)
+    """
+
+    def __init__(
+        self,
+        directory: str = JOBS_DIR,
+        workers: int = JOB_WORKERS,
+        max_jobs_per_user: int = MAX_JOBS_PER_USER,
+        executor: Optional[Executor] = None,
+    ):
+        """
+        @param directory: folder of the job table and of the results
+        @param workers: number of worker processes
+        @param max_jobs_per_user: maximum number of queued or running jobs per user
+        @param executor: executor running the jobs, a process pool by default
+        """
+        self.store = JobStore(directory)
+        self.store.fail_interrupted()
+        self.max_jobs_per_user = max_jobs_per_user
+        self.workers = workers
+        # A pool of our own is replaced when broken, a given executor is not
+        self._owns_executor = executor is None
+        self._executor = executor or self._create_executor()
+        self._executor_lock = threading.Lock()
+
+    def _create_executor(self) -> Executor:
+        return ProcessPoolExecutor(
+            max_workers=self.workers, mp_context=multiprocessing.get_context("spawn")
+        )
+
+    def _submit_to_executor(self, *args):
+        """submit to the executor, once again on a new pool when it is broken."""
+        executor = self._executor
+        try:
+            return executor.submit(*args)
+        except RuntimeError:
+            # BrokenProcessPool after a worker died, or a shut down executor
+            if not self._owns_executor:
+                raise
+            with self._executor_lock:
+                if self._executor is executor:
+                    executor.shutdown(wait=False)
+                    self._executor = self._create_executor()
+            return self._executor.submit(*args)
+
+    def submit(
+        self, user: str, function: Callable, *args, description: str = ""
+    ) -> str:
+        """queue a job and return its identifier.
+
+        The job is marked as failed and JobSubmitError is raised when the
+        worker pool refuses it.
+
+        @param user: identifier of the user, see JobStore.create
+        @param function: picklable function computing the result from args
+        @param description: short description shown in the job list
+        """
+        job_id = self.store.create(user, description, self.max_jobs_per_user)
+        try:
+            future = self._submit_to_executor(
+                run_job, self.store.directory, job_id, function, *args
+            )
+        except RuntimeError as error:
+            self.store.update(
+                job_id,
+                status=FAILED,
+                finished=time.time(),
+                error=f"Not started: {error}",
+            )
+            raise JobSubmitError(
+                "The background workers are not available, try again later"
+            ) from error
+
+        def mark_crashed(future):
+            # run_job records its own errors, this is a crash of the worker
+            if future.exception() is not None:
+                self.store.update(
+                    job_id,
+                    status=FAILED,
+                    finished=time.time(),
+                    error=f"Worker failed: {future.exception()}",
+                )
+
+        future.add_done_callback(mark_crashed)
+        return job_id
+
+    def result(self, job_id: str):
+        """return the result of a finished job, None when not done.
+
+        Its tables are memory-mapped, see read_result.
+
+        @param job_id: identifier of the job
+        """
+        job = self.store.get(job_id)
+        if job is None or job["status"] != DONE:
+            return None
+        return read_result(self.store.result_path(job_id))
+
+    def shutdown(self) -> None:
+        """stop the worker processes once the running jobs are done."""
+        self._executor.shutdown(wait=True)
+
+
+_job_manager = None
+_job_manager_lock = threading.Lock()
+
+
+def get_job_manager() -> JobManager:
+    """return the job manager shared by all the sessions of the app."""
+    global _job_manager
+    with _job_manager_lock:
+        if _job_manager is None:
+            _job_manager = JobManager()
+    return _job_manager
@@ -0,0 +1,148 @@
+# coding: utf-8
+
+"""Python file for memoizing the stages of the query page across streamlit reruns."""
+
+import hashlib
+import json
+import threading
+import time
+from typing import Any, Callable, List, MutableMapping, Optional
+
+import pandas as pd
+
+from src.profiling import count_rows
+
+# Stages of the query page in execution order. A per-source stage is named
+# "source: <datasource>" and belongs to the "source" family.
+STAGES = ["identifiers", "mapping", "source", "sources", "graph"]
+
+
+def content_hash(value: Any) -> str:
+    """return a hash of the content of a value.
+
+    @param value: dataframe, bytes, string or JSON-like structure (nested lists/dicts)
+    """
+    digest = hashlib.sha256()
+    _update(digest, value)
+    return digest.hexdigest()
+
+
+def _update(digest, value: Any) -> None:
+    if isinstance(value, pd.DataFrame):
+        digest.update(json.dumps(list(map(str, value.columns))).encode("utf-8"))
+        try:
+            hashes = pd.util.hash_pandas_object(value, index=False)
+            digest.update(hashes.to_numpy().tobytes())
+        except TypeError:
+            # Unhashable cells (e.g. lists of dicts)
+            digest.update(value.to_json(orient="split", index=False).encode("utf-8"))
+    elif isinstance(value, bytes):
+        digest.update(value)
+    elif isinstance(value, (list, tuple)):
+        digest.update(b"[")
+        for item in value:
+            _update(digest, item)
+            digest.update(b",")
+        digest.update(b"]")
+    else:
+        digest.update(json.dumps(value, sort_keys=True, default=str).encode("utf-8"))
+
+
+def _family(stage: str) -> str:
+    return stage.split(":")[0]
+
+
+class QueryPipeline:
+    """Stages of the query page kept in the session state.
+
+    Every stage is stored with the hash of its inputs. A stage whose inputs did
+    not change is served from the session state, otherwise it is recomputed and
+    the stages after it are invalidated.
+
+    Usage example:
+    >> pipeline = QueryPipeline(st.session_state)
+    >> mapping = pipeline.run("mapping", [identifiers_digest, "NCBI Gene"], compute)
+    >> pipeline.report()
+    """
+
+    def __init__(self, state: MutableMapping, key: str = "query_pipeline"):
+        """
+        @param state: st.session_state or any dict
+        @param key: key of the pipeline in the state
+        """
+        if key not in state:
+            state[key] = {}
+        self._stages = state[key]
+        self._lock = threading.Lock()
+        self.runs = []
+
+    def digest(self, stage: str) -> Optional[str]:
+        """return the input hash of a stored stage, None when missing.
+
+        @param stage: name of the stage
+        """
+        entry = self._stages.get(stage)
+        return None if entry is None else entry["digest"]
+
+    def value(self, stage: str, default: Any = None) -> Any:
+        """return the stored value of a stage, whatever its inputs.
+
+        @param stage: name of the stage
+        @param default: value returned when the stage is missing
+        """
+        entry = self._stages.get(stage)
+        return default if entry is None else entry["value"]
+
+    def get(self, stage: str, inputs: Any, default: Any = None) -> Any:
+        """return the stored value of a stage if computed from the same inputs.
+
+        @param stage: name of the stage
+        @param inputs: inputs of the stage
+        @param default: value returned when the stage has to be recomputed
+        """
+        entry = self._stages.get(stage)
+        if entry is not None and entry["digest"] == content_hash(inputs):
+            return entry["value"]
+        return default
+
+    def run(self, stage: str, inputs: Any, compute: Callable[[], Any]) -> Any:
+        """return the value of a stage, recomputing it only when its inputs changed.
+
+        @param stage: name of the stage, see STAGES
+        @param inputs: inputs of the stage, typically the digest of the previous stage
+        @param compute: function without arguments computing the stage
+        """
+        digest = content_hash(inputs)
+        with self._lock:
+            entry = self._stages.get(stage)
+        if entry is not None and entry["digest"] == digest:
+            self._record(stage, True, 0.0, entry["value"])
+            return entry["value"]
+
+        start = time.perf_counter()
+        value = compute()
+        seconds = time.perf_counter() - start
+
+        with self._lock:
+            self._invalidate_after(stage)
+            self._stages[stage] = {"digest": digest, "value": value}
+        self._record(stage, False, seconds, value)
+        return value
+
+    def _invalidate_after(self, stage: str) -> None:
+        """drop the stored stages that come after the given stage."""
+        position = STAGES.index(_family(stage))
+        for name in list(self._stages):
+            if STAGES.index(_family(name)) > position:
+                del self._stages[name]
+
+    def _record(self, stage: str, cached: bool, seconds: float, value: Any) -> None:
+        rows = count_rows(value)
+        with self._lock:
+            self.runs.append(
+                {"stage": stage, "cached": cached, "seconds": seconds, "rows": rows}
+            )
+
+    def report(self) -> List[dict]:
+        """return the stages run during this rerun, in execution order."""
+        return [dict(run, seconds=round(run["seconds"], 3)) for run in self.runs]
@@ -1,12 +1,161 @@
+import gzip
+import io
+import re
+from collections import Counter
+from typing import Iterable, Iterator, Optional
+
 import streamlit as st
 import pandas as pd
-from pyBiodatafuse.data_loader import create_df_from_text
 
+# Signatures of the identifier types, tested in this order (the first match wins)
+IDENTIFIER_PATTERNS = {
+    "Ensembl": re.compile(r"^ENS[A-Z]*[EFGPRT]\d{11}(\.\d+)?$"),
+    "RefSeq": re.compile(r"^(AC|AP|NC|NG|NM|NP|NR|NT|NW|XM|XP|XR|YP|WP)_\d+(\.\d+)?$"),
+    "HGNC Accession Number": re.compile(r"^HGNC:\d+$"),
+    "Uniprot-TrEMBL": re.compile(
+        r"^([OPQ]\d[A-Z\d]{3}\d|[A-NR-Z]\d([A-Z][A-Z\d]{2}\d){1,2})(-\d+)?$"
+    ),
+    # A PDB id has a letter, 4-digit ids are NCBI Gene
+    "PDB": re.compile(r"^\d(?=[A-Za-z\d]*[A-Za-z])[A-Za-z\d]{3}$"),
+    "NCBI Gene": re.compile(r"^\d+$"),
+    "HGNC": re.compile(r"^[A-Z][A-Z\d]*(-[A-Z\d]+)*$|^C\d+orf\d+$"),
+}
 
-def process_identifiers(uploaded_file, text_input) -> pd.DataFrame:
-    """convert the input identifier list to a dataframe.
+# Characters allowed in an identifier
+VALID_IDENTIFIER = re.compile(r"^[\w.:@-]+$")
+MAX_IDENTIFIER_LENGTH = 64
 
-    @param uploaded_file: a CSV or TXT file contains identifiers
+# Separators of the identifiers on a line, besides the line breaks
+SEPARATORS = re.compile(r"[,;\t]")
+
+# Memory bounds of the ingestion: accepted identifiers, rejected lines kept in
+# the report (the others are only counted) and identifiers used to guess the type
+MAX_IDENTIFIERS = 2_000_000
+MAX_REJECTIONS = 1_000
+TYPE_SAMPLE_SIZE = 10_000
+
+# Extensions of the uploaded files, ".gz" for any gzip-compressed text file
+UPLOAD_EXTENSIONS = (".csv", ".txt", ".gz")
+
+
+class IngestResult:
+    """Identifiers read from the inputs, with the rejected lines and the guessed type.
+
+    @param identifiers: accepted identifiers, in input order
+    @param rejected: (input, line, value, reason) of the first rejected identifiers
+    @param counts: number of identifiers per outcome ("accepted" or the reason)
+    @param sample_types: number of sampled identifiers per guessed type
+    """
+
+    def __init__(
+        self, identifiers: list, rejected: list, counts: Counter, sample_types: Counter
+    ):
+        self.identifiers = pd.DataFrame({"identifier": identifiers}, dtype=object)
+        self.rejected = pd.DataFrame(
+            rejected, columns=["input", "line", "value", "reason"]
+        )
+        self.counts = dict(counts)
+        self.type_counts = dict(sample_types)
+
+    @property
+    def guessed_type(self) -> Optional[str]:
+        """return the identifier type matching most of the identifiers, None when unsure."""
+        typed = {key: count for key, count in self.type_counts.items() if key}
+        if not typed:
+            return None
+        identifier_type, count = max(typed.items(), key=lambda item: item[1])
+        # A majority of the sampled identifiers, unmatched ones included
+        return identifier_type if count * 2 > sum(self.type_counts.values()) else None
+
+
+def guess_identifier_type(identifier: str) -> Optional[str]:
+    """return the first identifier type whose signature matches, None when none does.
+
+    @param identifier: a normalized identifier
+    """
+    for identifier_type, pattern in IDENTIFIER_PATTERNS.items():
+        if pattern.match(identifier):
+            return identifier_type
+    return None
+
+
+def _lines(source) -> Iterator[str]:
+    """yield the lines of a text, or of a binary stream gunzipped when compressed."""
+    if isinstance(source, str):
+        yield from io.StringIO(source)
+        return
+
+    source.seek(0)
+    magic = source.read(2)
+    source.seek(0)
+    stream = gzip.GzipFile(fileobj=source) if magic == b"\x1f\x8b" else source
+    text = io.TextIOWrapper(stream, encoding="utf-8-sig", errors="replace")
+    try:
+        yield from text
+    finally:
+        # Leave the uploaded file open
+        text.detach()
+
+
+def ingest_identifiers(
+    sources: Iterable,
+    max_identifiers: int = MAX_IDENTIFIERS,
+    max_rejections: int = MAX_REJECTIONS,
+) -> IngestResult:
+    """read identifiers from texts and files, line by line.
+
+    Identifiers are separated by line breaks, commas, semicolons or tabs. They
+    are stripped of spaces and quotes and kept once, in the order of the inputs.
+
+    @param sources: (name, source) pairs, the source being a string or a binary
+        stream of plain or gzip-compressed text
+    @param max_identifiers: identifiers accepted at most, the next are rejected
+    @param max_rejections: rejected identifiers listed in the report, the next are only counted
+    """
+    seen = set()
+    identifiers = []
+    rejected = []
+    counts = Counter()
+    sample_types = Counter()
+
+    def reject(name, line_number, value, reason):
+        counts[reason] += 1
+        if len(rejected) < max_rejections:
+            rejected.append((name, line_number, value, reason))
+
+    for name, source in sources:
+        for line_number, line in enumerate(_lines(source), start=1):
+            for value in SEPARATORS.split(line):
+                identifier = value.strip().strip("\"'").strip()
+                if not identifier:
+                    continue
+                if identifier in seen:
+                    reject(name, line_number, identifier, "duplicate")
+                elif len(identifier) > MAX_IDENTIFIER_LENGTH:
+                    reject(
+                        name,
+                        line_number,
+                        identifier[:MAX_IDENTIFIER_LENGTH],
+                        "too long",
+                    )
+                elif not VALID_IDENTIFIER.match(identifier):
+                    reject(name, line_number, identifier, "invalid characters")
+                elif len(identifiers) >= max_identifiers:
+                    reject(name, line_number, identifier, "over the limit")
+                else:
+                    seen.add(identifier)
+                    identifiers.append(identifier)
+                    counts["accepted"] += 1
+                    if len(identifiers) <= TYPE_SAMPLE_SIZE:
+                        sample_types[guess_identifier_type(identifier)] += 1
+
+    return IngestResult(identifiers, rejected, counts, sample_types)
+
+
+def ingest_inputs(uploaded_file, text_input) -> Optional[IngestResult]:
+    """read the identifiers of the uploaded file and of the text area.
+
+    @param uploaded_file: a CSV or TXT file (possibly gzip-compressed) contains identifiers
     @param text_input: the identifiers in the st.text_area (one identifier per line)
     """
 
@@ -14,27 +163,25 @@ def process_identifiers(uploaded_file, text_input) -> pd.DataFrame:
         st.warning("Please provide your identifiers!", icon="⚠️")
         return None
 
-    if uploaded_file is not None and uploaded_file.type not in [
-        "application/vnd.ms-excel",
-        "text/plain",
-    ]:
+    if uploaded_file is not None and not uploaded_file.name.lower().endswith(
+        UPLOAD_EXTENSIONS
+    ):
         st.error("Unsupported file format. Please upload a CSV or TXT file.")
         st.stop()
 
-    identifiers_df = []
-
+    sources = []
     if text_input.strip() != "":
-        # Create a DataFrame from the list of identifiers
-        identifiers_df = create_df_from_text(text_input)
-
+        sources.append(("text", text_input))
     if uploaded_file is not None:
-        # Read the uploaded file
-        file_contents = uploaded_file.getvalue().decode("utf-8")
-        if identifiers_df:
-            identifiers_df = pd.concat(
-                [identifiers_df, create_df_from_text(file_contents)]
-            ).unique()
-        else:
-            identifiers_df = create_df_from_text(file_contents)
-
-    return identifiers_df
+        sources.append((uploaded_file.name, uploaded_file))
+    return ingest_identifiers(sources)
+
+
+def process_identifiers(uploaded_file, text_input) -> pd.DataFrame:
+    """convert the input identifier list to a dataframe.
+
+    @param uploaded_file: a CSV or TXT file contains identifiers
+    @param text_input: the identifiers in the st.text_area (one identifier per line)
+    """
+    result = ingest_inputs(uploaded_file, text_input)
+    return None if result is None else result.identifiers
@@ -1,58 +1,278 @@
 import streamlit as st
 import pandas as pd
 from collections import defaultdict
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from time import monotonic
 from pyBiodatafuse.annotators import wikipathways, disgenet, opentargets, stringdb
-from pyBiodatafuse.utils import combine_sources
+from src.query.cache import get_response_cache, make_key
+from src.query.result_store import SET_DEPENDENT_SOURCES, get_result_store
+from src.utils import SourceAccumulator
 
+# Dictionary to map the datasource names to their corresponding functions
+DATA_SOURCE_FUNCTIONS = {
+    "WikiPathway": wikipathways.get_gene_wikipathway,
+    "DisGeNet": disgenet.get_gene_disease,
+    "OpenTarget": {
+        "Gene location": opentargets.get_gene_location,
+        "Gene Ontology (GO)": opentargets.get_gene_go_process,
+        "Reactome pathways": opentargets.get_gene_reactome_pathways,
+        "Drug interactions": opentargets.get_gene_drug_interactions,
+        "Disease associations": opentargets.get_gene_disease_associations,
+    },
+    "STRING-DB": stringdb.get_ppi,
+}
 
-def process_selected_sources(
-    bridgedb_df: pd.DataFrame, selected_sources_list: list
-) -> pd.DataFrame:
-    """query the selected databases and convert the output to a dataframe.
+# Upper bound of concurrent annotator calls
+MAX_WORKERS = 8
+
+# Per-source timeout (in seconds) for a single annotator call
+DEFAULT_TIMEOUT = 300
+SOURCE_TIMEOUTS = {}
+
+
+def _build_tasks(selected_sources_list: list) -> list:
+    """list the (source, option, function) annotator calls of the user selection.
+
+    @param selected_sources_list: list of selected databases and their options
+    """
+    tasks = []
+    for source, options in selected_sources_list:
+        if source not in DATA_SOURCE_FUNCTIONS:
+            continue
+        functions = DATA_SOURCE_FUNCTIONS[source]
+        if options:
+            for option in options:
+                tasks.append((source, option, functions[option]))
+        elif callable(functions):
+            tasks.append((source, None, functions))
+    return tasks
+
+
+def _cached(source: str, option, function):
+    """wrap an annotator so that repeated queries of the same input are served from the cache.
+
+    @param source: name of the datasource
+    @param option: option of the datasource, None when the datasource has no options
+    @param function: annotator function taking the BridgeDb output
+    """
+
+    def query(bridgedb_df: pd.DataFrame):
+        input_datasource = ",".join(sorted(bridgedb_df["identifier.source"].unique()))
+        key = make_key(
+            bridgedb_df["identifier"], input_datasource, "Human", source, option
+        )
+        return get_response_cache().get_or_compute(key, lambda: function(bridgedb_df))
+
+    return query
+
+
+def _stored(source: str, option, function):
+    """wrap an annotator so that the genes annotated by earlier queries are read from the result store.
+
+    @param source: name of the datasource
+    @param option: option of the datasource, None when the datasource has no options
+    @param function: annotator function taking the BridgeDb output
+    """
+
+    def query(bridgedb_df: pd.DataFrame):
+        return get_result_store().query(bridgedb_df, source, option, function)
+
+    return query
+
+
+def _label(source: str, option) -> str:
+    return source if option is None else f"{source}(option: {option})"
+
+
+def _memoized(memoize, source: str, option, function):
+    """wrap an annotator so that its result is memoized per datasource and option.
+
+    @param memoize: function (stage name, compute) returning the memoized result
+    @param source: name of the datasource
+    @param option: option of the datasource, None when the datasource has no options
+    @param function: annotator function taking the BridgeDb output
+    """
+    stage = f"source: {source}" if option is None else f"source: {source} ({option})"
+    return lambda bridgedb_df: memoize(stage, lambda: function(bridgedb_df))
+
+
+def _run_parallel(bridgedb_df: pd.DataFrame, tasks: list, max_workers: int) -> dict:
+    """run the annotator calls on a bounded thread pool.
+
+    Results are gathered as they finish. Calls still running once their source
+    timeout is reached are abandoned and reported as None.
+
+    @param bridgedb_df: BridgeDb output passed to every annotator
+    @param tasks: list of (source, option, function) built by _build_tasks
+    @param max_workers: size of the thread pool
+    """
+    results = {}
+    executor = ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(tasks))))
+    try:
+        start = monotonic()
+        pending = {}
+        for position, (source, _, function) in enumerate(tasks):
+            future = executor.submit(function, bridgedb_df)
+            deadline = start + SOURCE_TIMEOUTS.get(source, DEFAULT_TIMEOUT)
+            pending[future] = (position, deadline)
+
+        while pending:
+            next_deadline = min(deadline for _, deadline in pending.values())
+            done, _ = wait(
+                pending,
+                timeout=max(0, next_deadline - monotonic()),
+                return_when=FIRST_COMPLETED,
+            )
+            for future in done:
+                position, _ = pending.pop(future)
+                results[position] = future.result()
+
+            now = monotonic()
+            for future, (position, deadline) in list(pending.items()):
+                if deadline <= now:
+                    future.cancel()
+                    del pending[future]
+                    results[position] = None
+    finally:
+        # Do not wait for abandoned calls, they finish in the background
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    return results
+
+
+def query_selected_sources(
+    bridgedb_df: pd.DataFrame,
+    selected_sources_list: list,
+    parallel: bool = True,
+    max_workers: int = MAX_WORKERS,
+    use_cache: bool = True,
+    persist: bool = True,
+    memoize=None,
+    raise_on_timeout: bool = False,
+    profiler=None,
+):
+    """query the selected databases without rendering anything.
+
+    Returns the combined table, the metadata of the queries and the list of
+    warnings to be shown to the user, in the order of the selection.
 
     @param bridgedb_df: BridgeDb output for creating the list of gene ids to query
     @param selected_sources_list: list of selected databases
+    @param parallel: run the independent annotator calls concurrently
+    @param max_workers: maximum number of concurrent annotator calls
+    @param use_cache: read the genes already annotated from the result store, and
+        the repeated queries of the other sources from the response cache
+    @param persist: save the combined table once all the sources are combined
+    @param memoize: function (stage name, compute) memoizing each annotator result,
+        see QueryPipeline
+    @param raise_on_timeout: raise a TimeoutError instead of warning when a source
+        times out
+    @param profiler: Profiler recording a span per annotator call and for the combination
     """
 
     # Initialize variables
-    combined_data = pd.DataFrame()
+    accumulator = SourceAccumulator()
     combined_metadata = defaultdict(lambda: defaultdict(str))
-    # Dictionary to map the datasource names to their corresponding functions
-    data_source_functions = {
-        "WikiPathway": wikipathways.get_gene_wikipathway,
-        "DisGeNet": disgenet.get_gene_disease,
-        "OpenTarget": {
-            "Gene location": opentargets.get_gene_location,
-            "Gene Ontology (GO)": opentargets.get_gene_go_process,
-            "Reactome pathways": opentargets.get_gene_reactome_pathways,
-            "Drug interactions": opentargets.get_gene_drug_interactions,
-            "Disease associations": opentargets.get_gene_disease_associations,
-        },
-        "STRING-DB": stringdb.get_ppi
-    }
+    warnings = []
 
-    for source, options in selected_sources_list:
-        if source in data_source_functions:
-            if options:
-                for option in options:
-                    tmp_data, tmp_metadata = data_source_functions[source][option](
-                        bridgedb_df
-                    )
-                    print(tmp_data)
-                    combined_metadata[source][option] = tmp_metadata
-                    if tmp_data.empty:
-                        st.warning(
-                            f"No annotation available for {source}(option: {option})"
-                        )
-                    if not tmp_data.empty:
-                        combined_data = combine_sources([combined_data, tmp_data])
-
-            else:
-                tmp_data, tmp_metadata = data_source_functions[source](bridgedb_df)
-                combined_metadata[source] = tmp_metadata
-                if tmp_data.empty:
-                    st.warning(f"No annotation available for {source}")
-                if not tmp_data.empty:
-                    combined_data = combine_sources([combined_data, tmp_data])
+    tasks = _build_tasks(selected_sources_list)
+    if use_cache:
+        # Per-gene sources read the result store, whose fragments expire like the
+        # cache entries; the set-dependent ones keep the response cache
+        tasks = [
+            (
+                source,
+                option,
+                (
+                    _cached(source, option, function)
+                    if source in SET_DEPENDENT_SOURCES
+                    else _stored(source, option, function)
+                ),
+            )
+            for source, option, function in tasks
+        ]
+    if memoize is not None:
+        tasks = [
+            (source, option, _memoized(memoize, source, option, function))
+            for source, option, function in tasks
+        ]
+    if profiler is not None:
+        tasks = [
+            (
+                source,
+                option,
+                profiler.timed(
+                    f"annotator: {_label(source, option)}",
+                    function,
+                    rows_in=len(bridgedb_df),
+                ),
+            )
+            for source, option, function in tasks
+        ]
+    if parallel and len(tasks) > 1:
+        results = _run_parallel(bridgedb_df, tasks, max_workers)
+    else:
+        results = {
+            position: function(bridgedb_df)
+            for position, (_, _, function) in enumerate(tasks)
+        }
+
+    # Combine in the order of the selection so the output does not depend on timing
+    for position, (source, option, _) in enumerate(tasks):
+        label = _label(source, option)
+        if results[position] is None:
+            if raise_on_timeout:
+                raise TimeoutError(f"Query to {label} timed out")
+            warnings.append(f"Query to {label} timed out")
+            continue
+
+        tmp_data, tmp_metadata = results[position]
+        if option is None:
+            combined_metadata[source] = tmp_metadata
+        else:
+            combined_metadata[source][option] = tmp_metadata
+        if tmp_data.empty:
+            warnings.append(f"No annotation available for {label}")
+        if not tmp_data.empty:
+            accumulator.add(tmp_data)
+
+    if profiler is None:
+        combined_data = accumulator.result()
+    else:
+        with profiler.span("combine", rows_in=len(bridgedb_df)) as span:
+            combined_data = accumulator.result()
+            span.set_output(combined_data)
+
+    if persist and len(accumulator):
+        accumulator.write()
+
+    return combined_data, combined_metadata, warnings
+
+
+def process_selected_sources(
+    bridgedb_df: pd.DataFrame,
+    selected_sources_list: list,
+    parallel: bool = True,
+    memoize=None,
+    profiler=None,
+) -> pd.DataFrame:
+    """query the selected databases and convert the output to a dataframe.
+
+    @param bridgedb_df: BridgeDb output for creating the list of gene ids to query
+    @param selected_sources_list: list of selected databases
+    @param parallel: run the independent annotator calls concurrently
+    @param memoize: function (stage name, compute) memoizing each annotator result
+    @param profiler: Profiler recording the timing of the annotator calls
+    """
+
+    combined_data, combined_metadata, warnings = query_selected_sources(
+        bridgedb_df,
+        selected_sources_list,
+        parallel=parallel,
+        memoize=memoize,
+        profiler=profiler,
+    )
+    for warning in warnings:
+        st.warning(warning)
 
     return combined_data, combined_metadata
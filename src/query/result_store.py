@@ -0,0 +1,383 @@
+# coding: utf-8
+
+"""Python file for the per-gene annotation store shared by all the sessions of the server."""
+
+import os
+import pickle
+import threading
+import time
+import uuid
+from typing import Callable, Dict, Iterable, Optional
+
+import pandas as pd
+
+from src.constants import (
+    RESULT_STORE_DIR,
+    RESULT_STORE_EMPTY_TTL,
+    RESULT_STORE_SIZE,
+    RESULT_STORE_TTL,
+)
+from src.download.parquet import read_parquet, write_parquet
+from src.query.database import transaction
+from src.query.pipeline import content_hash
+from src.utils import ID_COLUMNS
+
+# Column of the segments holding the key of the fragment of a row
+FRAGMENT_COLUMN = "_fragment"
+
+# Annotators whose output for a gene depends on the other queried genes
+# (e.g. the interactions between them): their results are not split per gene
+SET_DEPENDENT_SOURCES = {"STRING-DB"}
+
+
+def fragment_keys(
+    bridgedb_df: pd.DataFrame, source: str, option=None, species: str = "Human"
+) -> Dict[str, str]:
+    """return the content-addressed key of the annotations of every input identifier.
+
+    The key depends on the BridgeDb rows of the identifier, so the same gene
+    mapped the same way gets the same key in every query.
+
+    @param bridgedb_df: BridgeDb output
+    @param source: name of the datasource
+    @param option: option of the datasource, None when the datasource has no options
+    @param species: queried species
+    """
+    rows = bridgedb_df[ID_COLUMNS].astype(str)
+    return {
+        identifier: content_hash(
+            [source, option, species, sorted(group.values.tolist())]
+        )
+        for identifier, group in rows.groupby("identifier", sort=False)
+    }
+
+
+class ResultStore:
+    """Annotations stored once per gene and per source, in Parquet segments on disk.
+
+    The result of a query is split into fragments, the annotation rows of one
+    input identifier, keyed by fragment_keys. A later query reads the fragments
+    already stored and only sends the other identifiers to the annotator.
+    Fragments written together share a segment file, the least recently read
+    segments are removed once the store exceeds its size. Fragments expire,
+    those of identifiers without annotation sooner, so that a gene is queried
+    again once its annotations may have changed.
+
+    Usage example:
+    >> store = get_result_store()
+    >> data, metadata = store.query(bridgedb_df, "DisGeNet", None, disgenet.get_gene_disease)
+    """
+
+    def __init__(
+        self,
+        directory: str = RESULT_STORE_DIR,
+        max_bytes: int = RESULT_STORE_SIZE,
+        ttl: float = RESULT_STORE_TTL,
+        empty_ttl: float = RESULT_STORE_EMPTY_TTL,
+    ):
+        """
+        @param directory: folder of the index and of the segments
+        @param max_bytes: size of the segments above which the oldest are evicted
+        @param ttl: time to live of a fragment with annotations in seconds
+        @param empty_ttl: time to live of a fragment without annotation in seconds
+        """
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.empty_ttl = empty_ttl
+        # Identifiers read from the store and sent to the annotators, counted
+        # from the worker threads of every session
+        self.stats = {"stored": 0, "fetched": 0}
+        self._stats_lock = threading.Lock()
+        self.path = os.path.join(directory, "index.sqlite")
+        with transaction(self.path) as connection:
+            connection.execute("""
+                CREATE TABLE IF NOT EXISTS segments (
+                    id TEXT PRIMARY KEY,
+                    bytes INTEGER NOT NULL,
+                    accessed REAL NOT NULL
+                )
+                """)
+            # segment is NULL for an identifier without annotation
+            connection.execute("""
+                CREATE TABLE IF NOT EXISTS fragments (
+                    key TEXT PRIMARY KEY,
+                    segment TEXT,
+                    rows INTEGER NOT NULL,
+                    created REAL NOT NULL
+                )
+                """)
+            connection.execute(
+                "CREATE INDEX IF NOT EXISTS fragments_segment ON fragments (segment)"
+            )
+            connection.execute("""
+                CREATE TABLE IF NOT EXISTS metadata (
+                    source TEXT PRIMARY KEY,
+                    value BLOB NOT NULL
+                )
+                """)
+
+    def _segment_path(self, segment: str) -> str:
+        return os.path.join(self.directory, f"{segment}.parquet")
+
+    def _expiry(self) -> tuple:
+        """return the creation dates under which the fragments with and without annotation expire."""
+        now = time.time()
+        return now - self.empty_ttl, now - self.ttl
+
+    def lookup(self, keys: Iterable[str]) -> Dict[str, Optional[str]]:
+        """return the segment of the stored fragments, None for the empty ones.
+
+        @param keys: fragment keys, the unknown and expired ones are left out of the result
+        """
+        keys = list(keys)
+        found = {}
+        with transaction(self.path, write=False) as connection:
+            # Bounded by the number of SQLite parameters
+            for start in range(0, len(keys), 500):
+                chunk = keys[start : start + 500]
+                found.update(
+                    connection.execute(
+                        "SELECT key, segment FROM fragments WHERE key IN "
+                        f"({', '.join('?' * len(chunk))}) AND created >= "
+                        "CASE WHEN segment IS NULL THEN ? ELSE ? END",
+                        [*chunk, *self._expiry()],
+                    ).fetchall()
+                )
+        return found
+
+    def load(self, fragments: Dict[str, Optional[str]]) -> pd.DataFrame:
+        """read the rows of stored fragments.
+
+        @param fragments: fragment key and segment, as returned by lookup
+        """
+        by_segment = {}
+        for key, segment in fragments.items():
+            if segment is not None:
+                by_segment.setdefault(segment, []).append(key)
+
+        frames = []
+        for segment, keys in by_segment.items():
+            try:
+                frames.append(
+                    read_parquet(
+                        self._segment_path(segment),
+                        filters=[(FRAGMENT_COLUMN, "in", keys)],
+                    )
+                )
+            except FileNotFoundError:
+                # Evicted by another process meanwhile
+                raise KeyError(segment)
+        with transaction(self.path) as connection:
+            connection.executemany(
+                "UPDATE segments SET accessed = ? WHERE id = ?",
+                [(time.time(), segment) for segment in by_segment],
+            )
+        if not frames:
+            return pd.DataFrame()
+        return pd.concat(frames, ignore_index=True).drop(columns=FRAGMENT_COLUMN)
+
+    def save(
+        self, data: pd.DataFrame, keys: Dict[str, str], source: str, metadata
+    ) -> None:
+        """store the result of a query as one fragment per input identifier.
+
+        Fragments already stored (e.g. by a concurrent query) are not written
+        again. An empty result is not stored: the annotators also return one
+        when the request failed, which says nothing about the genes.
+
+        @param data: annotator output, with an "identifier" column
+        @param keys: fragment key of every queried identifier, see fragment_keys
+        @param source: label of the datasource and option, for the metadata
+        @param metadata: metadata of the query, kept as the last one of the source
+        """
+        if data.empty or "identifier" not in data.columns:
+            return
+
+        stored = self.lookup(keys.values())
+        keys = {
+            identifier: key for identifier, key in keys.items() if key not in stored
+        }
+        data = data[data["identifier"].isin(keys)]
+        rows = data["identifier"].value_counts().to_dict()
+
+        segment = None
+        size = 0
+        if not data.empty:
+            segment = uuid.uuid4().hex
+            data = data.assign(**{FRAGMENT_COLUMN: data["identifier"].map(keys)})
+            path = self._segment_path(segment)
+            write_parquet(data, f"{path}.tmp")
+            os.replace(f"{path}.tmp", path)
+            size = os.path.getsize(path)
+
+        created = time.time()
+        with transaction(self.path) as connection:
+            if segment is not None:
+                connection.execute(
+                    "INSERT INTO segments (id, bytes, accessed) VALUES (?, ?, ?)",
+                    (segment, size, created),
+                )
+            # Replaces the expired fragments, see lookup
+            connection.executemany(
+                "INSERT OR REPLACE INTO fragments (key, segment, rows, created) "
+                "VALUES (?, ?, ?, ?)",
+                [
+                    (
+                        key,
+                        segment if rows.get(identifier) else None,
+                        rows.get(identifier, 0),
+                        created,
+                    )
+                    for identifier, key in keys.items()
+                ],
+            )
+            connection.execute(
+                "INSERT OR REPLACE INTO metadata (source, value) VALUES (?, ?)",
+                (source, pickle.dumps(metadata, protocol=pickle.HIGHEST_PROTOCOL)),
+            )
+        self.evict()
+
+    def metadata(self, source: str):
+        """return the last metadata saved for a datasource, None when unknown.
+
+        @param source: label of the datasource and option
+        """
+        with transaction(self.path, write=False) as connection:
+            row = connection.execute(
+                "SELECT value FROM metadata WHERE source = ?", (source,)
+            ).fetchone()
+        return None if row is None else pickle.loads(row[0])
+
+    def query(
+        self,
+        bridgedb_df: pd.DataFrame,
+        source: str,
+        option,
+        function: Callable,
+        species: str = "Human",
+    ):
+        """return the annotations of the identifiers, querying only the ones not stored.
+
+        The rows are sorted on the identifier columns, as the annotators do.
+
+        @param bridgedb_df: BridgeDb output
+        @param source: name of the datasource
+        @param option: option of the datasource, None when the datasource has no options
+        @param function: annotator taking the BridgeDb output and returning
+            the annotations and the metadata
+        @param species: queried species
+        """
+        label = source if option is None else f"{source} ({option})"
+        keys = fragment_keys(bridgedb_df, source, option, species)
+        stored = self.lookup(keys.values())
+        try:
+            stored_data = self.load(stored)
+        except KeyError:
+            # A segment was evicted by another process meanwhile
+            stored, stored_data = {}, pd.DataFrame()
+
+        metadata = self.metadata(label)
+        missing = [identifier for identifier, key in keys.items() if key not in stored]
+        if metadata is None:
+            missing = list(keys)
+        with self._stats_lock:
+            self.stats["stored"] += len(keys) - len(missing)
+            self.stats["fetched"] += len(missing)
+        data = None
+        if missing:
+            data, metadata = function(
+                bridgedb_df[bridgedb_df["identifier"].isin(missing)]
+            )
+            self.save(
+                data,
+                {identifier: keys[identifier] for identifier in missing},
+                label,
+                metadata,
+            )
+            if len(missing) == len(keys):
+                return data, metadata
+
+        frames = [
+            frame
+            for frame in (stored_data, data)
+            if frame is not None and not frame.empty
+        ]
+        if not frames:
+            return (pd.DataFrame() if data is None else data), metadata
+        combined = pd.concat(frames, ignore_index=True)
+        sort_columns = [column for column in ID_COLUMNS if column in combined.columns]
+        combined = combined.sort_values(sort_columns, kind="stable", ignore_index=True)
+        return combined, metadata
+
+    def size(self) -> int:
+        """return the size of the segments in bytes."""
+        with transaction(self.path, write=False) as connection:
+            (size,) = connection.execute(
+                "SELECT COALESCE(SUM(bytes), 0) FROM segments"
+            ).fetchone()
+        return size
+
+    def evict(self) -> int:
+        """remove the expired fragments and the segments left without any, then the
+        least recently read segments above the size. Returns the number of removed segments.
+        """
+        with transaction(self.path) as connection:
+            connection.execute(
+                "DELETE FROM fragments WHERE created < "
+                "CASE WHEN segment IS NULL THEN ? ELSE ? END",
+                self._expiry(),
+            )
+            orphans = {
+                segment
+                for (segment,) in connection.execute(
+                    "SELECT id FROM segments WHERE id NOT IN "
+                    "(SELECT segment FROM fragments WHERE segment IS NOT NULL)"
+                )
+            }
+            removed = list(orphans)
+            segments = connection.execute(
+                "SELECT id, bytes FROM segments ORDER BY accessed DESC"
+            ).fetchall()
+            total = 0
+            for segment, size in segments:
+                if segment in orphans:
+                    continue
+                total += size
+                if total > self.max_bytes:
+                    removed.append(segment)
+            for segment in removed:
+                connection.execute(
+                    "DELETE FROM fragments WHERE segment = ?", (segment,)
+                )
+                connection.execute("DELETE FROM segments WHERE id = ?", (segment,))
+        for segment in removed:
+            try:
+                os.remove(self._segment_path(segment))
+            except OSError:
+                pass
+        return len(removed)
+
+    def clear(self) -> None:
+        """remove all the fragments and the segments."""
+        with transaction(self.path) as connection:
+            connection.execute("DELETE FROM fragments")
+            connection.execute("DELETE FROM segments")
+            connection.execute("DELETE FROM metadata")
+        for filename in os.listdir(self.directory):
+            if filename.endswith(".parquet"):
+                os.remove(os.path.join(self.directory, filename))
+
+
+_result_store = None
+_result_store_lock = threading.Lock()
+
+
+def get_result_store() -> ResultStore:
+    """return the result store shared by all the sessions of the server."""
+    global _result_store
+    with _result_store_lock:
+        if _result_store is None:
+            _result_store = ResultStore()
+    return _result_store
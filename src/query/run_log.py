@@ -0,0 +1,194 @@
+# coding: utf-8
+
+"""Python file for the append-only log of the query runs and their metadata."""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Iterable, List, Optional
+
+from src.constants import RUN_LOG_MAX_AGE, RUN_LOG_PATH
+from src.query.database import BUSY_TIMEOUT, transaction
+
+
+class RunLog:
+    """Metadata of the query runs in a SQLite database in WAL mode.
+
+    A run is appended in a single transaction, whatever the size of the log,
+    and concurrent sessions or worker processes never rewrite each other's
+    records. The datasources of a run are indexed with its date.
+
+    Usage example:
+    >> log = get_run_log()
+    >> run_id = log.append(metadata, datasources=["BridgeDb", "DisGeNet"])
+    >> log.runs(datasource="DisGeNet", since=time.time() - 86400)
+    """
+
+    def __init__(self, path: str = RUN_LOG_PATH):
+        """
+        @param path: database file
+        """
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.path = path
+        with transaction(self.path) as connection:
+            connection.execute("""
+                CREATE TABLE IF NOT EXISTS runs (
+                    run_id TEXT PRIMARY KEY,
+                    created REAL NOT NULL,
+                    record TEXT NOT NULL
+                )
+                """)
+            connection.execute("""
+                CREATE TABLE IF NOT EXISTS run_datasources (
+                    run_id TEXT NOT NULL,
+                    datasource TEXT NOT NULL,
+                    created REAL NOT NULL,
+                    PRIMARY KEY (run_id, datasource)
+                )
+                """)
+            connection.execute(
+                "CREATE INDEX IF NOT EXISTS runs_created ON runs (created)"
+            )
+            connection.execute(
+                "CREATE INDEX IF NOT EXISTS run_datasources_date "
+                "ON run_datasources (datasource, created)"
+            )
+
+    def append(
+        self,
+        record: dict,
+        datasources: Iterable[str] = (),
+        run_id: Optional[str] = None,
+    ) -> str:
+        """add the metadata of a run and return its id.
+
+        @param record: JSON-serializable metadata of the run, other values are
+            stored as strings
+        @param datasources: datasources queried by the run, for the lookups
+        @param run_id: identifier of the run, a new one by default
+        """
+        assert isinstance(
+            record, dict
+        ), "Unsupported data type. Only dict is supported."
+        run_id = run_id or uuid.uuid4().hex
+        created = time.time()
+        with transaction(self.path) as connection:
+            connection.execute(
+                "INSERT OR REPLACE INTO runs (run_id, created, record) VALUES (?, ?, ?)",
+                (run_id, created, json.dumps(record, ensure_ascii=False, default=str)),
+            )
+            connection.executemany(
+                "INSERT OR REPLACE INTO run_datasources (run_id, datasource, created) "
+                "VALUES (?, ?, ?)",
+                [(run_id, datasource, created) for datasource in set(datasources)],
+            )
+        return run_id
+
+    def get(self, run_id: str) -> Optional[dict]:
+        """return the metadata of a run, None when unknown.
+
+        @param run_id: identifier of the run
+        """
+        with transaction(self.path, write=False) as connection:
+            row = connection.execute(
+                "SELECT record FROM runs WHERE run_id = ?", (run_id,)
+            ).fetchone()
+        return None if row is None else json.loads(row[0])
+
+    def runs(
+        self,
+        datasource: Optional[str] = None,
+        since: Optional[float] = None,
+        until: Optional[float] = None,
+        limit: Optional[int] = None,
+    ) -> List[dict]:
+        """return the runs, the most recent first, as dicts with run_id, created and record.
+
+        @param datasource: only the runs that queried this datasource
+        @param since: only the runs created at or after this timestamp
+        @param until: only the runs created before this timestamp
+        @param limit: maximum number of runs
+        """
+        if datasource is None:
+            query = "SELECT run_id, created, record FROM runs WHERE 1"
+            parameters = []
+            column = "created"
+        else:
+            query = (
+                "SELECT runs.run_id, runs.created, runs.record FROM run_datasources "
+                "JOIN runs USING (run_id) WHERE run_datasources.datasource = ?"
+            )
+            parameters = [datasource]
+            column = "run_datasources.created"
+        if since is not None:
+            query += f" AND {column} >= ?"
+            parameters.append(since)
+        if until is not None:
+            query += f" AND {column} < ?"
+            parameters.append(until)
+        query += f" ORDER BY {column} DESC"
+        if limit is not None:
+            query += " LIMIT ?"
+            parameters.append(limit)
+
+        with transaction(self.path, write=False) as connection:
+            rows = connection.execute(query, parameters).fetchall()
+        return [
+            {"run_id": run_id, "created": created, "record": json.loads(record)}
+            for run_id, created, record in rows
+        ]
+
+    def compact(self, max_age: float = RUN_LOG_MAX_AGE) -> int:
+        """remove the runs older than max_age, reclaim their space and return their number.
+
+        @param max_age: age in seconds above which a run is removed
+        """
+        cutoff = time.time() - max_age
+        with transaction(self.path) as connection:
+            removed = connection.execute(
+                "DELETE FROM runs WHERE created < ?", (cutoff,)
+            ).rowcount
+            connection.execute(
+                "DELETE FROM run_datasources WHERE created < ?", (cutoff,)
+            )
+
+        if removed:
+            connection = sqlite3.connect(
+                self.path, timeout=BUSY_TIMEOUT, isolation_level=None
+            )
+            try:
+                connection.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+                connection.execute("VACUUM")
+            except sqlite3.OperationalError:
+                # Another connection is busy, the space is reclaimed next time
+                pass
+            finally:
+                connection.close()
+        return removed
+
+
+_run_log = None
+_run_log_lock = threading.Lock()
+
+
+def get_run_log() -> RunLog:
+    """return the run log of the server, compacted when first opened by a process."""
+    global _run_log
+    with _run_log_lock:
+        if _run_log is None:
+            _run_log = RunLog()
+            _run_log.compact()
+    return _run_log
+
+
+def log_query_run(metadata: dict, selected_sources_list: list) -> str:
+    """record the metadata of a query and return the run id.
+
+    @param metadata: metadata of the id mapping and of the queries
+    @param selected_sources_list: list of selected databases and their options
+    """
+    datasources = ["BridgeDb"] + [source for source, _ in selected_sources_list]
+    return get_run_log().append(metadata, datasources=datasources)
@@ -4,9 +4,12 @@
 
 import os
 from typing import List
-import json
+import numpy as np
 import pandas as pd
-from pyBiodatafuse.constants import BRIDGEDB_DIR, DATA_DIR, COMBINED_DIR
+from pyBiodatafuse import constants
+
+# Columns identifying a row of the BridgeDb output and of the combined table
+ID_COLUMNS = ["identifier", "identifier.source", "target", "target.source"]
 
 
 def get_identifier_of_interest(bridgedb_df: pd.DataFrame, source: str) -> pd.DataFrame:
@@ -14,24 +17,21 @@ def get_identifier_of_interest(bridgedb_df: pd.DataFrame, source: str) -> pd.Dat
 
     @param source: identifier of interest from BridgeDB (e.g. "NCBI Gene")
     """
+    from src.query.datasources import get_datasource_registry, mapping_index
 
-    # Load identifier options
-    identifier_options = pd.read_csv(f"{BRIDGEDB_DIR}/datasources.tsv")[
-        "source"
-    ].tolist()
-
-    # Check if source is in identifier options
-    assert source in identifier_options, f"Source {source} is not in identifier options"
+    # Check if source is in identifier options (read once)
+    get_datasource_registry().validate(source)
 
-    # Filter rows where "target.source" is specific datasource "NCBI Gene"
-    return bridgedb_df[bridgedb_df["target.source"] == source]
+    # Rows where "target.source" is specific datasource "NCBI Gene", from the
+    # per-datasource index of the frame
+    return mapping_index(bridgedb_df).rows(source)
 
 
 def create_or_append_to_metadata(data: dict) -> None:
-    """Method to create or append to a metadata file.
+    """Method to record the metadata of a datasource query.
 
-    @param data: dictionary of data to be saved to the metadata file.
-    The metatdata file has the following schema:
+    @param data: dictionary of data to be saved to the metadata log.
+    The metadata has the following schema:
     {
         "datasource": name_of_datasource,
         "metadata": {
@@ -47,26 +47,13 @@ def create_or_append_to_metadata(data: dict) -> None:
 
         }
     }
+    Every call appends one record to the run log, indexed by its datasource
+    and date, see RunLog.
     """
-
-    metadata_file_path = f"{DATA_DIR}/metadata.json"
-
-    if os.path.exists(metadata_file_path):
-        existing_data = json.load(open(metadata_file_path))
-        prev_sources = [data["datasource"] for data in existing_data]
-    else:
-        # Initialize the existing data to an empty list
-        existing_data = []
-        prev_sources = []
+    from src.query.run_log import get_run_log
 
     assert isinstance(data, dict), "Unsupported data type. Only dict is supported."
-
-    if data["datasource"] not in prev_sources:
-        existing_data.append(data)
-
-    # Save the updated data back to the file
-    with open(metadata_file_path, "w") as file:
-        json.dump(list(existing_data), file, indent=4, ensure_ascii=False)
+    get_run_log().append(data, datasources=[data["datasource"]])
 
 
 def collapse_data_sources(
@@ -92,41 +79,117 @@ def collapse_data_sources(
 
     if target_df.empty:
         # If the target_df is empty, then return the data_df as is
+        data_df = data_df.copy()
         data_df[col_name] = None
         data_df.reset_index(inplace=True, drop=True)
         return data_df
 
     merged_df = pd.merge(data_df, target_df, on=common_cols, how="left")
 
-    # Create a new source column with values from selected columns as a list
-    merged_df[col_name] = merged_df[target_specific_cols].apply(
-        lambda row: row.to_dict(), axis=1
-    )
-    # Convert source column from string to a list of strings
-    merged_df[col_name] = merged_df[col_name].apply(lambda x: [x])
-
-    # Group by the first 4 columns and aggregate the values into a list
-    merged_df = (
-        merged_df.groupby(
-            ["identifier", "identifier.source", "target", "target.source"]
-        )[col_name]
-        .agg(sum)
-        .reset_index()
-    )
-
-    return merged_df
-
+    # One dict per row with the values of the selected columns
+    values = [merged_df[col].tolist() for col in target_specific_cols]
+    records = [dict(zip(target_specific_cols, row)) for row in zip(*values)]
+
+    # Group the rows by the identifier columns (sorted, rows with missing keys
+    # dropped as in groupby) and collect the dicts of each group into a list
+    # in a single pass, keeping the row order inside every group
+    group_ids = merged_df.groupby(ID_COLUMNS, sort=True).ngroup().to_numpy()
+    order = np.argsort(group_ids, kind="stable")
+    order = order[group_ids[order] >= 0]
+    if len(order) == 0:
+        return pd.DataFrame(columns=ID_COLUMNS + [col_name])
+    boundaries = np.flatnonzero(np.diff(group_ids[order])) + 1
+    starts = np.concatenate(([0], boundaries))
+
+    collapsed_df = merged_df.iloc[order[starts]][ID_COLUMNS].reset_index(drop=True)
+    collapsed_df[col_name] = [
+        [records[position] for position in positions]
+        for positions in np.split(order, boundaries)
+    ]
+
+    return collapsed_df
+
+
+class SourceAccumulator:
+    """Accumulate the annotator outputs and join them once on the identifier columns.
+
+    Adding a source only keeps a reference to it. The combined table is built
+    with a single join when it is first requested, and written to disk only
+    when asked to.
+
+    Usage example:
+    >> accumulator = SourceAccumulator()
+    >> accumulator.add(wikipathways_df)
+    >> accumulator.add(disgenet_df)
+    >> combined_df = accumulator.result()
+    """
 
-def combine_sources(df_list: List[pd.DataFrame]):
+    def __init__(self, df_list: List[pd.DataFrame] = ()):
+        """
+        @param df_list: dataframes to start with
+        """
+        self._frames = []
+        self._columns = set(ID_COLUMNS)
+        self._result = None
+        for df in df_list:
+            self.add(df)
+
+    def __len__(self) -> int:
+        return len(self._frames)
+
+    def add(self, df: pd.DataFrame) -> None:
+        """add the output of an annotator.
+
+        @param df: dataframe with the identifier columns and the annotation columns
+        """
+        if df.empty:
+            return
+
+        # Keep the first occurrence of a column, as the pairwise concat did
+        new_columns = [col for col in df.columns if col not in self._columns]
+        if not new_columns:
+            return
+        self._columns.update(new_columns)
+        self._frames.append(df[ID_COLUMNS + new_columns])
+        self._result = None
+
+    def result(self) -> pd.DataFrame:
+        """return the combined table of all the added sources."""
+        if self._result is not None:
+            return self._result
+        if not self._frames:
+            return pd.DataFrame()
+
+        indexed = [df.set_index(ID_COLUMNS) for df in self._frames]
+        if all(df.index.is_unique for df in indexed):
+            combined = pd.concat(indexed, axis=1, join="outer").reset_index()
+        else:
+            combined = self._frames[0]
+            for df in self._frames[1:]:
+                combined = pd.merge(combined, df, on=ID_COLUMNS, how="outer")
+
+        self._result = combined
+        return combined
+
+    def write(self, path: str = None) -> str:
+        """write the combined table to a TSV file and return its path.
+
+        @param path: output file, defaults to the combined data directory
+        """
+        if path is None:
+            os.makedirs(constants.COMBINED_DIR, exist_ok=True)
+            path = f"{constants.COMBINED_DIR}/combined_annotated_data.tsv"
+        self.result().to_csv(path, index=False, sep="\t")
+        return path
+
+
+def combine_sources(df_list: List[pd.DataFrame], persist: bool = True):
     """Combine multiple dataframes into a single dataframe.
 
     @param df_list: list of dataframes to be combined
+    @param persist: save the combined dataframe in the combined data directory
     """
-    m = pd.concat(df_list, axis=1)
-    m = m.loc[:, ~m.columns.duplicated()]  # remove duplicate columns
-
-    # Create the directory to save combined data
-    os.makedirs(COMBINED_DIR, exist_ok=True)
-
-    m.to_csv(f"{COMBINED_DIR}/combined_annotated_data.tsv", index=False, sep="\t")
-    return m
+    accumulator = SourceAccumulator(df_list)
+    if persist:
+        accumulator.write()
+    return accumulator.result()
@@ -1,302 +1,285 @@
-import pandas as pd
-import py4cytoscape as p4c
-import streamlit as st
-from pyBiodatafuse.utils import create_or_append_to_metadata
+# coding: utf-8
 
 """Python file for exporting the network to Cytoscape."""
 
+import os
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Iterator, Optional
+
+import pandas as pd
+import requests
 
-def importNetworkToCytoscape(
-    dataset: pd.DataFrame, network_name: str = "Network"
-) -> p4c.networks:
-    """Import the network to cytoscape.
+from src.visualization.network import attribute_type, is_empty, typed_value
 
-    @param dataset: the combined table created by combine_sources
-    @param network_name: network name given by users
+# Base URL of the CyREST API of the running Cytoscape app
+CYREST_URL = os.environ.get("CYREST_URL", "http://127.0.0.1:1234")
+
+# Timeout (in seconds) of the liveness probe and of the network import
+PROBE_TIMEOUT = 0.5
+IMPORT_TIMEOUT = 120
+
+# Visual style of the network, embedded in the CX2 payload
+STYLE_DEFAULTS = {
+    "node": {"NODE_BACKGROUND_COLOR": "#FF0000"},
+    "edge": {"EDGE_LINE_COLOR": "#000000"},
+}
+NODE_TYPE_STYLE = {
+    # node_type: (shape, color)
+    "gene": ("diamond", "#AAFF88"),
+    "disease": ("rectangle", "#B0C4DE"),
+    "gene ontology": ("octagon", "#FFC0CB"),
+    "reactome pathways": ("hexagon", "#FFFF00"),
+    "drug interactions": ("ellipse", "#FF0000"),
+}
+
+# A single worker so that imports reach Cytoscape in the order they were requested
+_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="cytoscape")
+
+
+class CyRestClient:
+    """Minimal client of the CyREST API.
 
     Usage example:
-    >> dataset = combine_sources
-    >> network_name = "Network"
-    >> importNetworkToCytoscape(dataset, network_name)
+    >> client = CyRestClient("http://127.0.0.1:1234")
+    >> if client.available():
+    >>     client.import_cx2(to_cx2(nodes, edges, "Network"), title="Network")
     """
-    # Initialize lists to store nodes and edges
-    nodes_data = []
-    edges_data = []
-
-    # Process each row in the input data
-    for index, row in dataset.iterrows():
-        # Extract gene information
-        gene_id = row["target"]
-        gene_name = row["identifier"]
-        gene_id_source = row["target.source"]
-
-        gene_dsi = gene_dpi = gene_pli = None
-        # gene_loc_identifier = gene_subcellular_loc = gene_location = None
-        gene_location = []
-
-        # Extract informations related to gene from DisGeNET (if availble)
-        if "DisGeNET" in dataset.columns:
-            disgenet_data = row["DisGeNET"]
-            if disgenet_data and isinstance(disgenet_data, list):
-                disgenet_keys = row["DisGeNET"][0].keys()
-                if "gene_dsi" in disgenet_keys:
-                    gene_dsi = row["DisGeNET"][0]["gene_dsi"]
-                if "gene_dpi" in disgenet_keys:
-                    gene_dpi = row["DisGeNET"][0]["gene_dpi"]
-                if "gene_pli" in disgenet_keys:
-                    gene_pli = row["DisGeNET"][0]["gene_pli"]
-
-        # Extract informations related to gene from OpenTargets location (if availble)
-        if "OpenTargets_Location" in dataset.columns:
-            opentargets_data = row["OpenTargets_Location"]
-            if opentargets_data and isinstance(opentargets_data, list):
-                opentargets_keys = row["OpenTargets_Location"][0].keys()
-                #         if "loc_identifier" in opentargets_keys:
-                #             gene_loc_identifier = row["OpenTargets_Location"][0]["loc_identifier"]
-                #         if "subcellular_loc" in opentargets_keys:
-                #             gene_subcellular_loc = row["OpenTargets_Location"][0]["subcellular_loc"]
-                #         if "location" in opentargets_keys:
-                #             gene_location = row["OpenTargets_Location"][0]["location"]
-                if "location" in opentargets_keys:
-                    location = row["OpenTargets_Location"][0]["location"]
-                    if location is not None:
-                        gene_location.append(location)
-
-        # Create nodes
-        nodes_data.append(
-            {
-                "id": gene_id,
-                "name": gene_name,
-                "id_source": gene_id_source,
-                "node_type": "gene",
-                "gene_location": gene_location,
-                # "gene_loc_id": gene_loc_identifier if gene_loc_identifier is not None and gene_loc_identifier != "" else None,
-                # "gene_subcellular_loc": gene_subcellular_loc if gene_subcellular_loc is not None and gene_subcellular_loc != "" else None,
-                # "gene_location": gene_location if gene_location is not None and gene_location != "" else None,
-                "gene_dsi": gene_dsi
-                if gene_dsi is not None and gene_dsi != ""
-                else None,
-                "gene_dpi": gene_dpi
-                if gene_dpi is not None and gene_dpi != ""
-                else None,
-                "gene_pli": gene_pli
-                if gene_pli is not None and gene_pli != ""
-                else None,
-            }
+
+    def __init__(
+        self,
+        base_url: str = CYREST_URL,
+        probe_timeout: float = PROBE_TIMEOUT,
+        timeout: float = IMPORT_TIMEOUT,
+    ):
+        """
+        @param base_url: base URL of CyREST, e.g. the url of a FakeCyREST server
+        @param probe_timeout: timeout of the liveness probe in seconds
+        @param timeout: timeout of the network import in seconds
+        """
+        self.base_url = base_url.rstrip("/")
+        self.probe_timeout = probe_timeout
+        self.timeout = timeout
+
+    def available(self) -> bool:
+        """check quickly if Cytoscape is listening."""
+        try:
+            response = requests.get(f"{self.base_url}/v1", timeout=self.probe_timeout)
+        except requests.RequestException:
+            return False
+        return response.ok
+
+    def import_cx2(
+        self, payload: list, collection: str = "BioDataFuse", title: str = "Network"
+    ) -> dict:
+        """create a network from a CX2 payload in a single request.
+
+        @param payload: CX2 document created by to_cx2
+        @param collection: name of the network collection
+        @param title: name of the network
+        """
+        response = requests.post(
+            f"{self.base_url}/v1/networks",
+            params={"format": "cx2", "collection": collection, "title": title},
+            json=payload,
+            timeout=self.timeout,
         )
+        response.raise_for_status()
+        return response.json()
 
-        # Extract gene information from DisGeNET
-        if "DisGeNET" in dataset.columns:
-            # disgenet_data = json.loads(row["DisGeNET"])
-            disgenet_data = row["DisGeNET"]
-            if (
-                disgenet_data and disgenet_data is not None
-            ):  # Check if it"s a non-empty list
-                for item in disgenet_data:
-                    disgenet_disease_id = item.get("diseaseid", "")
-                    disgenet_disease_name = item.get("disease_name", "")
-                    disgenet_disease_class = item.get("disease_class", "")
-                    disgenet_disease_class_name = item.get("disease_class_name", "")
-                    disgenet_disease_type = item.get("disease_type", "")
-                    disgenet_disease_semantic_type = item.get(
-                        "disease_semantic_type", ""
-                    )
-                    disgenet_score = item.get("score", "")
-                    disgenet_ei = item.get("ei", "")
-                    disgenet_el = item.get("el", "")
-                    disgenet_source = item.get("source", "")
-                    nodes_data.append(
-                        {
-                            "id": disgenet_disease_id,
-                            "name": disgenet_disease_name,
-                            "node_type": "disease",
-                            "disease_class": disgenet_disease_class,
-                            "disease_class_name": disgenet_disease_class_name,
-                            "disease_type": disgenet_disease_type,
-                            "disease_semantic_type": disgenet_disease_semantic_type,
-                            "disgenet_score": disgenet_score,
-                            "ei": disgenet_ei,
-                            "el": disgenet_el,
-                            "source": disgenet_source,
-                            "datasource": "DisGeNET",
-                        }
-                    )
-                    # Create edges
-                    if disgenet_disease_id != "":
-                        edges_data.append(
-                            {
-                                "source": gene_id,
-                                "target": disgenet_disease_id,
-                                "interaction": "association",
-                            }
-                        )
-
-        # Extract OpenTargets_Diseases information
-        if "OpenTargets_Diseases" in dataset.columns:
-            opentargets_data = row["OpenTargets_Diseases"]
-            if opentargets_data:  # Check if it"s a non-empty list
-                for item in opentargets_data:
-                    opentargets_disease_id = item.get("disease_id", "")
-                    opentargets_disease_name = item.get("disease_name", "")
-                    opentargets_therapeutic_areas = item.get("therapeutic_areas", "")
-                    nodes_data.append(
-                        {
-                            "id": opentargets_disease_id,
-                            "name": opentargets_disease_name,
-                            "node_type": "disease",
-                            "therapeutic_areas": opentargets_therapeutic_areas,
-                            "datasource": "OpenTargets",
-                        }
-                    )
-                    # Create edges
-                    if opentargets_disease_id != "":
-                        edges_data.append(
-                            {
-                                "source": gene_id,
-                                "target": opentargets_disease_id,
-                                "interaction": "association",
-                            }
-                        )
-
-        # Extract GO_Process information
-        if "GO_Process" in dataset.columns:
-            opentargets_data = row["GO_Process"]
-            if opentargets_data:  # Check if it"s a non-empty list
-                for item in opentargets_data:
-                    opentargets_go_id = item.get("go_id", "")
-                    opentargets_go_name = item.get("go_name", "")
-                    nodes_data.append(
-                        {
-                            "id": opentargets_go_id,
-                            "name": opentargets_go_name,
-                            "node_type": "gene ontology",
-                            "datasource": "OpenTargets",
-                        }
-                    )
-                    # Create edges
-                    if opentargets_go_id != "":
-                        edges_data.append(
-                            {
-                                "source": gene_id,
-                                "target": opentargets_go_id,
-                                "interaction": "part of",
-                            }
-                        )
-
-        # Extract Reactome_Pathways information
-        if "Reactome_Pathways" in dataset.columns:
-            opentargets_data = row["Reactome_Pathways"]
-            if opentargets_data:  # Check if it"s a non-empty list
-                for item in opentargets_data:
-                    opentargets_pathway_id = item.get("pathway_id", "")
-                    opentargets_pathway_name = item.get("pathway_name", "")
-                    nodes_data.append(
-                        {
-                            "id": opentargets_pathway_id,
-                            "name": opentargets_pathway_name,
-                            "node_type": "reactome pathways",
-                            "datasource": "OpenTargets",
-                        }
-                    )
-                    # Create edges
-                    if opentargets_pathway_id != "":
-                        edges_data.append(
-                            {
-                                "source": gene_id,
-                                "target": opentargets_pathway_id,
-                                "interaction": "part of",
-                            }
-                        )
-
-        # Extract ChEMBL_Drugs information
-        if "ChEMBL_Drugs" in dataset.columns:
-            opentargets_data = row["ChEMBL_Drugs"]
-            if opentargets_data:  # Check if it"s a non-empty list
-                for item in opentargets_data:
-                    opentargets_chembl_id = item.get("chembl_id", "")
-                    opentargets_drug_name = item.get("drug_name", "")
-                    opentargets_relation = item.get("relation", "")
-
-                    nodes_data.append(
-                        {
-                            "id": opentargets_chembl_id,
-                            "name": opentargets_drug_name,
-                            "drug_gene_relation": opentargets_relation,
-                            "node_type": "drug interactions",
-                            "datasource": "OpenTargets",
-                        }
-                    )
-                    # Create edges
-                    if opentargets_chembl_id != "":
-                        edges_data.append(
-                            {
-                                "source": gene_id,
-                                "target": opentargets_chembl_id,
-                                "interaction": opentargets_relation,
-                            }
-                        )
-
-    # Create DataFrames for nodes and edges
-    nodes = pd.DataFrame(nodes_data)
-    edges = pd.DataFrame(edges_data)
-
-    # Replace NaN values with empty strings and remove empty rows
-    if not nodes.empty and not edges.empty:
-        nodes = nodes.fillna("")
-        nodes = nodes[nodes["id"] != ""]
-        edges = edges.fillna("")
-        edges = edges[edges["target"] != ""].drop_duplicates()
-
-        # Define the visual style as a dictionary
-        default = {
-            "title": "BioDataFuse_style",
-            "defaults": [
-                {"visualProperty": "NODE_FILL_COLOR", "value": "#FF0000"},
-                {"visualProperty": "EDGE_COLOR", "value": "#000000"},
-            ],
-            "mappings": [],
+
+def _cx2_declarations(frame: pd.DataFrame, columns: list) -> dict:
+    """return the attribute declarations of the columns, typed on the whole frame.
+
+    @param frame: nodes or edges dataframe
+    @param columns: columns stored as attributes
+    """
+    return {column: {"d": attribute_type(frame[column])} for column in columns}
+
+
+def _cx2_attributes(
+    frame: pd.DataFrame, declarations: dict, chunksize: Optional[int] = None
+) -> Iterator[dict]:
+    """yield the attribute dicts of the rows, chunk by chunk.
+
+    @param frame: nodes or edges dataframe
+    @param declarations: attribute declarations created by _cx2_declarations
+    @param chunksize: number of rows converted at once, all by default
+    """
+    chunksize = chunksize or max(len(frame), 1)
+    for start in range(0, len(frame), chunksize):
+        chunk = frame.iloc[start : start + chunksize]
+        rows = [{} for _ in range(len(chunk))]
+        for column, declaration in declarations.items():
+            for attributes, value in zip(rows, chunk[column].tolist()):
+                if not is_empty(value):
+                    attributes[column] = typed_value(value, declaration["d"])
+        yield from rows
+
+
+def cx2_aspects(
+    nodes: pd.DataFrame,
+    edges: pd.DataFrame,
+    network_name: str = "Network",
+    chunksize: Optional[int] = None,
+) -> list:
+    """return the CX2 document of the network, its nodes and edges as generators.
+
+    Nodes and edges are converted chunk by chunk while the generators are
+    consumed, so the document can be written without holding all its
+    elements, see export_cx2. Use to_cx2 for a plain document.
+
+    @param nodes: nodes dataframe created by build_network
+    @param edges: edges dataframe created by build_network
+    @param network_name: network name given by users
+    @param chunksize: number of rows converted at once, all by default
+    """
+    node_ids = nodes["id"].tolist() if "id" in nodes.columns else []
+    labelled = nodes.drop(columns="id", errors="ignore").rename(
+        columns={"name": "label"}
+    )
+    node_declarations = _cx2_declarations(labelled, list(labelled.columns))
+    positions = {node_id: position for position, node_id in enumerate(node_ids)}
+
+    def cx2_nodes():
+        attributes = _cx2_attributes(labelled, node_declarations, chunksize)
+        for position, (node_id, values) in enumerate(zip(node_ids, attributes)):
+            yield {"id": position, "v": {"name": str(node_id), **values}}
+
+    edge_columns = [
+        column for column in edges.columns if column not in ("source", "target")
+    ]
+    edge_declarations = _cx2_declarations(edges, edge_columns)
+    if edges.empty:
+        kept = pd.Series(dtype=bool)
+    else:
+        kept = edges["source"].isin(positions) & edges["target"].isin(positions)
+
+    def cx2_edges():
+        if edges.empty:
+            return
+        endpoints = zip(edges["source"].tolist(), edges["target"].tolist())
+        attributes = _cx2_attributes(edges, edge_declarations, chunksize)
+        count = 0
+        for (source, target), values in zip(endpoints, attributes):
+            if source not in positions or target not in positions:
+                continue
+            interaction = values.get("interaction", "")
+            yield {
+                "id": count,
+                "s": positions[source],
+                "t": positions[target],
+                "v": {"name": f"{source} ({interaction}) {target}", **values},
+            }
+            count += 1
+
+    visual_properties = {
+        "default": {"network": {}, **STYLE_DEFAULTS},
+        "nodeMapping": {
+            "NODE_SHAPE": _discrete_mapping("node_type", 0),
+            "NODE_BACKGROUND_COLOR": _discrete_mapping("node_type", 1),
+        },
+        "edgeMapping": {},
+    }
+
+    declarations = {
+        "networkAttributes": {"name": {"d": "string"}},
+        "nodes": {"name": {"d": "string"}, **node_declarations},
+        "edges": {"name": {"d": "string"}, **edge_declarations},
+    }
+    counts = {
+        "attributeDeclarations": 1,
+        "networkAttributes": 1,
+        "nodes": len(node_ids),
+        "edges": int(kept.sum()),
+        "visualProperties": 1,
+    }
+    return [
+        {"CXVersion": "2.0", "hasFragments": False},
+        {
+            "metaData": [
+                {"name": name, "elementCount": count} for name, count in counts.items()
+            ]
+        },
+        {"attributeDeclarations": [declarations]},
+        {"networkAttributes": [{"name": network_name}]},
+        {"nodes": cx2_nodes()},
+        {"edges": cx2_edges()},
+        {"visualProperties": [visual_properties]},
+        {"status": [{"error": "", "success": True}]},
+    ]
+
+
+def to_cx2(nodes: pd.DataFrame, edges: pd.DataFrame, network_name: str = "Network"):
+    """convert the network to a CX2 document with the visual style embedded.
+
+    Node ids become the "name" attribute and the "name" column of the nodes
+    (e.g. the gene symbol or the disease name) the "label" attribute. Edges
+    referring to a missing node are dropped.
+
+    @param nodes: nodes dataframe created by build_network
+    @param edges: edges dataframe created by build_network
+    @param network_name: network name given by users
+    """
+    return [
+        {
+            name: list(elements) if isinstance(elements, Iterator) else elements
+            for name, elements in aspect.items()
         }
+        for aspect in cx2_aspects(nodes, edges, network_name)
+    ]
 
-        # Create the network in Cytoscape
-        p4c.networks.create_network_from_data_frames(
-            nodes,
-            edges,
-            title=network_name,
-            collection="BioDataFuse",
-        )
 
-        # Apply the visual style
-        p4c.styles.create_visual_style(default)
-
-        # Define node shape and color mapping
-        column = "node_type"
-        values = [
-            "gene",
-            "disease",
-            "gene ontology",
-            "reactome pathways",
-            "drug interactions",
-        ]
-        shapes = ["DIAMOND", "RECTANGLE", "OCTAGON", "HEXAGON", "ELLIPSE"]
-        colors = ["#AAFF88", "#B0C4DE", "pink", "yellow", "red"]
-
-        # Apply node shape and color mappings
-        p4c.set_node_color_mapping(
-            column, values, colors, mapping_type="d", style_name="default"
-        )
-        p4c.set_node_shape_mapping(column, values, shapes, style_name="default")
+def _discrete_mapping(attribute: str, position: int) -> dict:
+    return {
+        "type": "DISCRETE",
+        "definition": {
+            "attribute": attribute,
+            "map": [
+                {"v": value, "vp": style[position]}
+                for value, style in NODE_TYPE_STYLE.items()
+            ],
+        },
+    }
 
-        st.success("Data imported to Cytoscape!", icon="✅")
 
-        # """Metdata details"""
-        # # Add version to metadata file
-        # cytoscape_version = p4c.cytoscape_version_info()
-        # # Add the datasource, query, query time, and the date to metadata
-        # cytoscape_metadata = {
-        #     "datasource": "Cytoscape",
-        #     "metadata": {"source_version": cytoscape_version}
-        # }
+def push_network(
+    nodes: pd.DataFrame,
+    edges: pd.DataFrame,
+    network_name: str = "Network",
+    client: Optional[CyRestClient] = None,
+) -> Optional[dict]:
+    """send the network to Cytoscape as a single CX2 payload.
 
+    Returns the CyREST response, or None when the network is empty or
+    Cytoscape is not running.
+
+    @param nodes: nodes dataframe created by build_network
+    @param edges: edges dataframe created by build_network
+    @param network_name: network name given by users
+    @param client: CyREST client, the local Cytoscape by default
+    """
+    client = client or CyRestClient()
+    if nodes.empty or edges.empty or not client.available():
         return None
-    else:
-        st.success("No graph to import to Cytoscape.", icon="🚨")
+    return client.import_cx2(to_cx2(nodes, edges, network_name), title=network_name)
+
+
+def push_network_async(
+    nodes: pd.DataFrame,
+    edges: pd.DataFrame,
+    network_name: str = "Network",
+    client: Optional[CyRestClient] = None,
+    profiler=None,
+) -> Future:
+    """send the network to Cytoscape in a background thread, see push_network.
+
+    @param nodes: nodes dataframe created by build_network
+    @param edges: edges dataframe created by build_network
+    @param network_name: network name given by users
+    @param client: CyREST client, the local Cytoscape by default
+    @param profiler: Profiler recording the "Cytoscape push" span
+    """
+    function = push_network
+    if profiler is not None:
+        function = profiler.timed("Cytoscape push", push_network, rows_in=len(edges))
+    return _executor.submit(function, nodes, edges, network_name, client)
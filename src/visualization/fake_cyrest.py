@@ -0,0 +1,113 @@
+# coding: utf-8
+
+"""Python file for a local stand-in of the CyREST API, for offline tests and benchmarks."""
+
+import argparse
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+
+class FakeCyREST:
+    """Local HTTP server answering the CyREST calls used by CyRestClient.
+
+    The received networks are kept in memory, a latency can be added to every
+    response to mimic a real Cytoscape.
+
+    Usage example:
+    >> with FakeCyREST() as server:
+    >>     push_network(nodes, edges, "Network", client=CyRestClient(server.url))
+    >>     params, payload = server.networks[0]
+    """
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, latency: float = 0.0):
+        """
+        @param host: host to listen on
+        @param port: port to listen on, a free port by default
+        @param latency: delay added to every response in seconds
+        """
+        self.latency = latency
+        self.networks = []
+        self.requests = 0
+        self._server = ThreadingHTTPServer((host, port), self._handler())
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def _handler(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def _reply(self, status: int, body) -> None:
+                time.sleep(fake.latency)
+                content = json.dumps(body).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(content)))
+                self.end_headers()
+                self.wfile.write(content)
+
+            def do_GET(self):
+                fake.requests += 1
+                if urlparse(self.path).path.rstrip("/") == "/v1":
+                    self._reply(200, {"apiVersion": "v1", "cytoscapeVersion": "fake"})
+                else:
+                    self._reply(404, {"errors": [{"message": "Not found"}]})
+
+            def do_POST(self):
+                fake.requests += 1
+                url = urlparse(self.path)
+                if url.path.rstrip("/") != "/v1/networks":
+                    self._reply(404, {"errors": [{"message": "Not found"}]})
+                    return
+                length = int(self.headers.get("Content-Length", 0))
+                payload = json.loads(self.rfile.read(length) or b"null")
+                params = {
+                    key: values[-1] for key, values in parse_qs(url.query).items()
+                }
+                fake.networks.append((params, payload))
+                self._reply(200, {"networkSUID": [len(fake.networks)]})
+
+        return Handler
+
+    def start(self) -> "FakeCyREST":
+        """serve the requests in a background thread."""
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        """stop the server and release its port."""
+        if self._thread is not None:
+            self._server.shutdown()
+            self._thread.join()
+        self._server.server_close()
+
+    def __enter__(self) -> "FakeCyREST":
+        return self.start()
+
+    def __exit__(self, *args) -> None:
+        self.stop()
+
+
+if __name__ == "__main__":
+    # Run the app offline against the stand-in: CYREST_URL=http://127.0.0.1:1234
+    parser = argparse.ArgumentParser(description="Local stand-in of the CyREST API")
+    parser.add_argument("--port", type=int, default=1234)
+    parser.add_argument("--latency", type=float, default=0.0)
+    arguments = parser.parse_args()
+
+    server = FakeCyREST(port=arguments.port, latency=arguments.latency)
+    print(f"Fake CyREST listening on {server.url}")
+    try:
+        server._server.serve_forever()
+    except KeyboardInterrupt:
+        server.stop()
@@ -0,0 +1,399 @@
+# coding: utf-8
+
+"""Python file for building the nodes and edges of the network from the combined table."""
+
+import math
+from itertools import chain
+from numbers import Integral, Real
+from typing import Tuple
+
+import numpy as np
+import pandas as pd
+
+# Annotation columns of the combined table that become nodes linked to the genes.
+# "attributes" lists the node attributes in order, with the item key they are read
+# from (None for the constant "node_type" and "datasource" attributes).
+# "interaction" is the edge label, or "interaction_key" the item key holding it.
+ANNOTATION_NODES = {
+    "DisGeNET": {
+        "node_type": "disease",
+        "datasource": "DisGeNET",
+        "interaction": "association",
+        "attributes": [
+            ("id", "diseaseid"),
+            ("name", "disease_name"),
+            ("node_type", None),
+            ("disease_class", "disease_class"),
+            ("disease_class_name", "disease_class_name"),
+            ("disease_type", "disease_type"),
+            ("disease_semantic_type", "disease_semantic_type"),
+            ("disgenet_score", "score"),
+            ("ei", "ei"),
+            ("el", "el"),
+            ("source", "source"),
+            ("datasource", None),
+        ],
+    },
+    "OpenTargets_Diseases": {
+        "node_type": "disease",
+        "datasource": "OpenTargets",
+        "interaction": "association",
+        "attributes": [
+            ("id", "disease_id"),
+            ("name", "disease_name"),
+            ("node_type", None),
+            ("therapeutic_areas", "therapeutic_areas"),
+            ("datasource", None),
+        ],
+    },
+    "GO_Process": {
+        "node_type": "gene ontology",
+        "datasource": "OpenTargets",
+        "interaction": "part of",
+        "attributes": [
+            ("id", "go_id"),
+            ("name", "go_name"),
+            ("node_type", None),
+            ("datasource", None),
+        ],
+    },
+    "Reactome_Pathways": {
+        "node_type": "reactome pathways",
+        "datasource": "OpenTargets",
+        "interaction": "part of",
+        "attributes": [
+            ("id", "pathway_id"),
+            ("name", "pathway_name"),
+            ("node_type", None),
+            ("datasource", None),
+        ],
+    },
+    "ChEMBL_Drugs": {
+        "node_type": "drug interactions",
+        "datasource": "OpenTargets",
+        "interaction_key": "relation",
+        "attributes": [
+            ("id", "chembl_id"),
+            ("name", "drug_name"),
+            ("drug_gene_relation", "relation"),
+            ("node_type", None),
+            ("datasource", None),
+        ],
+    },
+}
+
+# Columns of the STRING-DB interactions (by annotator version) and the keys of
+# their records. The partner is named like the input identifiers.
+PPI_COLUMNS = ["StringDB_interactions", "stringdb"]
+PPI_PARTNER_KEY = "stringdb_link_to"
+PPI_SCORE_KEY = "score"
+PPI_INTERACTION = "interacts_with"
+PPI_MIN_SCORE = 0.0
+
+# Gene attributes read from the first record of an annotation column
+GENE_ATTRIBUTES = {
+    "DisGeNET": ["gene_dsi", "gene_dpi", "gene_pli"],
+}
+
+
+def _first_records(column: pd.Series) -> list:
+    """return the first record of every list cell, None for the other cells."""
+    return [
+        (
+            cell[0]
+            if isinstance(cell, list) and cell and isinstance(cell[0], dict)
+            else None
+        )
+        for cell in column.to_numpy()
+    ]
+
+
+def _gene_nodes(dataset: pd.DataFrame) -> pd.DataFrame:
+    """create one gene node per row of the combined table."""
+    genes = pd.DataFrame(
+        {
+            "id": dataset["target"].to_numpy(),
+            "name": dataset["identifier"].to_numpy(),
+            "id_source": dataset["target.source"].to_numpy(),
+            "node_type": "gene",
+        }
+    )
+
+    locations = [[] for _ in range(len(dataset))]
+    if "OpenTargets_Location" in dataset.columns:
+        for location, record in zip(
+            locations, _first_records(dataset["OpenTargets_Location"])
+        ):
+            if record is not None and record.get("location") is not None:
+                location.append(record["location"])
+    genes["gene_location"] = locations
+
+    for attributes in GENE_ATTRIBUTES.values():
+        for attribute in attributes:
+            genes[attribute] = None
+    for source, attributes in GENE_ATTRIBUTES.items():
+        if source not in dataset.columns:
+            continue
+        records = _first_records(dataset[source])
+        for attribute in attributes:
+            values = [
+                record.get(attribute) if record is not None else None
+                for record in records
+            ]
+            genes[attribute] = [None if value == "" else value for value in values]
+
+    return genes
+
+
+def explode_records(column: pd.Series) -> Tuple[np.ndarray, np.ndarray, list]:
+    """flatten a list-of-dict column into its records.
+
+    Returns the row position and the position inside the cell of every record,
+    with the records themselves.
+    """
+    cells = column.to_numpy()
+    lengths = np.fromiter(
+        (len(cell) if isinstance(cell, list) else 0 for cell in cells),
+        dtype=np.int64,
+        count=len(cells),
+    )
+    records = list(
+        chain.from_iterable(cell for cell in cells if isinstance(cell, list))
+    )
+    rows = np.repeat(np.arange(len(cells)), lengths)
+    offsets = np.arange(len(records)) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+
+    is_record = np.fromiter(
+        (isinstance(record, dict) for record in records),
+        dtype=bool,
+        count=len(records),
+    )
+    if not is_record.all():
+        records = [record for record, keep in zip(records, is_record) if keep]
+    return rows[is_record], offsets[is_record], records
+
+
+def _ppi_edges(dataset: pd.DataFrame, gene_ids: np.ndarray, min_score: float):
+    """build the undirected gene-gene edges of the STRING-DB interactions.
+
+    Records under min_score are dropped before any edge is built. Each pair of
+    genes is kept once, whatever its direction, with its highest score and
+    the direction of its first record. Returns the edges with the row and the
+    record position of each, None without interaction to draw.
+
+    @param dataset: the combined table created by combine_sources
+    @param gene_ids: gene node id of every row of the table
+    @param min_score: lowest score of the kept interactions
+    """
+    column = next((column for column in PPI_COLUMNS if column in dataset.columns), None)
+    if column is None:
+        return None
+    rows, offsets, records = explode_records(dataset[column])
+
+    scores = pd.to_numeric(
+        pd.Series([record.get(PPI_SCORE_KEY) for record in records], dtype=object),
+        errors="coerce",
+    ).to_numpy(dtype=float)
+    if min_score > 0:
+        kept = np.flatnonzero(scores >= min_score)
+        rows, offsets, scores = rows[kept], offsets[kept], scores[kept]
+        records = [records[position] for position in kept]
+
+    # Partners are the genes of the rows holding interactions, found by name
+    has_interactions = np.fromiter(
+        (isinstance(cell, list) for cell in dataset[column].to_numpy()),
+        dtype=bool,
+        count=len(dataset),
+    )
+    gene_of_name = pd.Series(
+        gene_ids[has_interactions],
+        index=dataset["identifier"].to_numpy()[has_interactions],
+    )
+    gene_of_name = gene_of_name[~gene_of_name.index.duplicated()]
+    sources = gene_ids[rows]
+    targets = (
+        pd.Series([record.get(PPI_PARTNER_KEY) for record in records], dtype=object)
+        .map(gene_of_name)
+        .to_numpy()
+    )
+    valid = np.flatnonzero(pd.notna(targets) & (sources != targets))
+    rows, offsets, scores = rows[valid], offsets[valid], scores[valid]
+    sources, targets = sources[valid], targets[valid]
+    if not len(valid):
+        return None
+
+    # Canonical (min, max) key of every pair of interned gene ids
+    codes, genes = pd.factorize(np.concatenate([sources, targets]))
+    source_codes, target_codes = codes[: len(valid)], codes[len(valid) :]
+    keys = np.minimum(source_codes, target_codes).astype(np.int64) * len(
+        genes
+    ) + np.maximum(source_codes, target_codes)
+
+    # Highest score of each key, at the position of its first record
+    _, first = np.unique(keys, return_index=True)
+    by_score = np.lexsort((-np.nan_to_num(scores, nan=-np.inf), keys))
+    best = by_score[np.r_[True, keys[by_score][1:] != keys[by_score][:-1]]]
+    order = np.argsort(first, kind="stable")
+    first, best = first[order], best[order]
+
+    edges = pd.DataFrame(
+        {
+            "source": sources[first],
+            "target": targets[first],
+            "interaction": PPI_INTERACTION,
+            "ppi_score": scores[best],
+        }
+    )
+    return edges, rows[first], offsets[first]
+
+
+def build_network(
+    dataset: pd.DataFrame, ppi_min_score: float = PPI_MIN_SCORE
+) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """build the nodes and edges dataframes of the network.
+
+    Nodes are ordered as in the combined table (each gene followed by its
+    annotations), rows without id are removed and repeated nodes are kept once.
+    STRING-DB interactions become gene-gene edges, see _ppi_edges.
+
+    @param dataset: the combined table created by combine_sources
+    @param ppi_min_score: lowest score of the STRING-DB interactions in the network
+
+    Usage example:
+    >> nodes, edges = build_network(combined_data)
+    """
+    genes = _gene_nodes(dataset)
+    gene_ids = genes["id"].to_numpy()
+
+    # Ordering keys: row of the combined table, annotation block, record position
+    node_blocks = [genes]
+    node_keys = [(np.arange(len(genes)), np.zeros(len(genes), dtype=np.int64))]
+    edge_blocks = []
+    edge_keys = []
+
+    for block, (column, spec) in enumerate(ANNOTATION_NODES.items(), start=1):
+        if column not in dataset.columns:
+            continue
+        rows, offsets, records = explode_records(dataset[column])
+        if not records:
+            continue
+
+        items = pd.DataFrame.from_records(records)
+        block_nodes = pd.DataFrame(index=range(len(items)))
+        for attribute, key in spec["attributes"]:
+            if key is None:
+                block_nodes[attribute] = spec[attribute]
+            elif key in items.columns:
+                block_nodes[attribute] = items[key].to_numpy()
+            else:
+                block_nodes[attribute] = ""
+        node_blocks.append(block_nodes)
+        node_keys.append((rows, block * np.ones(len(rows), dtype=np.int64), offsets))
+
+        if "interaction_key" in spec:
+            key = spec["interaction_key"]
+            interaction = items[key].to_numpy() if key in items.columns else ""
+        else:
+            interaction = spec["interaction"]
+        edge_blocks.append(
+            pd.DataFrame(
+                {
+                    "source": gene_ids[rows],
+                    "target": block_nodes["id"].to_numpy(),
+                    "interaction": interaction,
+                }
+            )
+        )
+        edge_keys.append((rows, block * np.ones(len(rows), dtype=np.int64), offsets))
+
+    ppi = _ppi_edges(dataset, gene_ids, ppi_min_score)
+    if ppi is not None:
+        ppi_edges, rows, offsets = ppi
+        block = len(ANNOTATION_NODES) + 1
+        edge_blocks.append(ppi_edges)
+        edge_keys.append((rows, block * np.ones(len(rows), dtype=np.int64), offsets))
+
+    nodes = _ordered_concat(node_blocks, node_keys)
+    edges = _ordered_concat(edge_blocks, edge_keys)
+
+    # Replace NaN values with empty strings and remove empty rows
+    if not nodes.empty:
+        nodes = nodes.fillna("")
+        nodes = nodes[nodes["id"] != ""]
+        nodes = nodes.drop_duplicates(subset="id").reset_index(drop=True)
+    if not edges.empty:
+        edges = edges.fillna("")
+        edges = edges[edges["target"] != ""].drop_duplicates()
+        edges = edges.reset_index(drop=True)
+
+    return nodes, edges
+
+
+def _ordered_concat(blocks: list, keys: list) -> pd.DataFrame:
+    """concatenate the blocks and order their rows as the row-by-row walk would."""
+    if not blocks:
+        return pd.DataFrame()
+
+    frame = pd.concat(blocks, ignore_index=True, sort=False)
+    rows = np.concatenate([key[0] for key in keys])
+    blocks_order = np.concatenate([key[1] for key in keys])
+    offsets = np.concatenate(
+        [
+            key[2] if len(key) > 2 else np.zeros(len(key[0]), dtype=np.int64)
+            for key in keys
+        ]
+    )
+    order = np.lexsort((offsets, blocks_order, rows))
+
+    # Columns appear in the order their first row appears
+    ranks = np.empty_like(order)
+    ranks[order] = np.arange(len(order))
+    first_ranks = []
+    start = 0
+    for block, key in zip(blocks, keys):
+        end = start + len(key[0])
+        if end > start:
+            first_ranks.append((ranks[start:end].min(), list(block.columns)))
+        start = end
+    columns = []
+    for _, block_columns in sorted(first_ranks, key=lambda item: item[0]):
+        columns.extend(column for column in block_columns if column not in columns)
+
+    return frame.iloc[order][columns]
+
+
+def attribute_type(column: pd.Series) -> str:
+    """return the type of a node or edge attribute, ignoring empty values.
+
+    @param column: column of the nodes or edges dataframe
+    """
+    values = [value for value in column if not is_empty(value)]
+    if values and all(isinstance(value, bool) for value in values):
+        return "boolean"
+    if values and all(
+        isinstance(value, Integral) and not isinstance(value, bool) for value in values
+    ):
+        return "long"
+    if values and all(
+        isinstance(value, Real) and not isinstance(value, bool) for value in values
+    ):
+        return "double"
+    return "string"
+
+
+def is_empty(value) -> bool:
+    """check if an attribute value is missing (None, NaN or empty string)."""
+    return (
+        value is None or (isinstance(value, float) and math.isnan(value)) or value == ""
+    )
+
+
+def typed_value(value, value_type: str):
+    """convert an attribute value to the type given by attribute_type."""
+    if value_type == "boolean":
+        return bool(value)
+    if value_type == "long":
+        return int(value)
+    if value_type == "double":
+        return float(value)
+    return str(value)
@@ -2,49 +2,81 @@
 
 """Main file for the streamlit application."""
 
+import os
+import uuid
+
 import streamlit as st
-from PIL import Image
-from requests.exceptions import RequestException
-from pyBiodatafuse import id_mapper
-from src.constants import MAIN_DIR
-from src.query.process_ids import process_identifiers
-from src.query.process_sources import process_selected_sources
-from src.download.data_link import download_tsv_as_link, download_pickle_as_link
-from src.download.metadata_link import download_json_as_link
-from src.visualization.cytoscape import importNetworkToCytoscape
+from src.constants import BATCH_SIZE, MAIN_DIR
+
+# The dependencies of the pages are imported by their render functions, so the
+# About page starts without pyBiodatafuse, pyarrow, scipy or requests
 
 st.set_page_config(layout="wide", page_title="BioDataFuse")
 
-## import the CSS styling
-with open(f"{MAIN_DIR}/style.css") as file:
-    st.markdown(f"<style>{file.read()}</style>", unsafe_allow_html=True)
 
-about = "📄About"
-query = "🔍Query biological databases"
-analysis = "📊Analysis"
+@st.cache_resource
+def load_text(path):
+    """Read a static text file once per server"""
+    with open(path, "r", encoding="utf-8") as file:
+        return file.read()
 
 
-def render_about():
-    """Render the about page"""
-    with open("./README.md", "r", encoding="utf-8") as f:
-        readme_lines = f.readlines()
-        readme_buffer = []
+@st.cache_resource
+def load_bytes(path):
+    """Read a static binary file once per server"""
+    with open(path, "rb") as file:
+        return file.read()
 
-        images = ["modular_queries_info.png"]
 
-        for line in readme_lines:
+@st.cache_resource
+def load_readme_sections(path):
+    """Split the README at the lines showing an image, once per server"""
+    images = ["modular_queries_info.png"]
+    sections = []
+    readme_buffer = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
             readme_buffer.append(line)
             for image in images:
                 if image in line:
-                    st.markdown(" ".join(readme_buffer[:-1]))
-                    st.image(
-                        f"https://raw.githubusercontent.com/elixir-europe/biohackathon-projects-2023/main/17/modular_queries_info.png"
-                    )
+                    sections.append(" ".join(readme_buffer[:-1]))
                     readme_buffer.clear()
-        st.markdown(" ".join(readme_buffer))
+    sections.append(" ".join(readme_buffer))
+    return sections
+
+
+## import the CSS styling
+st.markdown(
+    f"<style>{load_text(f'{MAIN_DIR}/style.css')}</style>", unsafe_allow_html=True
+)
+
+about = "📄About"
+query = "🔍Query biological databases"
+analysis = "📊Analysis"
+
+
+def render_about():
+    """Render the about page"""
+    sections = load_readme_sections(f"{MAIN_DIR}/README.md")
+    for section in sections[:-1]:
+        st.markdown(section)
+        st.image(
+            "https://raw.githubusercontent.com/elixir-europe/biohackathon-projects-2023/main/17/modular_queries_info.png"
+        )
+    st.markdown(sections[-1])
 
 
 def render_query():
+    from src.profiling import cprofile_to
+    from src.query.cache import cached_bridgedb_xref, get_response_cache
+    from src.query.compact import compact
+    from src.query.datasources import get_datasource_registry
+    from src.query.pipeline import QueryPipeline
+    from src.query.process_ids import UPLOAD_EXTENSIONS, ingest_inputs
+    from src.query.process_sources import process_selected_sources
+    from src.query.result_store import get_result_store
+    from src.query.run_log import log_query_run
+
     # Step 1: Import a list of identifiers
     st.markdown(
         '<p style="font-size: 25px;">1. Import Identifiers</p>', unsafe_allow_html=True
@@ -54,32 +86,50 @@ def render_query():
     with col1:
         uploaded_file = st.file_uploader(
             "Upload a file containing identifiers",
-            help="Upload a file with one identifier per row or a comma-separated list (CSV or TXT)",
-            type=["csv", "txt"],
+            help="Upload a file with one identifier per row or a comma-separated list (CSV or TXT, optionally gzip-compressed)",
+            type=[extension.lstrip(".") for extension in UPLOAD_EXTENSIONS],
         )
     with col2:
         text_input = st.text_area("Or enter identifiers (one per line)", "")
 
     # Step 2: Process input data using data_loader module
-    identifiers_df = process_identifiers(uploaded_file, text_input)
+    # (each stage is recomputed only when its inputs changed)
+    pipeline = QueryPipeline(st.session_state)
+    profiler = get_profiler()
+    if uploaded_file is None and text_input.strip() == "":
+        ingested = ingest_inputs(uploaded_file, text_input)
+    else:
+        file_contents = None if uploaded_file is None else uploaded_file.getvalue()
+
+        def parse_identifiers():
+            # New input, new timings
+            profiler.reset()
+            with profiler.span("ID parsing") as span:
+                ingested = ingest_inputs(uploaded_file, text_input)
+                span.set_output(ingested.identifiers)
+            return ingested
+
+        ingested = pipeline.run(
+            "identifiers", [file_contents, text_input], parse_identifiers
+        )
+    identifiers_df = None if ingested is None else ingested.identifiers
+    if ingested is not None:
+        render_rejections(ingested)
 
-    # Step 3: Select identifier type (only when a file is uploaded)
+    # Step 3: Select identifier type (only when a file is uploaded),
+    # preselected when the identifiers look like one type
     if identifiers_df is not None:
-        identifier_type = "Select identifier type"
+        identifier_types = ["Select identifier type"]
+        identifier_types += get_datasource_registry().identifier_types("gene")
+        guessed_type = ingested.guessed_type
         identifier_type = st.selectbox(
             "**Identifier Type**",
-            [
-                "Select identifier type",
-                "RefSeq",
-                "WikiGenes",
-                "OMIM",
-                "Uniprot-TrEMBL",
-                "NCBI Gene",
-                "Ensembl",
-                "HGNC Accession Number",
-                "PDB",
-                "HGNC",
-            ],
+            identifier_types,
+            index=(
+                identifier_types.index(guessed_type)
+                if guessed_type in identifier_types
+                else 0
+            ),
         )
 
     # Step 4: Show the number of inputs
@@ -87,12 +137,20 @@ def render_query():
         st.write(f"Number of input identifiers: {len(identifiers_df)}")
         st.write(f"Selected identifier type: {identifier_type}")
 
-        # Step 5: Convert idenifiers using BridgeDb
-        bridgdb_df, bridgdb_metadata = id_mapper.bridgedb_xref(
-            identifiers=identifiers_df,
-            input_species="Human",
-            input_datasource=identifier_type,
-            output_datasource="All",
+        # Step 5: Convert idenifiers using BridgeDb (cached across reruns)
+        bridgdb_df, bridgdb_metadata = pipeline.run(
+            "mapping",
+            [pipeline.digest("identifiers"), identifier_type],
+            profiler.timed(
+                "BridgeDb mapping",
+                lambda: cached_bridgedb_xref(
+                    identifiers=identifiers_df,
+                    input_species="Human",
+                    input_datasource=identifier_type,
+                    output_datasource="All",
+                ),
+                rows_in=len(identifiers_df),
+            ),
         )
 
         # Check if the input is valid
@@ -146,71 +204,605 @@ def render_query():
             if not selected_sources_list:
                 st.warning("Please select at least one datasource option.", icon="⚠️")
             else:
-                # Warningto import to "Cytoscape"
-                st.warning(
-                    "To visualize the query results in Cytoscape, please start the app.",
-                    icon="⚠️",
+                # Import to "Cytoscape" is optional, the network can be downloaded
+                send_to_cytoscape = st.checkbox(
+                    "Import the network to Cytoscape",
+                    value=True,
+                    help="Cytoscape has to run on the same machine as this app",
                 )
 
+                profile_query = st.checkbox(
+                    "Profile the query with cProfile",
+                    help="Runs the datasources one after the other and saves a pstats file",
+                )
+                run_as_job = st.checkbox(
+                    "Run as a background job",
+                    help="The query keeps running if you leave, load its results later with the job id",
+                )
                 query_button = st.button("Query", key="query_button")
 
             # Step 9: Execute selected functions when the "Query" button is clicked
-            if selected_sources_list and query_button:
-                combined_data, combined_metadata = process_selected_sources(
-                    bridgdb_df, selected_sources_list
-                )
-
-                # Check if the DataFrame is empty
-                if combined_data.empty:
-                    st.warning("The DataFrame is empty")
-                elif not combined_data.empty:
-                    # Convert the DataFrame to a TSV
-                    combined_table = combined_data.to_csv(
-                        index=False, sep="\t"
-                    )  # Saved for internal check
-
-                    # import to "Cytoscape"
-                    try:
-                        importNetworkToCytoscape(combined_data, "BioDataFuse Network")
-                    except RequestException as e:
-                        pass
-
-                    # Step 10: Display download links
-                    st.markdown(
-                        '<p style="font-size: 25px;">3. Export data</p>',
-                        unsafe_allow_html=True,
-                    )
-
-                    # metadata
+            # (the results of the last query are kept until its inputs change)
+            sources_inputs = [pipeline.digest("mapping"), selected_sources_list]
+            if selected_sources_list and query_button and run_as_job:
+                submit_job(bridgdb_df, selected_sources_list, bridgdb_metadata)
+                results = None
+            elif selected_sources_list and query_button:
+
+                def query_sources():
+                    profiler.reset(keep=["ID parsing", "BridgeDb mapping"])
+                    if bridgdb_df["identifier"].nunique() > BATCH_SIZE:
+                        with profiler.span(
+                            "annotators (batches)", rows_in=len(bridgdb_df)
+                        ) as span:
+                            combined_data, combined_metadata = query_in_batches(
+                                bridgdb_df, selected_sources_list
+                            )
+                            span.set_output(combined_data)
+                    else:
+                        combined_data, combined_metadata = process_selected_sources(
+                            bridgdb_df,
+                            selected_sources_list,
+                            parallel=not profile_query,
+                            memoize=lambda stage, compute: pipeline.run(
+                                stage, [pipeline.digest("mapping")], compute
+                            ),
+                            profiler=profiler,
+                        )
                     metadata = {}
                     metadata["id_mapping"] = bridgdb_metadata
                     metadata["queries"] = combined_metadata
-                    metadata_url = download_json_as_link(
-                        metadata, "BioDataFuse_metadata"
+                    log_query_run(metadata, selected_sources_list)
+                    # Kept across reruns in the compact form only
+                    return compact(combined_data), metadata
+
+                if profile_query:
+                    profile_path = os.path.join(
+                        get_export_dir(), "BioDataFuse_profile.pstats"
                     )
-                    st.markdown(metadata_url, unsafe_allow_html=True)
+                    with cprofile_to(profile_path):
+                        results = pipeline.run("sources", sources_inputs, query_sources)
+                    st.session_state["profile_dump"] = profile_path
+                else:
+                    results = pipeline.run("sources", sources_inputs, query_sources)
+                cache_stats = get_response_cache().stats
+                store_stats = get_result_store().stats
+                # Counted over all the queries of the server since it started
+                st.caption(
+                    "Server totals. Response cache: "
+                    f"{cache_stats['memory_hits'] + cache_stats['disk_hits']} hits, "
+                    f"{cache_stats['misses']} misses. "
+                    f"Stored annotations: {store_stats['stored']} genes read, "
+                    f"{store_stats['fetched']} genes queried"
+                )
+            else:
+                results = pipeline.get("sources", sources_inputs)
+
+            if results is not None:
+                render_results(pipeline, profiler, results, send_to_cytoscape)
+
+    render_jobs(pipeline, profiler)
+
+    with st.expander("Pipeline stages"):
+        st.table(pipeline.report())
+
+    render_timing(profiler)
+
+
+def render_results(pipeline, profiler, results, send_to_cytoscape):
+    """Render the network and the downloads of the query results"""
+    from src.query.compact import legacy
+
+    combined_data, metadata = results
+
+    # Check if the DataFrame is empty
+    if combined_data.empty:
+        st.warning("The DataFrame is empty")
+    elif not combined_data.empty:
+        st.caption(
+            f"{len(combined_data)} rows, {combined_data.nbytes / 1024**2:.1f} MB in memory"
+        )
+
+        # Build the network once per result and STRING-DB score threshold
+        min_score = render_ppi_threshold(combined_data)
+        nodes, edges = pipeline.run(
+            "graph",
+            [pipeline.digest("sources"), min_score],
+            lambda: build_graph(legacy(combined_data), profiler, min_score),
+        )
+
+        # import to "Cytoscape" once per network
+        if send_to_cytoscape:
+            import_network(nodes, edges, pipeline.digest("graph"), profiler)
+            render_cytoscape_status()
+
+        # Step 10: Display download buttons
+        render_export(combined_data, metadata, pipeline.digest("sources"), profiler)
+        render_graph_export(nodes, edges, pipeline.digest("graph"), profiler)
+
+
+def get_user_id():
+    """Return the user id kept in the URL, so that jobs are found again after reconnecting"""
+    params = st.experimental_get_query_params()
+    if "user" not in params:
+        params["user"] = [uuid.uuid4().hex]
+        st.experimental_set_query_params(**params)
+    return params["user"][0]
+
+
+def submit_job(bridgdb_df, selected_sources_list, bridgdb_metadata):
+    """Submit the query to the background workers"""
+    from src.query.jobs import (
+        JobLimitError,
+        JobSubmitError,
+        get_job_manager,
+        query_and_build_network,
+    )
+
+    description = ", ".join(
+        source if not options else f"{source} ({', '.join(options)})"
+        for source, options in selected_sources_list
+    )
+    try:
+        job_id = get_job_manager().submit(
+            get_user_id(),
+            query_and_build_network,
+            bridgdb_df,
+            selected_sources_list,
+            bridgdb_metadata,
+            description=f"{bridgdb_df['identifier'].nunique()} identifiers: {description}",
+        )
+    except (JobLimitError, JobSubmitError) as e:
+        st.warning(str(e), icon="⚠️")
+        return
+    params = st.experimental_get_query_params()
+    params["job"] = [job_id]
+    st.experimental_set_query_params(**params)
+    st.success(f"Job {job_id} submitted, its results are listed below.", icon="✅")
+
+
+def render_jobs(pipeline, profiler):
+    """Render the background jobs of the user and the results of a loaded job"""
+    import pandas as pd
+
+    from src.query.jobs import get_job_manager
+
+    jobs = get_job_manager().store.list(get_user_id())
+    if not jobs:
+        return
+
+    st.markdown(
+        '<p style="font-size: 25px;">Background jobs</p>', unsafe_allow_html=True
+    )
+    jobs_df = pd.DataFrame(jobs)
+    jobs_df["created"] = pd.to_datetime(jobs_df["created"], unit="s").dt.strftime(
+        "%Y-%m-%d %H:%M:%S"
+    )
+    st.dataframe(
+        jobs_df[["id", "created", "description", "status", "rows", "error"]],
+        hide_index=True,
+        use_container_width=True,
+    )
+    # A rerun reads the job table again
+    st.button("Refresh", key="refresh_jobs")
+
+    last_job = st.experimental_get_query_params().get("job", [jobs[0]["id"]])[0]
+    st.text_input("Job id", last_job, key="job_id")
+    # Loaded before the rerun, so the query section above does not render the
+    # results it replaces: one result set per run
+    st.button(
+        "Load the job results", key="load_job", on_click=load_job, args=(pipeline,)
+    )
+    for level, message in st.session_state.pop("job_messages", []):
+        getattr(st, level)(message)
+
+    loaded_job = st.session_state.get("loaded_job")
+    results = loaded_job and pipeline.get("sources", ["job", loaded_job])
+    if results:
+        st.markdown(f"**Results of job {loaded_job}**")
+        render_results(pipeline, profiler, results, send_to_cytoscape=False)
+
+
+def load_job(pipeline, job_id):
+    """Store the results of a finished job as the current query results"""
+    from src.query.compact import compact
+    from src.query.jobs import get_job_manager
+    from src.visualization.network import PPI_MIN_SCORE
+
+    job_id = st.session_state["job_id"].strip()
+    manager = get_job_manager()
+    job = manager.store.get(job_id)
+    if job is None:
+        st.session_state["job_messages"] = [("warning", f"No job {job_id}")]
+        return
+    if job["status"] != "done":
+        st.session_state["job_messages"] = [
+            ("info", f"Job {job_id} is {job['status']}")
+        ]
+        return
+    combined_data, metadata, nodes, edges, warnings = manager.result(job_id)
+    pipeline.run("sources", ["job", job_id], lambda: (compact(combined_data), metadata))
+    pipeline.run(
+        "graph", [pipeline.digest("sources"), PPI_MIN_SCORE], lambda: (nodes, edges)
+    )
+    st.session_state["loaded_job"] = job_id
+    st.session_state["job_messages"] = [("warning", warning) for warning in warnings]
+
+
+def render_rejections(ingested):
+    """Render the identifiers that were not kept from the input"""
+    rejected = sum(
+        count for reason, count in ingested.counts.items() if reason != "accepted"
+    )
+    if not rejected:
+        return
+    with st.expander(f"{rejected} input values were not kept"):
+        st.write(ingested.counts)
+        st.dataframe(ingested.rejected, hide_index=True, use_container_width=True)
+
 
-                    # TSV
-                    tsv_url = download_tsv_as_link(
-                        combined_data, "BioDataFuse_combined_table"
+def get_profiler():
+    """Return the profiler of the session, kept until the input changes"""
+    from src.profiling import Profiler
+
+    if "profiler" not in st.session_state:
+        st.session_state["profiler"] = Profiler()
+    return st.session_state["profiler"]
+
+
+def get_export_dir():
+    """Return the export folder of the session"""
+    from src.download.export import cleanup_exports, session_export_dir
+
+    if "session_id" not in st.session_state:
+        st.session_state["session_id"] = uuid.uuid4().hex
+        cleanup_exports()
+    return session_export_dir(st.session_state["session_id"])
+
+
+def render_timing(profiler):
+    """Render the timing and memory of the stages of the current query"""
+    with st.expander("Timing and memory"):
+        spans = profiler.report()
+        if spans:
+            st.table(spans)
+        else:
+            st.write("No stage was run yet.")
+        profile_path = st.session_state.get("profile_dump")
+        if profile_path and os.path.exists(profile_path):
+            with open(profile_path, "rb") as file:
+                st.download_button(
+                    "Download the cProfile dump",
+                    file,
+                    file_name=os.path.basename(profile_path),
+                    mime="application/octet-stream",
+                    help="Open it with python -m pstats or snakeviz",
+                )
+
+
+def query_in_batches(bridgdb_df, selected_sources_list):
+    """Query large identifier lists batch by batch, resuming from the checkpoints"""
+    from src.query.batching import BatchRunner
+
+    progress_bar = st.progress(0.0, text="Querying the first batch...")
+
+    def show_progress(done, total, throughput):
+        progress_bar.progress(
+            done / total,
+            text=f"{done}/{total} batches done ({throughput:.0f} identifiers/s)",
+        )
+
+    combined_data, combined_metadata, warnings = BatchRunner().run(
+        bridgdb_df, selected_sources_list, progress=show_progress
+    )
+    for warning in warnings:
+        st.warning(warning)
+    return combined_data, combined_metadata
+
+
+def render_ppi_threshold(combined_data):
+    """Render the STRING-DB score slider when the results have interactions, return the threshold"""
+    from src.visualization.network import PPI_COLUMNS, PPI_MIN_SCORE
+
+    if not any(column in combined_data.columns for column in PPI_COLUMNS):
+        return PPI_MIN_SCORE
+    return st.slider(
+        "Minimum STRING-DB interaction score",
+        min_value=0.0,
+        max_value=1.0,
+        value=PPI_MIN_SCORE,
+        step=0.05,
+        help="Protein-protein interactions under this score are left out of the network",
+    )
+
+
+def build_graph(combined_data, profiler, ppi_min_score):
+    """Build the nodes and edges of the network"""
+    from src.visualization.network import build_network
+
+    with profiler.span("graph building", rows_in=len(combined_data)) as span:
+        nodes, edges = build_network(combined_data, ppi_min_score)
+        span.set_output(edges)
+    return nodes, edges
+
+
+def import_network(nodes, edges, graph_digest, profiler):
+    """Import the network to Cytoscape when it is running, once per network"""
+    from src.visualization.cytoscape import push_network_async
+
+    if st.session_state.get("cytoscape_network") == graph_digest:
+        return
+    st.session_state["cytoscape_network"] = graph_digest
+    # The import runs in the background, see render_cytoscape_status
+    st.session_state["cytoscape_push"] = push_network_async(
+        nodes, edges, "BioDataFuse Network", profiler=profiler
+    )
+
+
+def render_cytoscape_status():
+    """Render the state of the background import to Cytoscape"""
+    push = st.session_state.get("cytoscape_push")
+    if push is None:
+        return
+    if not push.done():
+        st.info("Importing the network to Cytoscape in the background...", icon="⏳")
+    elif push.exception() is not None:
+        st.warning(f"Import to Cytoscape failed: {push.exception()}", icon="🚨")
+    elif push.result() is None:
+        st.info("Cytoscape is not running, the network was not imported.", icon="ℹ️")
+    else:
+        st.success("Data imported to Cytoscape!", icon="✅")
+
+
+def render_export(combined_data, metadata, results_digest, profiler):
+    """Render the export section of the query results"""
+    from src.download.export import EXPORT_FORMATS, export_json, export_table
+
+    # Exported files of the current results
+    if st.session_state.get("exports", {}).get("digest") != results_digest:
+        st.session_state["exports"] = {"digest": results_digest}
+    exports = st.session_state["exports"]
+
+    directory = get_export_dir()
+
+    st.markdown(
+        '<p style="font-size: 25px;">3. Export data</p>',
+        unsafe_allow_html=True,
+    )
+
+    # metadata, with the timing of the stages that produced the results
+    if "metadata" not in exports:
+        exports["metadata"] = export_json(
+            dict(metadata, timing=profiler.report()),
+            os.path.join(directory, "BioDataFuse_metadata.json"),
+        )
+    with open(exports["metadata"], "rb") as file:
+        st.download_button(
+            "**Download the query information**",
+            file,
+            file_name="BioDataFuse_metadata.json",
+            mime="application/json",
+        )
+
+    # Combined table, only written when requested
+    for export_format, (_, _, mime) in EXPORT_FORMATS.items():
+        if export_format not in exports and st.button(
+            f"Prepare {export_format} file", key=f"export_{export_format}"
+        ):
+            with st.spinner(f"Writing the {export_format} file..."):
+                with profiler.span(
+                    f"export: {export_format}", rows_in=len(combined_data)
+                ):
+                    exports[export_format] = export_table(
+                        combined_data,
+                        export_format,
+                        directory,
+                        "BioDataFuse_combined_table",
                     )
-                    st.markdown(tsv_url, unsafe_allow_html=True)
+        if export_format in exports:
+            render_download(
+                exports,
+                export_format,
+                f"**Download output {export_format} file**",
+                mime,
+                key=f"download_{export_format}",
+            )
 
-                    # parquet
 
-                    pickle_url = download_pickle_as_link(
-                        combined_data, "BioDataFuse_combined_table_pickle"
+def render_graph_export(nodes, edges, graph_digest, profiler):
+    """Render the download of the network as graph files"""
+    from src.download.graph import GRAPH_FORMATS, export_graph
+
+    if st.session_state.get("graph_exports", {}).get("digest") != graph_digest:
+        st.session_state["graph_exports"] = {"digest": graph_digest}
+    exports = st.session_state["graph_exports"]
+    directory = get_export_dir()
+
+    st.markdown(f"**Network**: {len(nodes)} nodes, {len(edges)} edges")
+    for graph_format, (_, _, mime) in GRAPH_FORMATS.items():
+        if graph_format not in exports and st.button(
+            f"Prepare {graph_format} file", key=f"graph_export_{graph_format}"
+        ):
+            with st.spinner(f"Writing the {graph_format} file..."):
+                with profiler.span(f"export: {graph_format}", rows_in=len(edges)):
+                    exports[graph_format] = export_graph(
+                        nodes, edges, graph_format, directory, "BioDataFuse_network"
                     )
-                    st.markdown(pickle_url, unsafe_allow_html=True)
+        if graph_format in exports:
+            render_download(
+                exports,
+                graph_format,
+                f"**Download network {graph_format} file**",
+                mime,
+                key=f"graph_download_{graph_format}",
+            )
+
+
+def render_download(exports, export_format, label, mime, key):
+    """Render the download of a prepared file, forgotten once downloaded
+
+    The button holds the whole file in the server memory, so it is only
+    built between "Prepare" and the download, not on every rerun.
+    """
+    with open(exports[export_format], "rb") as file:
+        st.download_button(
+            label,
+            file.read(),
+            file_name=os.path.basename(exports[export_format]),
+            mime=mime,
+            key=key,
+            on_click=exports.pop,
+            args=(export_format, None),
+        )
 
 
 def render_analysis():
-    st.write("Deveoplemnt in progress...")
+    """Render the analysis page of the network of the last query"""
+    from src.analysis.graph_store import GraphStore
+    from src.query.pipeline import QueryPipeline
+
+    pipeline = QueryPipeline(st.session_state)
+    network = pipeline.value("graph")
+    if network is None:
+        st.info("Query some datasources first to analyze their network.", icon="ℹ️")
+        return
+
+    # Interned graph of the current network, built once per network
+    graph_digest = pipeline.digest("graph")
+    if st.session_state.get("graph_store", {}).get("digest") != graph_digest:
+        st.session_state["graph_store"] = {
+            "digest": graph_digest,
+            "store": GraphStore(*network),
+        }
+    store = st.session_state["graph_store"]["store"]
+    st.write(f"Network: {len(store)} nodes, {store.n_edges} edges")
+
+    node_types = [node_type for node_type in store.node_types if node_type]
+    col1, col2 = st.columns([1, 2])
+    with col1:
+        node_type = st.selectbox("**Node type**", ["All"] + node_types)
+        node_type = None if node_type == "All" else node_type
+        st.markdown("**Most connected nodes**")
+        top = store.top_degree(node_type, n=20)
+        st.dataframe(top, hide_index=True, use_container_width=True)
+    with col2:
+        node_id = st.text_input("**Node id**", top["id"].iloc[0] if len(top) else "")
+        if node_id and node_id not in store:
+            st.warning(f"{node_id} is not in the network")
+        elif node_id:
+            neighbor_type = st.selectbox(
+                "**Neighbor type**", ["All"] + node_types, key="neighbor_type"
+            )
+            neighbor_type = None if neighbor_type == "All" else neighbor_type
+            st.write(
+                f"{node_id} ({store.node_type(node_id)}): "
+                f"{store.degree(node_id)} edges"
+            )
+            st.dataframe(
+                store.neighbor_table(node_id, neighbor_type),
+                hide_index=True,
+                use_container_width=True,
+            )
+
+    render_explorer(pipeline)
+    render_enrichment(pipeline)
+
+
+def render_explorer(pipeline):
+    """Render the combined table page by page, with the records of a gene"""
+    from src.analysis.explorer import PAGE_SIZE, ResultExplorer
+
+    st.markdown('<p style="font-size: 25px;">Query results</p>', unsafe_allow_html=True)
+    sources_digest = pipeline.digest("sources")
+    if st.session_state.get("explorer", {}).get("digest") != sources_digest:
+        combined_data, _ = pipeline.value("sources")
+        st.session_state["explorer"] = {
+            "digest": sources_digest,
+            "explorer": ResultExplorer(combined_data),
+        }
+    explorer = st.session_state["explorer"]["explorer"]
+
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        sources = st.multiselect("**Identifier type**", explorer.sources)
+    with col2:
+        node_types = st.multiselect("**Annotated with**", list(explorer.node_types))
+    with col3:
+        columns = st.multiselect(
+            "**Columns**",
+            explorer.annotation_columns,
+            default=explorer.annotation_columns,
+        )
+
+    # Only the rows of the page are converted and sent to the browser
+    count = explorer.count(sources=sources, node_types=node_types)
+    pages = max(1, -(-count // PAGE_SIZE))
+    number = st.number_input(
+        f"Page (of {pages}, {count} rows)",
+        min_value=1,
+        max_value=pages,
+        value=1,
+        key=f"explorer_page_{count}",
+    )
+    page = explorer.page(
+        number - 1, columns=columns, sources=sources, node_types=node_types
+    )
+    st.dataframe(page, use_container_width=True)
+    st.caption("Annotation columns show the number of records of each row.")
+
+    col1, col2 = st.columns([1, 2])
+    with col1:
+        identifier = st.selectbox(
+            "**Records of**", page["identifier"].unique() if len(page) else []
+        )
+    with col2:
+        column = st.selectbox("**Annotation**", columns)
+    if identifier is not None and column is not None:
+        st.dataframe(
+            explorer.records(identifier, column),
+            hide_index=True,
+            use_container_width=True,
+        )
+
+
+def render_enrichment(pipeline):
+    """Render the over-representation analysis of the annotations"""
+    from src.analysis.enrichment import ENRICHMENT_TERMS, EnrichmentEngine
+    from src.query.compact import legacy
+
+    st.markdown(
+        '<p style="font-size: 25px;">Enrichment analysis</p>', unsafe_allow_html=True
+    )
+    sources_digest = pipeline.digest("sources")
+    if st.session_state.get("enrichment", {}).get("digest") != sources_digest:
+        combined_data, _ = pipeline.value("sources")
+        st.session_state["enrichment"] = {
+            "digest": sources_digest,
+            "engine": EnrichmentEngine(
+                legacy(combined_data, ["identifier", *ENRICHMENT_TERMS])
+            ),
+        }
+    engine = st.session_state["enrichment"]["engine"]
+    if engine.matrix.shape[1] == 0:
+        st.info("The query results have no pathway, GO or disease annotation.")
+        return
+
+    gene_set = st.text_area(
+        "Genes of interest (one per line)",
+        help="Tested against all the input genes of the query",
+    )
+    gene_set = [gene.strip() for gene in gene_set.splitlines() if gene.strip()]
+    if gene_set:
+        table = engine.enrich(gene_set)
+        st.write(
+            f"{table['set_size'].iloc[0] if len(table) else 0} of {len(gene_set)} "
+            f"genes found, {len(table)} terms tested"
+        )
+        st.dataframe(table, hide_index=True, use_container_width=True)
 
 
 # Add sidebar
-logo = Image.open(f"{MAIN_DIR}/logo.png")
-st.sidebar.image(logo)
+st.sidebar.image(load_bytes(f"{MAIN_DIR}/logo.png"))
 st.sidebar.markdown(
     "<h1 style='font-size: 40px; text-align: center;'>BioDataFuse</h1>",
     unsafe_allow_html=True,
@@ -0,0 +1,110 @@
+"""Timing and peak memory of the benchmarks, compared to a baseline.
+
+Every measurement is appended to BENCH_RESULTS as a JSON line. When
+BENCH_BASELINE points to the results of a previous run, a benchmark slower or
+hungrier than the baseline by more than BENCH_TOLERANCE fails.
+
+    python -m pytest -s -m benchmark tests/benchmarks
+    BENCH_SIZES=10,1000,100000 BENCH_BASELINE=main.jsonl python -m pytest -m benchmark tests/benchmarks
+"""
+
+import gc
+import json
+import os
+import platform
+import time
+import tracemalloc
+
+import pytest
+
+# Number of genes of the synthetic inputs
+SIZES = [
+    int(size) for size in os.environ.get("BENCH_SIZES", "10,1000,10000").split(",")
+]
+REPEAT = int(os.environ.get("BENCH_REPEAT", 3))
+RESULTS = os.environ.get("BENCH_RESULTS", ".benchmarks/results.jsonl")
+BASELINE = os.environ.get("BENCH_BASELINE")
+TOLERANCE = float(os.environ.get("BENCH_TOLERANCE", 1.5))
+
+# Measurements below these are noise and never compared
+MIN_SECONDS = 0.05
+MIN_PEAK_MB = 1.0
+
+
+def _load_baseline(path):
+    baseline = {}
+    if path and os.path.exists(path):
+        with open(path, encoding="utf-8") as file:
+            for line in file:
+                record = json.loads(line)
+                # The last run of a benchmark wins
+                baseline[(record["benchmark"], record["size"])] = record
+    return baseline
+
+
+class Measure:
+    """Run a function, record its best time and its peak Python memory.
+
+    The memory is traced by tracemalloc: numpy buffers are included, Arrow
+    buffers (e.g. of the Parquet export) are not.
+    """
+
+    def __init__(self, baseline):
+        self.baseline = baseline
+        self.records = []
+
+    def __call__(self, benchmark: str, size: int, function, *args, **kwargs):
+        times = []
+        for _ in range(REPEAT):
+            gc.collect()
+            start = time.perf_counter()
+            result = function(*args, **kwargs)
+            times.append(time.perf_counter() - start)
+            del result
+
+        # tracemalloc slows the code down, so the memory is measured on its own run
+        gc.collect()
+        tracemalloc.start()
+        try:
+            result = function(*args, **kwargs)
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+
+        record = {
+            "benchmark": benchmark,
+            "size": size,
+            "seconds": round(min(times), 6),
+            "peak_mb": round(peak / 1024**2, 3),
+            "python": platform.python_version(),
+            "date": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        }
+        self.records.append(record)
+        print(
+            f"\n{benchmark} [{size}]: {record['seconds']:.4f}s, "
+            f"peak {record['peak_mb']:.1f} MB"
+        )
+        self._compare(record)
+        return result
+
+    def _compare(self, record):
+        reference = self.baseline.get((record["benchmark"], record["size"]))
+        if reference is None:
+            return
+        regressions = []
+        for key, floor in (("seconds", MIN_SECONDS), ("peak_mb", MIN_PEAK_MB)):
+            if record[key] >= floor and record[key] > reference[key] * TOLERANCE:
+                regressions.append(f"{key} {reference[key]} -> {record[key]}")
+        name = f"{record['benchmark']} [{record['size']}]"
+        assert not regressions, f"{name} regressed: {', '.join(regressions)}"
+
+
+@pytest.fixture(scope="session")
+def measure():
+    measure = Measure(_load_baseline(BASELINE))
+    yield measure
+    if measure.records:
+        os.makedirs(os.path.dirname(RESULTS) or ".", exist_ok=True)
+        with open(RESULTS, "a", encoding="utf-8") as file:
+            for record in measure.records:
+                file.write(json.dumps(record) + "\n")
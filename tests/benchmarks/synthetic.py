@@ -0,0 +1,168 @@
+"""Synthetic BridgeDb and annotator outputs for the offline benchmarks.
+
+The tables have the columns and the record keys of the pyBiodatafuse
+annotators, with a fixed seed so runs are comparable.
+"""
+
+import numpy as np
+import pandas as pd
+
+from src.utils import ID_COLUMNS, SourceAccumulator, collapse_data_sources
+
+# Annotation column: (target.source, records per gene, record factory)
+ANNOTATORS = {
+    "WikiPathways": (
+        "NCBI Gene",
+        4,
+        lambda rng, n: {
+            "pathway_id": np.char.add("WP", rng.integers(0, 2_000, n).astype(str)),
+            "pathway_label": "Signaling pathway",
+            "pathway_gene_count": rng.integers(5, 500, n).astype(float),
+        },
+    ),
+    "DisGeNET": (
+        "NCBI Gene",
+        8,
+        lambda rng, n: {
+            "diseaseid": np.char.add("C", rng.integers(0, 30_000, n).astype(str)),
+            "disease_name": "Neoplasm",
+            "disease_class": "C04",
+            "disease_class_name": "Neoplasms",
+            "disease_type": "disease",
+            "disease_semantic_type": "Neoplastic Process",
+            "score": rng.random(n).round(2),
+            "ei": rng.random(n).round(3),
+            "el": "",
+            "source": "CURATED",
+            "gene_dsi": 0.5,
+            "gene_dpi": 0.7,
+            "gene_pli": 0.9,
+        },
+    ),
+    "OpenTargets_Location": (
+        "Ensembl",
+        1,
+        lambda rng, n: {
+            "location": "Nucleus",
+            "loc_identifier": np.char.add("SL-", rng.integers(0, 300, n).astype(str)),
+            "subcellular_loc": "nucleus",
+        },
+    ),
+    "GO_Process": (
+        "Ensembl",
+        12,
+        lambda rng, n: {
+            "go_id": np.char.add("GO:", rng.integers(0, 30_000, n).astype(str)),
+            "go_name": "biological process",
+        },
+    ),
+    "Reactome_Pathways": (
+        "Ensembl",
+        6,
+        lambda rng, n: {
+            "pathway_id": np.char.add("R-HSA-", rng.integers(0, 2_500, n).astype(str)),
+            "pathway_name": "Reactome pathway",
+        },
+    ),
+    "ChEMBL_Drugs": (
+        "Ensembl",
+        2,
+        lambda rng, n: {
+            "chembl_id": np.char.add("CHEMBL", rng.integers(0, 10_000, n).astype(str)),
+            "drug_name": "drug",
+            "relation": rng.choice(["inhibits", "activates"], n),
+        },
+    ),
+    "OpenTargets_Diseases": (
+        "Ensembl",
+        5,
+        lambda rng, n: {
+            "disease_id": np.char.add("EFO_", rng.integers(0, 20_000, n).astype(str)),
+            "disease_name": "disease",
+            "therapeutic_areas": "EFO_0000616:neoplasm",
+        },
+    ),
+}
+
+
+def bridgedb_frame(n_genes: int) -> pd.DataFrame:
+    """BridgeDb output of n_genes HGNC symbols mapped to NCBI Gene and Ensembl."""
+    genes = np.arange(n_genes).astype(str)
+    symbols = np.char.add("GENE", genes)
+    return pd.DataFrame(
+        {
+            "identifier": np.repeat(symbols, 2),
+            "identifier.source": "HGNC",
+            "target": np.ravel(
+                np.column_stack([genes, np.char.add("ENSG", np.char.zfill(genes, 11))])
+            ),
+            "target.source": np.tile(["NCBI Gene", "Ensembl"], n_genes),
+        }
+    )
+
+
+def target_frame(bridgedb_df: pd.DataFrame, column: str, seed: int = 0) -> pd.DataFrame:
+    """raw annotator response of a column: one row per record with a "target" column.
+
+    A tenth of the genes have no record.
+    """
+    namespace, per_gene, factory = ANNOTATORS[column]
+    targets = bridgedb_df.loc[bridgedb_df["target.source"] == namespace, "target"]
+    targets = targets.to_numpy()[np.arange(len(targets)) % 10 != 9]
+    rng = np.random.default_rng(seed)
+    frame = pd.DataFrame(factory(rng, len(targets) * per_gene))
+    frame.insert(0, "target", np.repeat(targets, per_gene))
+    return frame
+
+
+def annotator_output(bridgedb_df: pd.DataFrame, column: str) -> pd.DataFrame:
+    """collapsed output of an annotator, as returned by pyBiodatafuse."""
+    namespace = ANNOTATORS[column][0]
+    target_df = target_frame(bridgedb_df, column)
+    return collapse_data_sources(
+        bridgedb_df,
+        namespace,
+        target_df,
+        ["target"],
+        [name for name in target_df.columns if name != "target"],
+        column,
+    )
+
+
+def stringdb_output(bridgedb_df: pd.DataFrame, per_gene: int = 5) -> pd.DataFrame:
+    """collapsed STRING-DB output, each gene linked to genes of the same input."""
+    ensembl = bridgedb_df[bridgedb_df["target.source"] == "Ensembl"].reset_index(
+        drop=True
+    )
+    rng = np.random.default_rng(1)
+    partners = ensembl["identifier"].to_numpy()[
+        rng.integers(0, len(ensembl), (len(ensembl), per_gene))
+    ]
+    scores = rng.random((len(ensembl), per_gene)).round(3)
+    ensembl["stringdb"] = [
+        [
+            {"stringdb_link_to": partner, "score": score}
+            for partner, score in zip(row, row_scores)
+        ]
+        for row, row_scores in zip(partners.tolist(), scores.tolist())
+    ]
+    return ensembl[ID_COLUMNS + ["stringdb"]]
+
+
+def annotator_outputs(bridgedb_df: pd.DataFrame) -> list:
+    """collapsed outputs of every annotator."""
+    return [annotator_output(bridgedb_df, column) for column in ANNOTATORS] + [
+        stringdb_output(bridgedb_df)
+    ]
+
+
+def combined_table(n_genes: int) -> pd.DataFrame:
+    """combined table of n_genes genes annotated by every annotator."""
+    return SourceAccumulator(annotator_outputs(bridgedb_frame(n_genes))).result()
+
+
+def identifier_text(n_genes: int) -> str:
+    """text area content with n_genes identifiers, a few repeated or invalid."""
+    identifiers = np.char.add("GENE", np.arange(n_genes).astype(str)).tolist()
+    identifiers += identifiers[: n_genes // 20] + ["bad id!"] * (n_genes // 50)
+    return "\n".join(identifiers)
@@ -0,0 +1,76 @@
+import os
+import time
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.utils import collapse_data_sources
+
+N_GENES = int(os.environ.get("BENCH_GENES", 10_000))
+N_HITS = int(os.environ.get("BENCH_HITS", 500))
+
+
+def legacy_collapse_data_sources(
+    data_df, source_namespace, target_df, common_cols, target_specific_cols, col_name
+):
+    """collapse_data_sources before the single-pass aggregation, for reference."""
+    data_df = data_df[data_df["target.source"] == source_namespace]
+    merged_df = pd.merge(data_df, target_df, on=common_cols, how="left")
+    merged_df[col_name] = merged_df[target_specific_cols].apply(
+        lambda row: row.to_dict(), axis=1
+    )
+    merged_df[col_name] = merged_df[col_name].apply(lambda x: [x])
+    return (
+        merged_df.groupby(
+            ["identifier", "identifier.source", "target", "target.source"]
+        )[col_name]
+        .agg(sum)
+        .reset_index()
+    )
+
+
+def synthetic_hits(n_genes: int, n_hits: int):
+    """BridgeDb output of n_genes genes and an annotator output with n_hits per gene."""
+    genes = np.arange(n_genes).astype(str)
+    bridgedb_df = pd.DataFrame(
+        {
+            "identifier": np.char.add("GENE", genes),
+            "identifier.source": "HGNC",
+            "target": genes,
+            "target.source": "NCBI Gene",
+        }
+    )
+    rng = np.random.default_rng(0)
+    target_df = pd.DataFrame(
+        {
+            "target": np.repeat(genes, n_hits),
+            "go_id": np.char.add(
+                "GO:", rng.integers(0, 30_000, n_genes * n_hits).astype(str)
+            ),
+            "go_name": "biological process",
+        }
+    )
+    return bridgedb_df, target_df
+
+
+@pytest.mark.benchmark
+def test_collapse_data_sources_benchmark():
+    bridgedb_df, target_df = synthetic_hits(N_GENES, N_HITS)
+    args = (bridgedb_df, "NCBI Gene", target_df, ["target"], ["go_id", "go_name"], "GO")
+
+    start = time.perf_counter()
+    collapsed = collapse_data_sources(*args)
+    single_pass = time.perf_counter() - start
+
+    start = time.perf_counter()
+    reference = legacy_collapse_data_sources(*args)
+    legacy = time.perf_counter() - start
+
+    print(
+        f"\ncollapse_data_sources {N_GENES} genes x {N_HITS} hits: "
+        f"{single_pass:.2f}s (legacy groupby-sum {legacy:.2f}s, "
+        f"{legacy / single_pass:.1f}x)"
+    )
+    assert collapsed["GO"].tolist() == reference["GO"].tolist()
+    assert single_pass < legacy
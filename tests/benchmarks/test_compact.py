@@ -0,0 +1,33 @@
+import os
+
+import pytest
+
+from src.query.compact import CompactTable, memory_report
+from tests.benchmarks.conftest import SIZES
+from tests.benchmarks.synthetic import combined_table
+
+# Genes of a standard panel, the size of a large cancer gene panel
+PANEL_GENES = int(os.environ.get("BENCH_PANEL_GENES", 500))
+
+
+@pytest.mark.benchmark
+def test_panel_memory_report():
+    report = memory_report(combined_table(PANEL_GENES))
+
+    print(
+        f"\nCombined table of a {PANEL_GENES}-gene panel ({report['rows']} rows): "
+        f"{report['legacy_bytes'] / 1024**2:.1f} MB as lists of dicts, "
+        f"{report['compact_bytes'] / 1024**2:.1f} MB compact ({report['ratio']}x)"
+    )
+    assert report["ratio"] > 2
+
+
+@pytest.mark.benchmark
+@pytest.mark.parametrize("size", SIZES)
+def test_compact_conversions(measure, size):
+    data = combined_table(size)
+
+    table = measure("CompactTable.from_legacy", size, CompactTable.from_legacy, data)
+    legacy = measure("CompactTable.to_legacy", size, table.to_legacy)
+    assert legacy["identifier"].tolist() == data["identifier"].tolist()
+    assert legacy["GO_Process"].str.len().sum() == data["GO_Process"].str.len().sum()
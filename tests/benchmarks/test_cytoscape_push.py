@@ -0,0 +1,49 @@
+import os
+import time
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.visualization.cytoscape import CyRestClient, push_network
+from src.visualization.fake_cyrest import FakeCyREST
+
+N_EDGES = int(os.environ.get("BENCH_EDGES", 100_000))
+LATENCY = float(os.environ.get("BENCH_CYREST_LATENCY", 0.05))
+
+
+def synthetic_network(n_edges: int, n_genes: int = 1_000):
+    """network of n_genes genes linked to n_edges distinct diseases."""
+    genes = np.char.add("GENE", np.arange(n_genes).astype(str))
+    diseases = np.char.add("C", np.arange(n_edges).astype(str))
+    nodes = pd.DataFrame(
+        {
+            "id": np.concatenate([genes, diseases]),
+            "name": np.concatenate([genes, diseases]),
+            "node_type": ["gene"] * n_genes + ["disease"] * n_edges,
+        }
+    )
+    edges = pd.DataFrame(
+        {
+            "source": genes[np.arange(n_edges) % n_genes],
+            "target": diseases,
+            "interaction": "association",
+        }
+    )
+    return nodes, edges
+
+
+@pytest.mark.benchmark
+def test_cytoscape_push_benchmark():
+    nodes, edges = synthetic_network(N_EDGES)
+
+    with FakeCyREST(latency=LATENCY) as server:
+        start = time.perf_counter()
+        push_network(nodes, edges, "Network", client=CyRestClient(server.url))
+        seconds = time.perf_counter() - start
+
+    print(
+        f"\nCX2 push of {len(nodes)} nodes and {N_EDGES} edges: {seconds:.2f}s "
+        f"in {server.requests} requests ({LATENCY}s latency each)"
+    )
+    assert server.requests == 2
@@ -0,0 +1,47 @@
+import os
+import time
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.analysis.enrichment import EnrichmentEngine
+
+N_GENES = int(os.environ.get("BENCH_GENES", 20_000))
+N_TERMS = int(os.environ.get("BENCH_TERMS", 30_000))
+TERMS_PER_GENE = 20
+
+
+def synthetic_annotations(n_genes: int, n_terms: int):
+    """combined table of n_genes genes with TERMS_PER_GENE random GO terms each."""
+    rng = np.random.default_rng(0)
+    terms = rng.integers(0, n_terms, (n_genes, TERMS_PER_GENE))
+    return pd.DataFrame(
+        {
+            "identifier": np.char.add("GENE", np.arange(n_genes).astype(str)),
+            "GO_Process": [
+                [{"go_id": f"GO:{term}", "go_name": "process"} for term in row]
+                for row in terms
+            ],
+        }
+    )
+
+
+@pytest.mark.benchmark
+def test_enrichment_benchmark():
+    data = synthetic_annotations(N_GENES, N_TERMS)
+
+    start = time.perf_counter()
+    engine = EnrichmentEngine(data)
+    build = time.perf_counter() - start
+
+    gene_set = data["identifier"].iloc[: N_GENES // 10]
+    start = time.perf_counter()
+    table = engine.enrich(gene_set)
+    enrich = time.perf_counter() - start
+
+    print(
+        f"\nenrichment {N_GENES} genes x {engine.matrix.shape[1]} terms: "
+        f"incidence matrix {build:.2f}s, {len(table)} terms tested in {enrich:.2f}s"
+    )
+    assert enrich < 1.0
@@ -0,0 +1,19 @@
+import pytest
+
+from src.analysis.explorer import ResultExplorer
+from src.query.compact import compact
+from tests.benchmarks.conftest import SIZES
+from tests.benchmarks.synthetic import combined_table
+
+
+@pytest.mark.benchmark
+@pytest.mark.parametrize("size", SIZES)
+def test_explorer_page(measure, size):
+    explorer = ResultExplorer(compact(combined_table(size)))
+    filters = {"sources": ["Ensembl"], "node_types": ["disease"]}
+    last = explorer.count(**filters) // 50 - 1
+
+    # The cost of a page should not grow with the size of the table
+    page = measure("ResultExplorer.page", size, explorer.page, max(last, 0), **filters)
+    assert len(page) == min(50, size)
+    measure("ResultExplorer.records", size, explorer.records, "GENE5", "DisGeNET")
@@ -0,0 +1,52 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+from src.constants import MAIN_DIR
+
+# Import time of the About page in seconds, the sum of the -X importtime self times
+IMPORT_BUDGET = float(os.environ.get("BENCH_IMPORT_BUDGET", 1.5))
+
+# Dependencies of the Query and Analysis pages only (PIL is used by st.image)
+HEAVY_MODULES = ["pyBiodatafuse", "scipy", "pyarrow", "requests"]
+
+
+def import_report():
+    """run the app in bare mode (About page) and parse its -X importtime report.
+
+    Returns the total import time in seconds and the cumulative time of the
+    top-level packages.
+    """
+    process = subprocess.run(
+        [sys.executable, "-X", "importtime", "streamlit_app.py"],
+        cwd=MAIN_DIR,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    total = 0
+    packages = {}
+    for line in process.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_time, cumulative, name = line[len("import time:") :].split("|")
+        total += int(self_time)
+        if not name.startswith("  "):
+            packages[name.strip()] = int(cumulative) / 1e6
+    return total / 1e6, packages
+
+
+@pytest.mark.benchmark
+def test_about_page_import_time(measure):
+    total, packages = measure("import: About page", 0, import_report)
+
+    slowest = sorted(packages.items(), key=lambda item: -item[1])[:10]
+    print(f"About page imports: {total:.2f}s (budget {IMPORT_BUDGET}s)")
+    for name, seconds in slowest:
+        print(f"  {seconds:.3f}s {name}")
+    assert not [
+        name for name in packages if name.split(".")[0] in HEAVY_MODULES
+    ], "heavy dependencies imported by the About page"
+    assert total < IMPORT_BUDGET
@@ -0,0 +1,110 @@
+import io
+
+import pytest
+
+from src.download.export import EXPORT_FORMATS
+from src.download.graph import GRAPH_FORMATS
+from src.query.process_ids import ingest_identifiers
+from src.utils import collapse_data_sources, combine_sources
+from src.visualization.network import build_network
+from tests.benchmarks.conftest import SIZES
+from tests.benchmarks.synthetic import (
+    annotator_outputs,
+    bridgedb_frame,
+    combined_table,
+    identifier_text,
+    target_frame,
+)
+
+_combined = {}
+
+
+def cached_combined_table(n_genes):
+    """the combined table of a size, built once for all the benchmarks."""
+    if n_genes not in _combined:
+        _combined[n_genes] = combined_table(n_genes)
+    return _combined[n_genes]
+
+
+@pytest.mark.benchmark
+@pytest.mark.parametrize("size", SIZES)
+class TestPipelineBenchmarks:
+    """Benchmark the offline stages of the query pipeline"""
+
+    def test_ingest_identifiers(self, measure, size):
+        text = identifier_text(size)
+        data = text.encode("utf-8")
+
+        result = measure(
+            "ingest_identifiers", size, ingest_identifiers, [("text", text)]
+        )
+        assert len(result.identifiers) == size
+        measure(
+            "ingest_identifiers (file)",
+            size,
+            lambda: ingest_identifiers([("file.txt", io.BytesIO(data))]),
+        )
+
+    def test_collapse_data_sources(self, measure, size):
+        bridgedb_df = bridgedb_frame(size)
+        target_df = target_frame(bridgedb_df, "GO_Process")
+
+        collapsed = measure(
+            "collapse_data_sources",
+            size,
+            collapse_data_sources,
+            bridgedb_df,
+            "Ensembl",
+            target_df,
+            ["target"],
+            ["go_id", "go_name"],
+            "GO_Process",
+        )
+        assert len(collapsed) == size
+
+    def test_combine_sources(self, measure, size):
+        outputs = annotator_outputs(bridgedb_frame(size))
+
+        combined = measure(
+            "combine_sources", size, combine_sources, outputs, persist=False
+        )
+        assert len(combined) == 2 * size
+
+    def test_build_network(self, measure, size):
+        nodes, edges = measure(
+            "build_network", size, build_network, cached_combined_table(size)
+        )
+        assert (nodes["node_type"] == "gene").sum() == 2 * size
+        assert not edges.empty
+
+    def test_build_network_ppi_threshold(self, measure, size):
+        _, edges = measure(
+            "build_network (PPI score >= 0.7)",
+            size,
+            build_network,
+            cached_combined_table(size),
+            0.7,
+        )
+        scores = edges.loc[edges["interaction"] == "interacts_with", "ppi_score"]
+        assert (scores.astype(float) >= 0.7).all()
+
+    @pytest.mark.parametrize("export_format", EXPORT_FORMATS)
+    def test_export_table(self, measure, size, export_format, tmp_path):
+        function, extension, _ = EXPORT_FORMATS[export_format]
+        path = str(tmp_path / f"combined.{extension}")
+
+        measure(
+            f"export {export_format}",
+            size,
+            function,
+            cached_combined_table(size),
+            path,
+        )
+
+    @pytest.mark.parametrize("graph_format", GRAPH_FORMATS)
+    def test_export_graph(self, measure, size, graph_format, tmp_path):
+        nodes, edges = build_network(cached_combined_table(size))
+        function, extension, _ = GRAPH_FORMATS[graph_format]
+        path = str(tmp_path / f"network.{extension}")
+
+        measure(f"export {graph_format}", size, function, nodes, edges, path)
@@ -1,2 +1,3 @@
 def pytest_configure(config):
     config.addinivalue_line("markers", "e2e: mark as end-to-end test")
+    config.addinivalue_line("markers", "benchmark: mark as performance benchmark")
@@ -0,0 +1,160 @@
+import os
+
+import pandas as pd
+import pytest
+
+from src.query.batching import BatchRunner, split_batches
+
+
+def bridgedb_output(n_genes=5):
+    genes = [f"GENE{i}" for i in range(n_genes)]
+    return pd.DataFrame(
+        {
+            "identifier": [gene for gene in genes for _ in range(2)],
+            "identifier.source": "HGNC",
+            "target": [f"{gene}_{suffix}" for gene in genes for suffix in "ab"],
+            "target.source": "Ensembl",
+        }
+    )
+
+
+def annotate(bridgedb_df, selected_sources_list):
+    data = bridgedb_df.assign(GO_Process=[[{"go_id": "GO:1"}]] * len(bridgedb_df))
+    return data, {"OpenTarget": {"Gene Ontology (GO)": {"version": 1}}}, []
+
+
+class TestBatchRunner:
+    """Test the batched and resumable queries"""
+
+    def test_split_keeps_identifiers_together(self):
+        batches = split_batches(bridgedb_output(5), batch_size=2)
+
+        assert [batch["identifier"].nunique() for batch in batches] == [2, 2, 1]
+        assert [len(batch) for batch in batches] == [4, 4, 2]
+
+    def test_run(self, tmp_path):
+        progress = []
+        runner = BatchRunner(batch_size=2, checkpoint_dir=str(tmp_path), query=annotate)
+        data, metadata, warnings = runner.run(
+            bridgedb_output(5), [], progress=lambda *args: progress.append(args[:2])
+        )
+
+        assert len(data) == 10
+        assert metadata == {"OpenTarget": {"Gene Ontology (GO)": {"version": 1}}}
+        assert progress == [(1, 3), (2, 3), (3, 3)]
+        assert os.listdir(str(tmp_path)) == []
+
+    def test_retry(self, tmp_path):
+        failures = [RuntimeError("upstream error")]
+
+        def flaky(bridgedb_df, selected_sources_list):
+            if failures:
+                raise failures.pop()
+            return annotate(bridgedb_df, selected_sources_list)
+
+        runner = BatchRunner(
+            batch_size=2, backoff=0, checkpoint_dir=str(tmp_path), query=flaky
+        )
+        assert len(runner.run(bridgedb_output(3), [])[0]) == 6
+
+    def test_resume(self, tmp_path):
+        calls = []
+
+        def fail_on_last_batch(bridgedb_df, selected_sources_list):
+            calls.append(bridgedb_df["identifier"].iloc[0])
+            if "GENE4" in set(bridgedb_df["identifier"]):
+                raise RuntimeError("upstream error")
+            return annotate(bridgedb_df, selected_sources_list)
+
+        runner = BatchRunner(
+            batch_size=2,
+            retries=0,
+            checkpoint_dir=str(tmp_path),
+            query=fail_on_last_batch,
+        )
+        with pytest.raises(RuntimeError):
+            runner.run(bridgedb_output(5), [])
+        assert calls == ["GENE0", "GENE2", "GENE4"]
+
+        def record(bridgedb_df, selected_sources_list):
+            calls.append(bridgedb_df["identifier"].iloc[0])
+            return annotate(bridgedb_df, selected_sources_list)
+
+        calls.clear()
+        runner.query = record
+        assert len(runner.run(bridgedb_output(5), [])[0]) == 10
+        assert calls == ["GENE4"]
+
+        calls.clear()
+        runner.query = fail_on_last_batch
+        with pytest.raises(RuntimeError):
+            runner.run(bridgedb_output(5), [])
+        assert calls == ["GENE0", "GENE2", "GENE4"]
+
+    def test_warnings_of_every_batch(self, tmp_path):
+        def warn(bridgedb_df, selected_sources_list):
+            data, metadata, _ = annotate(bridgedb_df, selected_sources_list)
+            warnings = ["No annotation available for DisGeNet"]
+            if "GENE0" in set(bridgedb_df["identifier"]):
+                warnings.append("No annotation available for WikiPathway")
+            return data, metadata, warnings
+
+        runner = BatchRunner(batch_size=2, checkpoint_dir=str(tmp_path), query=warn)
+        assert runner.run(bridgedb_output(3), [])[2] == [
+            "No annotation available for DisGeNet"
+        ]
+
+    def test_set_dependent_sources_query_all_identifiers(self, tmp_path):
+        calls = []
+
+        def record(bridgedb_df, selected_sources_list):
+            sources = [source for source, _ in selected_sources_list]
+            calls.append((sources, bridgedb_df["identifier"].nunique()))
+            if sources == ["STRING-DB"]:
+                data = bridgedb_df.assign(
+                    stringdb=[[{"score": 0.9}]] * len(bridgedb_df)
+                )
+                return data, {"STRING-DB": {"size": 5}}, []
+            return annotate(bridgedb_df, selected_sources_list)
+
+        runner = BatchRunner(batch_size=2, checkpoint_dir=str(tmp_path), query=record)
+        data, metadata, _ = runner.run(
+            bridgedb_output(5), [("OpenTarget", "GO"), ("STRING-DB", None)]
+        )
+
+        assert calls[-1] == (["STRING-DB"], 5)
+        assert calls[:-1] == [
+            (["OpenTarget"], 2),
+            (["OpenTarget"], 2),
+            (["OpenTarget"], 1),
+        ]
+        assert len(data) == 10 and data["stringdb"].notna().all()
+        assert metadata["STRING-DB"] == {"size": 5}
+
+    def test_metadata_of_every_batch(self, tmp_path):
+        def sized(bridgedb_df, selected_sources_list):
+            data, _, warnings = annotate(bridgedb_df, selected_sources_list)
+            query = {"size": bridgedb_df["identifier"].nunique(), "date": "d"}
+            query["date"] += bridgedb_df["identifier"].iloc[0]
+            return data, {"DisGeNET": {"version": 1, "query": query}}, warnings
+
+        runner = BatchRunner(batch_size=2, checkpoint_dir=str(tmp_path), query=sized)
+        _, metadata, _ = runner.run(bridgedb_output(5), [])
+
+        assert metadata == {
+            "DisGeNET": {
+                "version": 1,
+                "query": {"size": 5, "date": ["dGENE0", "dGENE2", "dGENE4"]},
+            }
+        }
+
+    def test_metadata_of_equal_batches(self, tmp_path):
+        def sized(bridgedb_df, selected_sources_list):
+            data, _, warnings = annotate(bridgedb_df, selected_sources_list)
+            query = {"size": bridgedb_df["identifier"].nunique(), "version": 1}
+            return data, {"DisGeNET": {"query": query}}, warnings
+
+        runner = BatchRunner(batch_size=2, checkpoint_dir=str(tmp_path), query=sized)
+        _, metadata, _ = runner.run(bridgedb_output(4), [])
+
+        assert metadata == {"DisGeNET": {"query": {"size": 4, "version": 1}}}
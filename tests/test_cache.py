@@ -0,0 +1,69 @@
+import os
+import time
+
+import pandas as pd
+
+from src.query.cache import ResponseCache, make_key
+
+
+class TestResponseCache:
+    """Test the BridgeDb and annotator response cache"""
+
+    def test_key_ignores_order_and_duplicates(self):
+        key = make_key(["2", "1", "1"], "NCBI Gene", "Human", "OpenTarget", "GO")
+        assert key == make_key(["1", "2"], "NCBI Gene", "Human", "OpenTarget", "GO")
+        assert key != make_key(["1", "2"], "NCBI Gene", "Human", "OpenTarget", None)
+
+    def test_compute_once(self, tmp_path):
+        cache = ResponseCache(directory=str(tmp_path))
+        calls = []
+
+        def compute():
+            calls.append(1)
+            return {"rows": 3}
+
+        assert cache.get_or_compute("k", compute) == {"rows": 3}
+        assert cache.get_or_compute("k", compute) == {"rows": 3}
+        assert len(calls) == 1
+        assert cache.stats == {"memory_hits": 1, "disk_hits": 0, "misses": 1}
+
+    def test_disk_tier_survives_restart(self, tmp_path):
+        ResponseCache(directory=str(tmp_path)).put("k", [1, 2])
+
+        cache = ResponseCache(directory=str(tmp_path))
+        assert cache.get("k") == [1, 2]
+        assert cache.stats["disk_hits"] == 1
+
+    def test_lru_eviction(self):
+        cache = ResponseCache(directory=None, memory_size=2)
+        cache.put("a", 1)
+        cache.put("b", 2)
+        cache.get("a")
+        cache.put("c", 3)
+
+        assert cache.get("b") is None
+        assert cache.get("a") == 1
+        assert cache.get("c") == 3
+
+    def test_ttl_expiry(self, tmp_path):
+        cache = ResponseCache(directory=str(tmp_path), ttl=60)
+        cache.put("k", "value")
+        path = os.path.join(str(tmp_path), "k.pkl")
+        os.utime(path, (time.time() - 120, time.time() - 120))
+
+        assert ResponseCache(directory=str(tmp_path), ttl=60).get("k") is None
+        assert not os.path.exists(path)
+
+    def test_empty_results_not_cached(self, tmp_path):
+        cache = ResponseCache(directory=str(tmp_path))
+        calls = []
+
+        def compute():
+            calls.append(1)
+            return pd.DataFrame(), {"error": "timeout"}
+
+        cache.get_or_compute("k", compute)
+        data, _ = cache.get_or_compute("k", compute)
+        assert data.empty
+        assert len(calls) == 2
+        assert not os.path.exists(os.path.join(str(tmp_path), "k.pkl"))
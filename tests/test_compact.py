@@ -0,0 +1,85 @@
+import gzip
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+from src.download.export import export_parquet, export_tsv
+from src.download.parquet import read_parquet
+from src.profiling import count_rows
+from src.query.compact import CompactTable, compact, legacy, memory_report
+
+
+def combined_table():
+    return pd.DataFrame(
+        {
+            "identifier": ["ALK", "ALK", "BRCA1"],
+            "identifier.source": "HGNC",
+            "target": ["238", "ENSG00000171094", "672"],
+            "target.source": ["NCBI Gene", "Ensembl", "NCBI Gene"],
+            "GO_Process": [
+                [{"go_id": "GO:1", "go_name": "one"}],
+                np.nan,
+                [
+                    {"go_id": "GO:1", "go_name": "one"},
+                    {"go_id": "GO:2", "go_name": "two"},
+                ],
+            ],
+            "DisGeNET": [[], [{"diseaseid": "C1", "score": 0.4}], np.nan],
+        }
+    )
+
+
+class TestCompact:
+    """Test the compact form of the combined table"""
+
+    def test_round_trip(self):
+        table = CompactTable.from_legacy(combined_table())
+        data = table.to_legacy()
+
+        schema = table.table.schema
+        assert pa.types.is_dictionary(schema.field("identifier").type)
+        go_id = schema.field("GO_Process").type.value_type.field("go_id")
+        assert pa.types.is_dictionary(go_id.type)
+        assert data["identifier"].tolist() == ["ALK", "ALK", "BRCA1"]
+        assert data["GO_Process"].tolist() == [
+            [{"go_id": "GO:1", "go_name": "one"}],
+            None,
+            [
+                {"go_id": "GO:1", "go_name": "one"},
+                {"go_id": "GO:2", "go_name": "two"},
+            ],
+        ]
+        assert data["DisGeNET"].tolist() == [
+            [],
+            [{"diseaseid": "C1", "score": 0.4}],
+            None,
+        ]
+        assert table.identifiers()["target.source"].dtype == "category"
+
+    def test_projection_and_chunks(self):
+        table = compact(combined_table())
+
+        assert compact(table) is table
+        assert list(legacy(table, ["identifier", "DisGeNET", "missing"]).columns) == [
+            "identifier",
+            "DisGeNET",
+        ]
+        chunks = list(table.iter_legacy(2))
+        assert [list(chunk.index) for chunk in chunks] == [[0, 1], [2]]
+        assert count_rows((table, {})) == 3
+
+    def test_exports(self, tmp_path):
+        table = compact(combined_table())
+
+        tsv = export_tsv(table, str(tmp_path / "table.tsv.gz"), chunksize=2)
+        with gzip.open(tsv, "rt") as file:
+            assert len(file.read().splitlines()) == 4
+        parquet = export_parquet(table, str(tmp_path / "table.parquet"))
+        assert read_parquet(parquet)["identifier"].tolist() == ["ALK", "ALK", "BRCA1"]
+
+    def test_memory_report(self):
+        report = memory_report(combined_table())
+
+        assert report["rows"] == 3
+        assert report["legacy_bytes"] > report["compact_bytes"] > 0
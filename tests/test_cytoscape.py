@@ -0,0 +1,100 @@
+import time
+
+import pandas as pd
+
+from src.visualization.cytoscape import (
+    CyRestClient,
+    push_network,
+    push_network_async,
+    to_cx2,
+)
+from src.visualization.fake_cyrest import FakeCyREST
+
+NODES = pd.DataFrame(
+    {
+        "id": ["ALK", "C0001", "C0002"],
+        "name": ["ALK", "Disease A", "Disease B"],
+        "node_type": ["gene", "disease", "disease"],
+        "disgenet_score": ["", 0.5, 0.25],
+    }
+)
+EDGES = pd.DataFrame(
+    {
+        "source": ["ALK", "ALK", "ALK"],
+        "target": ["C0001", "C0002", "C0003"],
+        "interaction": ["association", "association", "association"],
+    }
+)
+
+
+def aspect(document, name):
+    return next(item[name] for item in document if name in item)
+
+
+class TestCytoscape:
+    """Test the CX2 export of the network to Cytoscape"""
+
+    def test_to_cx2(self):
+        document = to_cx2(NODES, EDGES, "Network")
+
+        declarations = aspect(document, "attributeDeclarations")[0]
+        assert declarations["nodes"]["disgenet_score"] == {"d": "double"}
+        nodes = aspect(document, "nodes")
+        assert nodes[0] == {
+            "id": 0,
+            "v": {"name": "ALK", "label": "ALK", "node_type": "gene"},
+        }
+        # The id is kept as the name, the name of the nodes frame as the label
+        assert nodes[1]["v"]["name"] == "C0001"
+        assert nodes[1]["v"]["label"] == "Disease A"
+        assert nodes[1]["v"]["disgenet_score"] == 0.5
+        assert declarations["nodes"]["label"] == {"d": "string"}
+        # The edge to the missing C0003 node is dropped
+        assert aspect(document, "edges") == [
+            {
+                "id": 0,
+                "s": 0,
+                "t": 1,
+                "v": {"name": "ALK (association) C0001", "interaction": "association"},
+            },
+            {
+                "id": 1,
+                "s": 0,
+                "t": 2,
+                "v": {"name": "ALK (association) C0002", "interaction": "association"},
+            },
+        ]
+        style = aspect(document, "visualProperties")[0]
+        assert (
+            style["nodeMapping"]["NODE_SHAPE"]["definition"]["attribute"] == "node_type"
+        )
+        assert "NODE_BACKGROUND_COLOR" in style["nodeMapping"]
+        assert style["default"]["edge"] == {"EDGE_LINE_COLOR": "#000000"}
+        assert {"name": "edges", "elementCount": 2} in aspect(document, "metaData")
+
+    def test_push_in_a_single_request(self):
+        with FakeCyREST() as server:
+            response = push_network(
+                NODES, EDGES, "Network", client=CyRestClient(server.url)
+            )
+
+        assert response == {"networkSUID": [1]}
+        # liveness probe and import
+        assert server.requests == 2
+        params, payload = server.networks[0]
+        assert params == {
+            "format": "cx2",
+            "collection": "BioDataFuse",
+            "title": "Network",
+        }
+        assert len(aspect(payload, "nodes")) == 3
+
+    def test_cytoscape_not_running(self):
+        server = FakeCyREST()
+        url = server.url
+        server.stop()
+
+        start = time.perf_counter()
+        future = push_network_async(NODES, EDGES, "Network", client=CyRestClient(url))
+        assert future.result(timeout=5) is None
+        assert time.perf_counter() - start < 5
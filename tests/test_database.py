@@ -0,0 +1,41 @@
+import sqlite3
+
+import pytest
+
+from src.query import database
+from src.query.database import transaction
+
+
+class TestTransaction:
+    """Test the shared SQLite transactions"""
+
+    def test_reads_do_not_take_the_write_lock(self, tmp_path, monkeypatch):
+        path = str(tmp_path / "test.sqlite")
+        with transaction(path) as connection:
+            connection.execute("CREATE TABLE jobs (id TEXT)")
+            connection.execute("INSERT INTO jobs VALUES ('a')")
+
+        monkeypatch.setattr(database, "BUSY_TIMEOUT", 0)
+        with transaction(path) as writer:
+            writer.execute("INSERT INTO jobs VALUES ('b')")
+            # A reader sees the last commit while the writer holds the lock
+            with transaction(path, write=False) as reader:
+                assert reader.execute("SELECT id FROM jobs").fetchall() == [("a",)]
+            with pytest.raises(sqlite3.OperationalError):
+                with transaction(path):
+                    pass
+
+    def test_rollback(self, tmp_path):
+        path = str(tmp_path / "test.sqlite")
+        with transaction(path) as connection:
+            connection.execute("CREATE TABLE jobs (id TEXT)")
+
+        with pytest.raises(ValueError):
+            with transaction(path) as connection:
+                connection.execute("INSERT INTO jobs VALUES ('a')")
+                raise ValueError
+        with transaction(path, write=False, row_factory=sqlite3.Row) as connection:
+            assert (
+                connection.execute("SELECT COUNT(*) AS n FROM jobs").fetchone()["n"]
+                == 0
+            )
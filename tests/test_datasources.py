@@ -0,0 +1,62 @@
+import gc
+
+import pandas as pd
+import pytest
+
+from src.query import datasources
+from src.query.datasources import (
+    DatasourceRegistry,
+    get_datasource_registry,
+    mapping_index,
+)
+from src.utils import get_identifier_of_interest
+
+BRIDGEDB_DF = pd.DataFrame(
+    {
+        "identifier": ["ALK", "ALK", "BRCA1", "BRCA1"],
+        "identifier.source": ["HGNC"] * 4,
+        "target": ["238", "ENSG1", "672", "ENSG2"],
+        "target.source": ["NCBI Gene", "Ensembl", "NCBI Gene", "Ensembl"],
+    }
+)
+
+
+class TestDatasources:
+    """Test the BridgeDb datasource registry and the mapping lookups"""
+
+    def test_registry(self, tmp_path):
+        path = tmp_path / "datasources.csv"
+        path.write_text(
+            "systemCode,source,type\nL,NCBI Gene,gene\nCh,HMDB,metabolite\n"
+        )
+        registry = DatasourceRegistry(str(path))
+
+        assert "HMDB" in registry
+        assert registry.identifier_types() == ["NCBI Gene"]
+        with pytest.raises(AssertionError):
+            registry.validate("Unknown")
+
+    def test_registry_is_read_once(self):
+        assert get_datasource_registry() is get_datasource_registry()
+        assert "NCBI Gene" in get_datasource_registry().identifier_types()
+
+    def test_get_identifier_of_interest(self):
+        result = get_identifier_of_interest(BRIDGEDB_DF, "NCBI Gene")
+
+        assert result["target"].tolist() == ["238", "672"]
+        assert result.index.tolist() == [0, 2]
+        assert get_identifier_of_interest(BRIDGEDB_DF, "Uniprot-TrEMBL").empty
+        with pytest.raises(AssertionError):
+            get_identifier_of_interest(BRIDGEDB_DF, "Unknown")
+
+    def test_index_is_built_once_per_frame(self):
+        bridgedb_df = BRIDGEDB_DF.copy()
+        positions = mapping_index(bridgedb_df).positions
+
+        assert mapping_index(bridgedb_df).positions is positions
+        assert id(bridgedb_df) in datasources._positions
+
+        key = id(bridgedb_df)
+        del bridgedb_df
+        gc.collect()
+        assert key not in datasources._positions
@@ -0,0 +1,90 @@
+import numpy as np
+import pandas as pd
+from scipy.stats import hypergeom
+
+from src.analysis.enrichment import (
+    EnrichmentEngine,
+    benjamini_hochberg,
+    hypergeom_sf,
+)
+
+
+def go(*ids):
+    return [{"go_id": go_id, "go_name": f"process {go_id}"} for go_id in ids]
+
+
+DATA = pd.DataFrame(
+    {
+        "identifier": ["ALK", "ALK", "BRCA1", "TP53", "EGFR", "MYC"],
+        "target": ["1", "2", "3", "4", "5", "6"],
+        "GO_Process": [
+            go("GO:1"),
+            go("GO:1", "GO:2"),
+            go("GO:1"),
+            go("GO:2"),
+            go(),
+            np.nan,
+        ],
+        "Reactome_Pathways": [
+            [{"pathway_id": "R-1", "pathway_name": "pathway"}],
+            np.nan,
+            [{"pathway_id": "R-1", "pathway_name": "pathway"}],
+            np.nan,
+            np.nan,
+            np.nan,
+        ],
+    }
+)
+
+
+class TestEnrichment:
+    """Test the over-representation analysis of the annotations"""
+
+    def test_hypergeom_sf(self):
+        rng = np.random.default_rng(0)
+        for _ in range(50):
+            population = int(rng.integers(1, 2000))
+            draws = int(rng.integers(0, population + 1))
+            successes = rng.integers(0, population + 1, 100)
+            k = rng.integers(0, np.minimum(successes, draws) + 2)
+            expected = hypergeom.sf(k - 1, population, successes, draws)
+            np.testing.assert_allclose(
+                hypergeom_sf(k, population, successes, draws),
+                np.clip(np.nan_to_num(expected, nan=1.0), 0, 1),
+                rtol=1e-7,
+                atol=1e-12,
+            )
+
+    def test_benjamini_hochberg(self):
+        np.testing.assert_allclose(
+            benjamini_hochberg(np.array([0.01, 0.04, 0.03, 0.2])),
+            [0.04, 0.04 * 4 / 3, 0.04 * 4 / 3, 0.2],
+        )
+
+    def test_enrich(self):
+        engine = EnrichmentEngine(DATA)
+
+        # Genes counted once per term, across rows of the same identifier
+        assert engine.matrix.shape == (5, 3)
+        table = engine.enrich(["ALK", "BRCA1", "UNKNOWN"])
+
+        assert table[
+            ["annotation", "term_id", "overlap", "term_size"]
+        ].values.tolist() == [
+            ["GO_Process", "GO:1", 2, 2],
+            ["Reactome_Pathways", "R-1", 2, 2],
+            ["GO_Process", "GO:2", 1, 2],
+        ]
+        assert set(table["set_size"]) == {2}
+        assert set(table["background_size"]) == {5}
+        np.testing.assert_allclose(table["p_value"], [0.1, 0.1, 0.7])
+        np.testing.assert_allclose(table["fdr"], [0.15, 0.15, 0.7])
+
+    def test_background(self):
+        table = EnrichmentEngine(DATA).enrich(["ALK"], background=["ALK", "TP53"])
+
+        assert table.set_index("term_id")["term_size"].to_dict() == {
+            "GO:1": 1,
+            "GO:2": 2,
+            "R-1": 1,
+        }
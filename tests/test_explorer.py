@@ -0,0 +1,50 @@
+import pandas as pd
+
+from src.analysis.explorer import ResultExplorer
+from tests.test_network import combined_table
+
+
+def table():
+    data = combined_table()
+    ncbi = data.assign(target=["238", "672"], **{"target.source": "NCBI Gene"})
+    ncbi[["GO_Process", "ChEMBL_Drugs", "DisGeNET"]] = None
+    return pd.concat([data, ncbi], ignore_index=True)
+
+
+class TestResultExplorer:
+    """Test the paginated view of the combined table"""
+
+    def test_filters(self):
+        explorer = ResultExplorer(table())
+
+        assert explorer.sources == ["Ensembl", "NCBI Gene"]
+        assert explorer.node_types == {
+            "gene ontology": ["GO_Process"],
+            "drug interactions": ["ChEMBL_Drugs"],
+            "disease": ["DisGeNET"],
+        }
+        assert explorer.count() == 4
+        assert explorer.count(sources=["NCBI Gene"]) == 2
+        assert explorer.rows(node_types=["drug interactions"]).to_pylist() == [0]
+        assert explorer.count(sources=["NCBI Gene"], node_types=["disease"]) == 0
+
+    def test_page(self):
+        explorer = ResultExplorer(table())
+
+        page = explorer.page(1, size=1, columns=["GO_Process"], sources=["Ensembl"])
+        assert page.index.tolist() == [1]
+        assert page["identifier"].tolist() == ["BRCA1"]
+        assert page["GO_Process"].tolist() == [2]
+
+        page = explorer.page(0, size=10, sources=["NCBI Gene"])
+        assert page.columns.tolist()[4:] == ["GO_Process", "ChEMBL_Drugs", "DisGeNET"]
+        assert page["DisGeNET"].isna().all()
+        assert explorer.page(5, size=10).empty
+
+    def test_records(self):
+        explorer = ResultExplorer(table())
+
+        records = explorer.records("BRCA1", "GO_Process")
+        assert records["target"].tolist() == ["ENSG00000012048"] * 2
+        assert records["go_id"].tolist() == ["GO:1", "GO:2"]
+        assert explorer.records("TP53", "GO_Process").empty
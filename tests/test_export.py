@@ -0,0 +1,50 @@
+import gzip
+import json
+
+import pandas as pd
+import pytest
+
+from src.download.export import EXPORT_FORMATS, export_table
+
+
+def combined_table():
+    return pd.DataFrame(
+        {
+            "identifier": ["ALK", "BRCA1", "TP53"],
+            "target": ["238", "672", "7157"],
+            "WikiPathways": [[{"pathway_id": "WP1"}], [], [{"pathway_id": "WP2"}]],
+        }
+    )
+
+
+class TestExport:
+    """Test the file exports of the combined table"""
+
+    def test_tsv(self, tmp_path):
+        path = export_table(combined_table(), "TSV", str(tmp_path), "table")
+
+        assert path.endswith(".tsv.gz")
+        exported = pd.read_csv(path, sep="\t")
+        assert exported["identifier"].tolist() == ["ALK", "BRCA1", "TP53"]
+
+    def test_tsv_chunks(self, tmp_path):
+        path = str(tmp_path / "table.tsv.gz")
+        EXPORT_FORMATS["TSV"][0](combined_table(), path, chunksize=2)
+
+        with gzip.open(path, "rt") as file:
+            assert len(file.read().splitlines()) == 4
+
+    def test_jsonl(self, tmp_path):
+        path = export_table(combined_table(), "JSON lines", str(tmp_path), "table")
+
+        with gzip.open(path, "rt") as file:
+            rows = [json.loads(line) for line in file]
+        assert len(rows) == 3
+        assert rows[2]["WikiPathways"] == [{"pathway_id": "WP2"}]
+
+    def test_parquet(self, tmp_path):
+        pytest.importorskip("pyarrow")
+        path = export_table(combined_table(), "Parquet", str(tmp_path), "table")
+
+        exported = pd.read_parquet(path)
+        assert exported["target"].tolist() == ["238", "672", "7157"]
@@ -0,0 +1,104 @@
+import gzip
+import json
+import xml.etree.ElementTree as ET
+
+import pandas as pd
+
+from src.download.graph import GRAPH_FORMATS, export_cx2, export_graph
+from src.visualization.cytoscape import to_cx2
+
+NODES = pd.DataFrame(
+    {
+        "id": ["ALK", "C0001", "GO:1"],
+        "name": ["ALK", "Disease <A>", "process"],
+        "node_type": ["gene", "disease", "gene ontology"],
+        "disgenet_score": ["", 0.5, ""],
+    }
+)
+EDGES = pd.DataFrame(
+    {
+        "source": ["ALK", "ALK"],
+        "target": ["C0001", "GO:1"],
+        "interaction": ["association", "part of"],
+    }
+)
+GRAPHML = "{http://graphml.graphdrawing.org/xmlns}"
+
+
+class TestGraphExport:
+    """Test the export of the network to graph files"""
+
+    def test_graphml(self, tmp_path):
+        path = export_graph(NODES, EDGES, "GraphML", str(tmp_path), "network")
+
+        root = ET.parse(path).getroot()
+        keys = {key.get("attr.name"): key for key in root.iter(f"{GRAPHML}key")}
+        assert keys["disgenet_score"].get("attr.type") == "double"
+        nodes = list(root.iter(f"{GRAPHML}node"))
+        assert [node.get("id") for node in nodes] == ["ALK", "C0001", "GO:1"]
+        assert [data.text for data in nodes[1]] == ["Disease <A>", "disease", "0.5"]
+        assert [
+            (edge.get("source"), edge.get("target"))
+            for edge in root.iter(f"{GRAPHML}edge")
+        ] == [("ALK", "C0001"), ("ALK", "GO:1")]
+
+    def test_graphml_undirected_interactions(self, tmp_path):
+        edges = pd.DataFrame(
+            {
+                "source": ["ALK", "ALK"],
+                "target": ["C0001", "GO:1"],
+                "interaction": ["association", "interacts_with"],
+            }
+        )
+        path = export_graph(NODES, edges, "GraphML", str(tmp_path), "network")
+
+        root = ET.parse(path).getroot()
+        assert root.find(f"{GRAPHML}graph").get("edgedefault") == "directed"
+        assert [edge.get("directed") for edge in root.iter(f"{GRAPHML}edge")] == [
+            None,
+            "false",
+        ]
+
+    def test_cx2(self, tmp_path):
+        path = export_graph(NODES, EDGES, "CX2", str(tmp_path), "network")
+
+        with open(path) as file:
+            document = json.load(file)
+        aspects = {name: value for aspect in document for name, value in aspect.items()}
+        assert aspects["CXVersion"] == "2.0"
+        assert len(aspects["nodes"]) == 3
+        assert [(edge["s"], edge["t"]) for edge in aspects["edges"]] == [(0, 1), (0, 2)]
+        assert "nodeMapping" in aspects["visualProperties"][0]
+
+    def test_cx2_chunks(self, tmp_path):
+        edges = pd.concat(
+            [EDGES, pd.DataFrame({"source": ["missing"], "target": ["ALK"]})]
+        )
+        path = export_cx2(NODES, edges, str(tmp_path / "network.cx2"), chunksize=1)
+
+        with open(path) as file:
+            document = json.load(file)
+        assert document == to_cx2(NODES, edges, "BioDataFuse Network")
+        metadata = {
+            item["name"]: item["elementCount"] for item in document[1]["metaData"]
+        }
+        assert metadata["nodes"] == 3
+        # The edge to a missing node is dropped
+        assert metadata["edges"] == 2
+
+    def test_edgelist(self, tmp_path):
+        path = export_graph(NODES, EDGES, "Edge list", str(tmp_path), "network")
+
+        with gzip.open(path, "rt") as file:
+            edges = pd.read_csv(file, sep="\t")
+        assert edges.columns.tolist() == ["source", "interaction", "target"]
+        assert edges.values.tolist() == [
+            ["ALK", "association", "C0001"],
+            ["ALK", "part of", "GO:1"],
+        ]
+
+    def test_empty_network(self, tmp_path):
+        for graph_format in GRAPH_FORMATS:
+            export_graph(
+                pd.DataFrame(), pd.DataFrame(), graph_format, str(tmp_path), "empty"
+            )
@@ -0,0 +1,81 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.analysis.graph_store import GraphStore
+
+NODES = pd.DataFrame(
+    {
+        "id": ["ALK", "BRCA1", "C0001", "GO:1"],
+        "name": ["ALK", "BRCA1", "Disease A", "process"],
+        "node_type": ["gene", "gene", "disease", "gene ontology"],
+    }
+)
+EDGES = pd.DataFrame(
+    {
+        "source": ["ALK", "ALK", "BRCA1", "BRCA1"],
+        "target": ["C0001", "GO:1", "C0001", "CHEMBL1"],
+        "interaction": ["association", "part of", "association", "inhibitor"],
+    }
+)
+
+
+class TestGraphStore:
+    """Test the interned graph of the analysis page"""
+
+    def test_interning(self):
+        store = GraphStore(NODES, EDGES)
+
+        # Node rows first, then the edge ends without a node row
+        assert store.ids.tolist() == ["ALK", "BRCA1", "C0001", "GO:1", "CHEMBL1"]
+        assert store.index("C0001") == 2
+        assert store.n_edges == 4
+        assert store.node_type("CHEMBL1") == ""
+        assert store.node_attributes("C0001")["name"] == "Disease A"
+        assert store.node_attributes("CHEMBL1") == {}
+        with pytest.raises(KeyError):
+            store.index("TP53")
+
+    def test_neighbors_and_degrees(self):
+        store = GraphStore(NODES, EDGES)
+
+        assert store.neighbors("ALK") == ["C0001", "GO:1"]
+        assert store.neighbors("ALK", node_type="disease") == ["C0001"]
+        assert store.neighbors("C0001", direction="in") == ["ALK", "BRCA1"]
+        assert store.neighbors("C0001", direction="out") == []
+        assert store.degree("C0001") == 2
+        assert store.degree("BRCA1", direction="out") == 2
+        assert store.degrees().tolist() == [2, 2, 2, 1, 1]
+        assert store.nodes_of_type("gene").tolist() == [0, 1]
+
+    def test_neighbor_table(self):
+        store = GraphStore(NODES, EDGES)
+
+        assert store.neighbor_table("C0001").values.tolist() == [
+            ["ALK", "gene", "association", "in"],
+            ["BRCA1", "gene", "association", "in"],
+        ]
+        assert store.top_degree("gene", n=1)["id"].tolist() == ["ALK"]
+
+    def test_matches_edges(self):
+        rng = np.random.default_rng(0)
+        edges = pd.DataFrame(
+            {
+                "source": rng.integers(0, 50, 1000).astype(str),
+                "target": np.char.add("T", rng.integers(0, 200, 1000).astype(str)),
+                "interaction": "association",
+            }
+        )
+        store = GraphStore(pd.DataFrame(), edges)
+
+        for node_id, group in edges.groupby("source"):
+            assert sorted(store.neighbors(node_id, direction="out")) == sorted(
+                group["target"]
+            )
+
+    def test_empty(self):
+        store = GraphStore(pd.DataFrame(), pd.DataFrame())
+
+        assert len(store) == 0
+        assert store.n_edges == 0
+        assert store.top_degree().empty
@@ -0,0 +1,41 @@
+import pandas as pd
+import pyarrow as pa
+
+from src.query.compact import CompactTable, compact
+from src.query.handoff import map_table, read_result, write_result, write_table
+from src.visualization.network import build_network
+from tests.test_network import combined_table
+
+
+class TestHandoff:
+    """Test the hand-off of results as memory-mapped Arrow files"""
+
+    def test_map_table(self, tmp_path):
+        table = compact(combined_table()).table
+        path = write_table(table, str(tmp_path / "table.arrow"))
+
+        allocated = pa.total_allocated_bytes()
+        mapped = map_table(path)
+        assert pa.total_allocated_bytes() == allocated
+        assert mapped.equals(table)
+
+    def test_result(self, tmp_path):
+        data = combined_table()
+        nodes, edges = build_network(data)
+        path = str(tmp_path / "job")
+        write_result(path, (compact(data), {"rows": 2}, nodes, edges, ["warning"]))
+
+        combined, metadata, mapped_nodes, mapped_edges, warnings = read_result(path)
+        assert isinstance(combined, CompactTable)
+        pd.testing.assert_frame_equal(combined.to_legacy(), compact(data).to_legacy())
+        pd.testing.assert_frame_equal(mapped_nodes, nodes)
+        pd.testing.assert_frame_equal(mapped_edges, edges)
+        assert metadata == {"rows": 2} and warnings == ["warning"]
+
+        # Empty cells of numeric attributes come back as ""
+        assert mapped_nodes["gene_dsi"].tolist()[4] == ""
+
+    def test_single_value(self, tmp_path):
+        path = write_result(str(tmp_path / "job"), pd.DataFrame({"a": [1, 2]}))
+
+        assert read_result(path)["a"].tolist() == [1, 2]
@@ -0,0 +1,107 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import pandas as pd
+import pytest
+
+from src.query.jobs import (
+    DONE,
+    FAILED,
+    JobLimitError,
+    JobManager,
+    JobStore,
+    JobSubmitError,
+)
+
+
+def table(rows):
+    return pd.DataFrame({"identifier": range(rows)}), {"rows": rows}
+
+
+def failing():
+    raise ValueError("no data")
+
+
+class BrokenExecutor(ThreadPoolExecutor):
+    def submit(self, *args, **kwargs):
+        raise BrokenProcessPool("a worker died")
+
+
+def wait(store, job_id, timeout=60):
+    deadline = time.time() + timeout
+    while store.get(job_id)["status"] not in (DONE, FAILED):
+        assert time.time() < deadline
+        time.sleep(0.05)
+    return store.get(job_id)
+
+
+class TestJobs:
+    """Test the background jobs"""
+
+    def test_store(self, tmp_path):
+        store = JobStore(str(tmp_path))
+        first = store.create("alice", "first", max_active=2)
+        second = store.create("alice", "second", max_active=2)
+        with pytest.raises(JobLimitError):
+            store.create("alice", "third", max_active=2)
+        store.create("bob", max_active=2)
+
+        store.update(first, status=DONE, rows=3)
+        assert store.get(first)["rows"] == 3
+        assert [job["id"] for job in store.list("alice")] == [second, first]
+        assert store.get("unknown") is None
+
+        store.fail_interrupted()
+        assert store.get(second)["status"] == FAILED
+        assert store.get(first)["status"] == DONE
+
+    def test_manager(self, tmp_path):
+        manager = JobManager(str(tmp_path), executor=ThreadPoolExecutor(2))
+        done = manager.submit("alice", table, 4, description="4 rows")
+        failed = manager.submit("alice", failing)
+        try:
+            assert wait(manager.store, done)["rows"] == 4
+            data, metadata = manager.result(done)
+            assert len(data) == 4 and metadata == {"rows": 4}
+
+            job = wait(manager.store, failed)
+            assert job["status"] == FAILED
+            assert job["error"] == "ValueError: no data"
+            assert manager.result(failed) is None
+        finally:
+            manager.shutdown()
+
+    def test_worker_process(self, tmp_path):
+        manager = JobManager(str(tmp_path), workers=1)
+        job_id = manager.submit("alice", table, 2)
+        try:
+            assert wait(manager.store, job_id)["status"] == DONE
+            assert len(manager.result(job_id)[0]) == 2
+        finally:
+            manager.shutdown()
+
+    def test_submit_to_broken_executor(self, tmp_path):
+        manager = JobManager(
+            str(tmp_path), max_jobs_per_user=1, executor=BrokenExecutor(1)
+        )
+        for _ in range(2):
+            with pytest.raises(JobSubmitError):
+                manager.submit("alice", table, 2)
+
+        # The refused jobs failed and do not count against the limit
+        jobs = manager.store.list("alice")
+        assert [job["status"] for job in jobs] == [FAILED, FAILED]
+        assert jobs[0]["error"] == "Not started: a worker died"
+
+    def test_broken_pool_is_replaced(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(
+            JobManager, "_create_executor", lambda self: ThreadPoolExecutor(1)
+        )
+        manager = JobManager(str(tmp_path))
+        manager._executor = BrokenExecutor(1)
+        try:
+            job_id = manager.submit("alice", table, 2)
+            assert wait(manager.store, job_id)["status"] == DONE
+        finally:
+            manager.shutdown()
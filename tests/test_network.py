@@ -0,0 +1,109 @@
+import pandas as pd
+
+from src.visualization.network import build_network
+
+
+def combined_table():
+    return pd.DataFrame(
+        {
+            "identifier": ["ALK", "BRCA1"],
+            "identifier.source": ["HGNC", "HGNC"],
+            "target": ["ENSG00000171094", "ENSG00000012048"],
+            "target.source": ["Ensembl", "Ensembl"],
+            "GO_Process": [
+                [{"go_id": "GO:1", "go_name": "go one"}],
+                [
+                    {"go_id": "GO:1", "go_name": "go one"},
+                    {"go_id": "GO:2", "go_name": "go two"},
+                ],
+            ],
+            "ChEMBL_Drugs": [
+                [{"chembl_id": "CHEMBL1", "drug_name": "drug", "relation": "inhibits"}],
+                [],
+            ],
+            "DisGeNET": [
+                [{"diseaseid": "C1", "disease_name": "d", "gene_dsi": 0.5}],
+                [{"diseaseid": None, "disease_name": "no id", "gene_dsi": ""}],
+            ],
+        }
+    )
+
+
+class TestBuildNetwork:
+    """Test the node and edge construction of the network"""
+
+    def test_nodes(self):
+        nodes, _ = build_network(combined_table())
+
+        assert nodes["id"].tolist() == [
+            "ENSG00000171094",
+            "C1",
+            "GO:1",
+            "CHEMBL1",
+            "ENSG00000012048",
+            "GO:2",
+        ]
+        assert nodes["node_type"].tolist() == [
+            "gene",
+            "disease",
+            "gene ontology",
+            "drug interactions",
+            "gene",
+            "gene ontology",
+        ]
+        assert nodes["gene_dsi"].tolist()[0] == 0.5
+        assert nodes["gene_dsi"].tolist()[4] == ""
+        assert nodes["drug_gene_relation"].tolist()[3] == "inhibits"
+
+    def test_edges(self):
+        _, edges = build_network(combined_table())
+
+        assert edges.values.tolist() == [
+            ["ENSG00000171094", "C1", "association"],
+            ["ENSG00000171094", "GO:1", "part of"],
+            ["ENSG00000171094", "CHEMBL1", "inhibits"],
+            ["ENSG00000012048", "GO:1", "part of"],
+            ["ENSG00000012048", "GO:2", "part of"],
+        ]
+
+    def test_missing_annotations(self):
+        table = combined_table()[
+            ["identifier", "identifier.source", "target", "target.source"]
+        ]
+        nodes, edges = build_network(table)
+
+        assert len(nodes) == 2
+        assert edges.empty
+
+    def test_ppi_edges(self):
+        table = combined_table()[
+            ["identifier", "identifier.source", "target", "target.source"]
+        ]
+        table["StringDB_interactions"] = [
+            [{"stringdb_link_to": "BRCA1", "score": 0.4}],
+            [
+                {"stringdb_link_to": "ALK", "score": 0.9},
+                {"stringdb_link_to": "TP53", "score": 0.8},
+                {"stringdb_link_to": "BRCA1", "score": 1.0},
+            ],
+        ]
+        _, edges = build_network(table)
+
+        # One undirected edge per pair, with its highest score, no self loop
+        assert edges.values.tolist() == [
+            ["ENSG00000171094", "ENSG00000012048", "interacts_with", 0.9]
+        ]
+
+    def test_ppi_min_score(self):
+        table = combined_table()[
+            ["identifier", "identifier.source", "target", "target.source"]
+        ]
+        table["stringdb"] = [
+            [{"stringdb_link_to": "BRCA1", "score": 0.4}],
+            [{"stringdb_link_to": "ALK", "score": 0.4}],
+        ]
+
+        _, edges = build_network(table, ppi_min_score=0.3)
+        assert len(edges) == 1
+        _, edges = build_network(table, ppi_min_score=0.5)
+        assert edges.empty
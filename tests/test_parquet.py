@@ -0,0 +1,82 @@
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+from src.download.parquet import read_parquet, to_arrow_table, write_parquet
+
+
+def combined_table():
+    return pd.DataFrame(
+        {
+            "identifier": ["ALK", "BRCA1", "TP53"],
+            "identifier.source": "HGNC",
+            "target": ["ENSG00000171094", "ENSG00000012048", "ENSG00000141510"],
+            "target.source": "Ensembl",
+            "GO_Process": [
+                [{"go_id": "GO:1", "go_name": "one"}],
+                [],
+                [
+                    {"go_id": "GO:2", "go_name": "two"},
+                    {"go_id": "GO:3", "go_name": "3"},
+                ],
+            ],
+            "DisGeNET": [
+                [{"diseaseid": "C1", "score": 0.4, "extra": 3}],
+                np.nan,
+                [{"diseaseid": "C2", "score": 1}],
+            ],
+        }
+    )
+
+
+class TestParquet:
+    """Test the typed Arrow schema and the Parquet round trip"""
+
+    def test_schema(self):
+        schema = to_arrow_table(combined_table()).schema
+
+        assert schema.field("GO_Process").type == pa.list_(
+            pa.struct([("go_id", pa.string()), ("go_name", pa.string())])
+        )
+        assert schema.field("DisGeNET").type == pa.list_(
+            pa.struct(
+                [
+                    ("diseaseid", pa.string()),
+                    ("score", pa.float64()),
+                    ("extra", pa.int64()),
+                ]
+            )
+        )
+
+    def test_round_trip(self, tmp_path):
+        path = write_parquet(combined_table(), str(tmp_path / "table.parquet"))
+        table = read_parquet(path)
+
+        assert table["GO_Process"].tolist() == combined_table()["GO_Process"].tolist()
+        assert table["DisGeNET"].tolist() == [
+            [{"diseaseid": "C1", "score": 0.4, "extra": 3}],
+            None,
+            [{"diseaseid": "C2", "score": 1.0, "extra": None}],
+        ]
+
+    def test_filters(self, tmp_path):
+        path = write_parquet(
+            combined_table(), str(tmp_path / "table.parquet"), row_group_size=1
+        )
+        table = read_parquet(
+            path,
+            columns=["identifier", "GO_Process"],
+            filters=[("identifier", "==", "TP53")],
+        )
+
+        assert table.columns.tolist() == ["identifier", "GO_Process"]
+        assert table["GO_Process"].tolist()[0][1]["go_id"] == "GO:3"
+
+    def test_mixed_types_fall_back_to_json(self, tmp_path):
+        data = combined_table()
+        data["ChEMBL_Drugs"] = [[{"chembl_id": 1}], [{"chembl_id": "CHEMBL2"}], []]
+        path = write_parquet(data, str(tmp_path / "table.parquet"))
+
+        assert (
+            read_parquet(path)["ChEMBL_Drugs"].tolist() == data["ChEMBL_Drugs"].tolist()
+        )
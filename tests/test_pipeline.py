@@ -0,0 +1,56 @@
+import pandas as pd
+
+from src.query.pipeline import QueryPipeline, content_hash
+
+
+class TestQueryPipeline:
+    """Test the memoization of the query stages across reruns"""
+
+    def test_content_hash(self):
+        df = pd.DataFrame({"identifier": ["ALK", "BRCA1"]})
+        nested = pd.DataFrame({"GO_Process": [[{"go_id": "GO:1"}], []]})
+
+        assert content_hash(df) == content_hash(df.copy())
+        assert content_hash(df) != content_hash(df.iloc[:1])
+        assert content_hash(nested) == content_hash(nested.copy())
+        assert content_hash([b"file", "text"]) != content_hash([b"file", "text2"])
+
+    def test_rerun_is_served_from_state(self):
+        state = {}
+        calls = []
+
+        def compute():
+            calls.append(1)
+            return pd.DataFrame({"identifier": ["ALK"]})
+
+        QueryPipeline(state).run("identifiers", ["ALK"], compute)
+        pipeline = QueryPipeline(state)
+        pipeline.run("identifiers", ["ALK"], compute)
+
+        assert len(calls) == 1
+        assert pipeline.report() == [
+            {"stage": "identifiers", "cached": True, "seconds": 0.0, "rows": 1}
+        ]
+
+    def test_changed_inputs_invalidate_later_stages(self):
+        state = {}
+        pipeline = QueryPipeline(state)
+        pipeline.run("identifiers", ["ALK"], lambda: "ids")
+        pipeline.run("mapping", [pipeline.digest("identifiers")], lambda: "mapping")
+        pipeline.run("source: DisGeNet", [pipeline.digest("mapping")], lambda: "d")
+        pipeline.run("source: WikiPathway", [pipeline.digest("mapping")], lambda: "w")
+        pipeline.run("sources", [pipeline.digest("mapping")], lambda: "combined")
+
+        assert pipeline.get("sources", [pipeline.digest("mapping")]) == "combined"
+
+        pipeline.run("source: STRING-DB", [pipeline.digest("mapping")], lambda: "s")
+        assert set(state["query_pipeline"]) == {
+            "identifiers",
+            "mapping",
+            "source: DisGeNet",
+            "source: WikiPathway",
+            "source: STRING-DB",
+        }
+
+        pipeline.run("identifiers", ["BRCA1"], lambda: "other ids")
+        assert set(state["query_pipeline"]) == {"identifiers"}
@@ -0,0 +1,79 @@
+import gzip
+import io
+
+from src.query.process_ids import (
+    guess_identifier_type,
+    ingest_identifiers,
+    ingest_inputs,
+)
+
+
+class TestIngestIdentifiers:
+    """Test the streaming ingestion of the input identifiers"""
+
+    def test_text_and_file_are_deduplicated(self):
+        upload = io.BytesIO(b'\xef\xbb\xbfBRCA1,"TP53"\r\nALK;EGFR\n\n')
+        result = ingest_identifiers([("text", "ALK\n BRCA1 \n"), ("file.csv", upload)])
+
+        assert result.identifiers["identifier"].tolist() == [
+            "ALK",
+            "BRCA1",
+            "TP53",
+            "EGFR",
+        ]
+        assert result.rejected.values.tolist() == [
+            ["file.csv", 1, "BRCA1", "duplicate"],
+            ["file.csv", 2, "ALK", "duplicate"],
+        ]
+        assert result.counts == {"accepted": 4, "duplicate": 2}
+        assert result.guessed_type == "HGNC"
+        # The uploaded file stays readable
+        assert upload.getvalue().startswith(b"\xef\xbb\xbf")
+
+    def test_gzip_upload(self):
+        upload = io.BytesIO(gzip.compress(b"ENSG00000171094\nENSG00000012048\n"))
+        result = ingest_identifiers([("file.txt.gz", upload)])
+
+        assert result.identifiers["identifier"].tolist() == [
+            "ENSG00000171094",
+            "ENSG00000012048",
+        ]
+        assert result.guessed_type == "Ensembl"
+
+    def test_plain_gz_upload(self):
+        upload = io.BytesIO(gzip.compress(b"7157\n1956\n"))
+        upload.name = "ids.gz"
+        result = ingest_inputs(upload, "")
+
+        assert result.identifiers["identifier"].tolist() == ["7157", "1956"]
+
+    def test_rejections(self):
+        text = "238\nbad id\n" + "X" * 100 + "\n672\n1956\n"
+        result = ingest_identifiers(
+            [("text", text)], max_identifiers=2, max_rejections=2
+        )
+
+        assert result.identifiers["identifier"].tolist() == ["238", "672"]
+        assert result.rejected["reason"].tolist() == ["invalid characters", "too long"]
+        assert result.counts["over the limit"] == 1
+
+    def test_guess_identifier_type(self):
+        assert guess_identifier_type("ENSG00000171094") == "Ensembl"
+        assert guess_identifier_type("NM_004304.5") == "RefSeq"
+        assert guess_identifier_type("HGNC:427") == "HGNC Accession Number"
+        assert guess_identifier_type("Q9UM73") == "Uniprot-TrEMBL"
+        assert guess_identifier_type("238") == "NCBI Gene"
+        assert guess_identifier_type("7157") == "NCBI Gene"
+        assert guess_identifier_type("1ABC") == "PDB"
+        assert guess_identifier_type("ALK") == "HGNC"
+        assert guess_identifier_type("a_b") is None
+
+    def test_four_digit_gene_ids(self):
+        result = ingest_identifiers([("text", "7157\n1956\n3845\n5290\n4609\n")])
+
+        assert result.guessed_type == "NCBI Gene"
+
+    def test_no_majority(self):
+        result = ingest_identifiers([("text", "238\nALK\nfoo_bar\nbaz_qux\n")])
+
+        assert result.guessed_type is None
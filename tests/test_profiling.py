@@ -0,0 +1,36 @@
+import pstats
+
+import pandas as pd
+
+from src.profiling import Profiler, cprofile_to
+
+
+class TestProfiler:
+    """Test the timing spans of the query stages"""
+
+    def test_span(self):
+        profiler = Profiler()
+        with profiler.span("ID parsing", rows_in=3) as span:
+            span.set_output((pd.DataFrame({"identifier": ["ALK", "BRCA1"]}), {}))
+
+        (record,) = profiler.report()
+        assert record["stage"] == "ID parsing"
+        assert record["rows_in"] == 3
+        assert record["rows_out"] == 2
+        assert record["seconds"] >= 0
+        assert record["memory_mb"] > 0
+
+    def test_reset_keeps_named_spans(self):
+        profiler = Profiler()
+        profiler.timed("ID parsing", lambda: None)()
+        profiler.timed("combine", lambda: None)()
+        profiler.reset(keep=["ID parsing"])
+
+        assert [record["stage"] for record in profiler.report()] == ["ID parsing"]
+
+    def test_cprofile_dump(self, tmp_path):
+        path = str(tmp_path / "query.pstats")
+        with cprofile_to(path):
+            sorted(range(1000), reverse=True)
+
+        assert pstats.Stats(path).total_calls > 0
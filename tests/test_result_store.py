@@ -0,0 +1,108 @@
+import pandas as pd
+
+from src.query.result_store import ResultStore, fragment_keys
+
+BRIDGEDB_DF = pd.DataFrame(
+    {
+        "identifier": ["ALK", "BRCA1", "TP53", "NOPE"],
+        "identifier.source": "HGNC",
+        "target": ["238", "672", "7157", "0"],
+        "target.source": "NCBI Gene",
+    }
+)
+
+
+class Annotator:
+    """Annotate every gene but NOPE with one record, counting the queried genes"""
+
+    def __init__(self):
+        self.queried = []
+
+    def __call__(self, bridgedb_df):
+        self.queried.append(sorted(bridgedb_df["identifier"]))
+        data = bridgedb_df[bridgedb_df["identifier"] != "NOPE"].copy()
+        data["DisGeNET"] = [[{"diseaseid": f"C{target}"}] for target in data["target"]]
+        return data.sort_values("identifier", ignore_index=True), {"version": 1}
+
+
+class TestResultStore:
+    """Test the per-gene result store"""
+
+    def test_fragment_keys(self):
+        keys = fragment_keys(BRIDGEDB_DF, "DisGeNet")
+
+        assert keys == fragment_keys(BRIDGEDB_DF.iloc[::-1], "DisGeNet")
+        assert keys["ALK"] == fragment_keys(BRIDGEDB_DF.iloc[:1], "DisGeNet")["ALK"]
+        assert keys["ALK"] != fragment_keys(BRIDGEDB_DF, "WikiPathway")["ALK"]
+
+    def test_only_missing_genes_are_queried(self, tmp_path):
+        store = ResultStore(str(tmp_path))
+        annotator = Annotator()
+
+        first, _ = store.query(BRIDGEDB_DF.iloc[:2], "DisGeNet", None, annotator)
+        data, metadata = store.query(BRIDGEDB_DF, "DisGeNet", None, annotator)
+
+        assert annotator.queried == [["ALK", "BRCA1"], ["NOPE", "TP53"]]
+        assert data["identifier"].tolist() == ["ALK", "BRCA1", "TP53"]
+        assert data["DisGeNET"].tolist() == [
+            [{"diseaseid": "C238"}],
+            [{"diseaseid": "C672"}],
+            [{"diseaseid": "C7157"}],
+        ]
+        assert metadata == {"version": 1}
+
+        # Everything stored, genes without annotation included
+        again, metadata = store.query(BRIDGEDB_DF, "DisGeNet", None, annotator)
+        assert len(annotator.queried) == 2
+        pd.testing.assert_frame_equal(again, data)
+        assert metadata == {"version": 1}
+
+    def test_fragments_are_stored_once(self, tmp_path):
+        store = ResultStore(str(tmp_path))
+        data, _ = Annotator()(BRIDGEDB_DF)
+        keys = fragment_keys(BRIDGEDB_DF, "DisGeNet")
+
+        store.save(data, keys, "DisGeNet", {})
+        size = store.size()
+        store.save(data, keys, "DisGeNet", {})
+
+        assert store.size() == size
+        assert store.lookup(keys.values())[keys["NOPE"]] is None
+
+    def test_eviction(self, tmp_path):
+        store = ResultStore(str(tmp_path))
+        annotator = Annotator()
+        for position in range(3):
+            store.query(
+                BRIDGEDB_DF.iloc[position : position + 1], "DisGeNet", None, annotator
+            )
+        store.max_bytes = store.size() - 1
+
+        assert store.evict() == 1
+        store.query(BRIDGEDB_DF.iloc[:3], "DisGeNet", None, annotator)
+        assert annotator.queried[-1] == ["ALK"]
+
+    def test_empty_result_not_stored(self, tmp_path):
+        store = ResultStore(str(tmp_path))
+        keys = fragment_keys(BRIDGEDB_DF, "DisGeNet")
+
+        # e.g. the request failed
+        store.save(pd.DataFrame(), keys, "DisGeNet", {})
+        assert store.lookup(keys.values()) == {}
+
+    def test_expiry(self, tmp_path):
+        store = ResultStore(str(tmp_path), ttl=3600, empty_ttl=0)
+        annotator = Annotator()
+        store.query(BRIDGEDB_DF, "DisGeNet", None, annotator)
+
+        # Genes without annotation are queried again once expired
+        store.query(BRIDGEDB_DF, "DisGeNet", None, annotator)
+        assert annotator.queried[-1] == ["NOPE"]
+        assert store.stats == {"stored": 3, "fetched": 5}
+
+        store.empty_ttl = store.ttl = -1
+        store.evict()
+        keys = fragment_keys(BRIDGEDB_DF, "DisGeNet")
+        store.ttl = store.empty_ttl = 3600
+        assert store.lookup(keys.values()) == {}
+        assert store.size() == 0
@@ -0,0 +1,63 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from src.query import run_log
+from src.query.run_log import RunLog
+from src.utils import create_or_append_to_metadata
+
+
+class TestRunLog:
+    """Test the append-only log of the query runs"""
+
+    def test_append_and_lookup(self, tmp_path):
+        log = RunLog(str(tmp_path / "runs.sqlite"))
+        first = log.append({"queries": 1}, datasources=["BridgeDb", "DisGeNet"])
+        second = log.append({"queries": 2}, datasources=["BridgeDb"], run_id="run-2")
+
+        assert second == "run-2"
+        assert log.get(first) == {"queries": 1}
+        assert [run["run_id"] for run in log.runs()] == [second, first]
+        assert [run["record"] for run in log.runs(datasource="DisGeNet")] == [
+            {"queries": 1}
+        ]
+        assert log.runs(datasource="BridgeDb", limit=1)[0]["run_id"] == second
+        assert log.runs(since=time.time() + 1) == []
+
+    def test_parallel_appends(self, tmp_path):
+        log = RunLog(str(tmp_path / "runs.sqlite"))
+        with ThreadPoolExecutor(8) as executor:
+            run_ids = list(
+                executor.map(
+                    lambda position: RunLog(log.path).append(
+                        {"position": position}, datasources=["WikiPathway"]
+                    ),
+                    range(50),
+                )
+            )
+
+        assert len(set(run_ids)) == 50
+        assert len(log.runs(datasource="WikiPathway")) == 50
+
+    def test_compact(self, tmp_path):
+        log = RunLog(str(tmp_path / "runs.sqlite"))
+        log.append({"old": True}, datasources=["DisGeNet"])
+        time.sleep(0.01)
+        log.append({"old": False}, datasources=["DisGeNet"])
+
+        assert log.compact(max_age=0.005) == 1
+        assert [run["record"] for run in log.runs(datasource="DisGeNet")] == [
+            {"old": False}
+        ]
+
+    def test_create_or_append_to_metadata(self, tmp_path, monkeypatch):
+        log = RunLog(str(tmp_path / "runs.sqlite"))
+        monkeypatch.setattr(run_log, "_run_log", log)
+
+        create_or_append_to_metadata({"datasource": "DisGeNET", "query": {}})
+        create_or_append_to_metadata({"datasource": "DisGeNET", "query": {}})
+
+        assert len(log.runs(datasource="DisGeNET")) == 2
+        with pytest.raises(AssertionError):
+            create_or_append_to_metadata(["not a dict"])
@@ -0,0 +1,92 @@
+import pandas as pd
+
+from src.utils import SourceAccumulator, collapse_data_sources
+
+
+def bridgedb_output():
+    return pd.DataFrame(
+        {
+            "identifier": ["ALK", "ALK", "BRCA1", "BRCA1"],
+            "identifier.source": "HGNC",
+            "target": ["238", "ENSG00000171094", "672", "ENSG00000012048"],
+            "target.source": ["NCBI Gene", "Ensembl", "NCBI Gene", "Ensembl"],
+        }
+    )
+
+
+class TestCollapseDataSources:
+    """Test the aggregation of the annotator output per gene"""
+
+    def test_collapse(self):
+        target_df = pd.DataFrame(
+            {
+                "target": ["672", "238", "672"],
+                "pathway_id": ["WP1", "WP2", "WP3"],
+                "pathway_label": ["one", "two", "three"],
+            }
+        )
+        collapsed = collapse_data_sources(
+            bridgedb_output(),
+            "NCBI Gene",
+            target_df,
+            ["target"],
+            ["pathway_id", "pathway_label"],
+            "WikiPathways",
+        )
+
+        assert collapsed["target"].tolist() == ["238", "672"]
+        assert collapsed["WikiPathways"].tolist() == [
+            [{"pathway_id": "WP2", "pathway_label": "two"}],
+            [
+                {"pathway_id": "WP1", "pathway_label": "one"},
+                {"pathway_id": "WP3", "pathway_label": "three"},
+            ],
+        ]
+
+    def test_collapse_empty_target(self):
+        collapsed = collapse_data_sources(
+            bridgedb_output(), "Ensembl", pd.DataFrame(), ["target"], [], "GO"
+        )
+
+        assert collapsed["target"].tolist() == ["ENSG00000171094", "ENSG00000012048"]
+        assert collapsed["GO"].isna().all()
+
+
+class TestSourceAccumulator:
+    """Test the combination of the annotator outputs"""
+
+    def test_join_on_identifier_columns(self, tmp_path):
+        ids = bridgedb_output()
+        wikipathways = ids[ids["target.source"] == "NCBI Gene"].assign(
+            WikiPathways=[["WP1"], ["WP2"]]
+        )
+        go = ids[ids["target.source"] == "Ensembl"].assign(GO_Process=[["GO:1"], []])
+        drugs = ids[ids["target.source"] == "Ensembl"].assign(
+            ChEMBL_Drugs=[[], ["CHEMBL1"]], GO_Process=[["ignored"], ["ignored"]]
+        )
+
+        accumulator = SourceAccumulator()
+        for df in [wikipathways, go, pd.DataFrame(), drugs]:
+            accumulator.add(df)
+        combined = accumulator.result()
+
+        assert len(accumulator) == 3
+        assert list(combined.columns) == [
+            "identifier",
+            "identifier.source",
+            "target",
+            "target.source",
+            "WikiPathways",
+            "GO_Process",
+            "ChEMBL_Drugs",
+        ]
+        assert len(combined) == 4
+        alk = combined.set_index("target").loc["ENSG00000171094"]
+        assert alk["GO_Process"] == ["GO:1"]
+        assert alk["ChEMBL_Drugs"] == []
+
+        path = accumulator.write(str(tmp_path / "combined.tsv"))
+        assert len(pd.read_csv(path, sep="\t")) == 4
+
+    def test_empty(self):
+        assert SourceAccumulator([pd.DataFrame()]).result().empty